@@ -0,0 +1,135 @@
+"""Per-client token-bucket rate limits and a global in-flight cap
+
+Shared by the FastAPI backend (as ASGI middleware) and the Functions app (as a
+handler decorator). State is per process or Function instance.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+PERIODS = {"s": 1.0, "sec": 1.0, "min": 60.0, "h": 3600.0, "hour": 3600.0}
+# Generous per address: a whole classroom behind one school NAT shares a bucket.
+# A cohort request enrolls or syncs a whole roster, so far fewer are needed
+DEFAULT_LIMITS = "session_create=60/min,session_write=600/min,cohort=20/min"
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by client, refilled at ``rate`` per second up to ``burst``
+
+    Buckets live in an LRU-ordered dict. One idle long enough to refill completely is
+    indistinguishable from a new bucket, so such buckets are dropped from the front
+    as new clients arrive; ``max_buckets`` bounds memory even under a flood of
+    distinct keys (the least recently seen client then simply starts afresh).
+    """
+
+    def __init__(self, rate: float, burst: float, max_buckets: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self.idle_seconds = burst / rate
+        self.rejected = 0
+        # key -> [tokens, last refill time]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """Take one token; returns 0 when allowed, else seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._evict(now)
+                bucket = self._buckets[key] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            self.rejected += 1
+            return (1 - bucket[0]) / self.rate
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            _, (_, last) = next(iter(buckets.items()))
+            if now - last < self.idle_seconds and len(buckets) < self.max_buckets:
+                break
+            buckets.popitem(last=False)
+
+
+class InFlightLimiter:
+    """Caps concurrently handled requests; 0 disables the cap"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.limit and self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+def parse_rate(spec: str):
+    """``"10/min"`` -> (rate per second, burst); the burst is the count per period"""
+    count, _, period = spec.strip().partition("/")
+    seconds = PERIODS.get(period.strip() or "s")
+    if seconds is None or float(count) <= 0:
+        raise ValueError(f"Invalid rate limit: {spec!r}")
+    return float(count) / seconds, float(count)
+
+
+class Admission:
+    """Route-class rate limits plus the in-flight cap, configured from strings
+
+    ``limits`` looks like ``"session_create=10/min,session_write=120/min"``; an empty
+    string disables rate limiting. ``client_ip_header`` names the header holding the
+    real client address behind a proxy (``CF-Connecting-IP`` behind Cloudflare).
+    """
+
+    def __init__(self, limits: str, max_in_flight: int = 0, client_ip_header: Optional[str] = None, max_buckets: int = 10000):
+        self.limiters: Dict[str, TokenBucketLimiter] = {}
+        for item in filter(None, (part.strip() for part in limits.split(","))):
+            name, _, spec = item.partition("=")
+            rate, burst = parse_rate(spec)
+            self.limiters[name.strip()] = TokenBucketLimiter(rate, burst, max_buckets)
+        self.in_flight = InFlightLimiter(max_in_flight)
+        self.client_ip_header = client_ip_header.lower() if client_ip_header else None
+
+    def client_key(self, headers, peer: Optional[str]) -> str:
+        """The proxy-supplied client address when configured and present, else the peer"""
+        if self.client_ip_header:
+            forwarded = headers.get(self.client_ip_header)
+            if forwarded:
+                return forwarded.strip()
+        return peer or "unknown"
+
+    def retry_after(self, route_class: Optional[str], key: str) -> float:
+        """0 when the request may proceed, else seconds the client should wait"""
+        limiter = self.limiters.get(route_class) if route_class else None
+        return limiter.acquire(key) if limiter is not None else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight.in_flight,
+            "max_in_flight": self.in_flight.limit,
+            "shed": self.in_flight.rejected,
+            "rate_limited": {name: limiter.rejected for name, limiter in self.limiters.items()},
+            "buckets": {name: len(limiter) for name, limiter in self.limiters.items()},
+        }
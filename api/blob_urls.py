@@ -0,0 +1,83 @@
+"""Final Azure Blob Storage URLs for course assets, optionally signed with a cached SAS"""
+
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import quote
+
+# Signed URLs start a little in the past so clock skew with Storage does not reject them
+CLOCK_SKEW_SECONDS = 300
+
+
+class BlobAssetUrls:
+    """Maps asset paths (``"<container>/<blob>"``, e.g. ``"videos/intro.mp4"``) to blob URLs
+
+    With ``sas_ttl_seconds`` 0 the containers are public and URLs are plain. Otherwise
+    every URL carries a read-only SAS valid for ``sas_ttl_seconds``. Signed URLs are
+    cached per asset and reused until ``refresh_margin`` seconds before they expire,
+    so signing happens once per asset per period instead of once per request.
+
+    azure-storage-blob is imported on the first signature, not at cold start. The
+    account name, key and blob endpoint come from ``get_service_client()``, so a
+    connection string of ``UseDevelopmentStorage=true`` signs against Azurite.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        sas_ttl_seconds: float = 0,
+        refresh_margin: Optional[float] = None,
+        get_service_client: Optional[Callable[[], object]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.sas_ttl_seconds = sas_ttl_seconds
+        # Must stay longer than any Cache-Control max-age on responses embedding the URLs
+        self.refresh_margin = min(sas_ttl_seconds / 2, 600) if refresh_margin is None else refresh_margin
+        self.get_service_client = get_service_client
+        self.clock = clock
+        # asset -> (signed url, expiry timestamp); dict reads and writes are atomic, and
+        # two threads signing the same asset at once only costs a duplicate signature
+        self._signed: Dict[str, Tuple[str, float]] = {}
+
+    @property
+    def signed(self) -> bool:
+        return self.sas_ttl_seconds > 0
+
+    def url(self, asset: str) -> str:
+        if not self.signed:
+            return f"{self.base_url}/{quote(asset)}"
+        now = self.clock()
+        cached = self._signed.get(asset)
+        if cached is not None and now < cached[1] - self.refresh_margin:
+            return cached[0]
+        return self._sign(asset, now)
+
+    def valid_until(self, assets: Iterable[str]) -> float:
+        """When the first of these assets' cached URLs is due for renewal (inf if unsigned)"""
+        if not self.signed:
+            return float("inf")
+        expiries = [self._signed[asset][1] for asset in assets if asset in self._signed]
+        return min(expiries, default=0.0) - self.refresh_margin
+
+    def _sign(self, asset: str, now: float) -> str:
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+        client = self.get_service_client()
+        account_key = getattr(client.credential, "account_key", None)
+        if not account_key:
+            raise RuntimeError("Signed blob URLs need AZURE_STORAGE_CONNECTION_STRING with an account key")
+        container, _, blob = asset.partition("/")
+        expires = now + self.sas_ttl_seconds
+        sas = generate_blob_sas(
+            client.account_name,
+            container,
+            blob,
+            account_key=account_key,
+            permission=BlobSasPermissions(read=True),
+            start=datetime.fromtimestamp(now - CLOCK_SKEW_SECONDS, timezone.utc),
+            expiry=datetime.fromtimestamp(expires, timezone.utc),
+        )
+        url = f"{client.url.rstrip('/')}/{quote(asset)}?{sas}"
+        self._signed[asset] = (url, expires)
+        return url
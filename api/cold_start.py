@@ -0,0 +1,46 @@
+"""Import and first-invocation timings for the Functions app"""
+
+import functools
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+# Recorded timings in seconds: {"import": {"function_app": s}, "first_invocation": {name: s}}
+timings: Dict[str, Dict[str, float]] = {"import": {}, "first_invocation": {}}
+
+
+def _log_timing(event: str, name: str, seconds: float) -> None:
+    logging.info(f"cold-start {event} {name}: {seconds * 1000:.1f} ms")
+
+
+_hook: Callable[[str, str, float], None] = _log_timing
+
+
+def set_measurement_hook(hook: Optional[Callable[[str, str, float], None]]) -> None:
+    """Replace the callback receiving (event, name, seconds); None restores logging"""
+    global _hook
+    _hook = hook or _log_timing
+
+
+def record(event: str, name: str, seconds: float) -> None:
+    timings[event][name] = seconds
+    _hook(event, name, seconds)
+
+
+def measure_first_invocation(handler):
+    """Time only the first call of an HTTP handler; later calls go straight through"""
+    pending = True
+
+    @functools.wraps(handler)
+    def wrapper(req):
+        nonlocal pending
+        if not pending:
+            return handler(req)
+        pending = False
+        started = time.perf_counter()
+        try:
+            return handler(req)
+        finally:
+            record("first_invocation", handler.__name__, time.perf_counter() - started)
+
+    return wrapper
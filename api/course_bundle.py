@@ -0,0 +1,259 @@
+"""Content-addressed offline course bundles shared by the FastAPI backend and the Functions app
+
+A bundle is an uncompressed tar of every module's content JSON and every media file
+it references, plus a manifest listing each entry's path, SHA-256, size, MIME type
+and byte offset inside the archive. The version is a hash over the entry paths and
+hashes, so the same content always gives the same version and byte-identical
+archive, and a client that already has one version can fetch just the entries a
+diff reports as changed with Range requests against the new archive.
+
+Media is already compressed (JPEG, MP4), so the tar is not, which keeps entry
+offsets addressable. Module JSON inside the bundle references assets by their
+path in the bundle (``"comics/comic-1.jpeg"``), not by URL. The tar ends with a
+copy of the manifest as ``manifest.json`` for clients that only keep the archive.
+
+Built bundles live in a directory as ``course-<version>.tar`` and
+``course-<version>.json``; ``current.json`` is a copy of the latest manifest.
+Run ``python course_bundle.py`` to build one from ``backend/static`` for upload to
+the ``bundles`` blob container.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import re
+import tarfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Union
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+MANIFEST_MEMBER = "manifest.json"
+CURRENT_MANIFEST = "current.json"
+VERSION_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class BundleSource(NamedTuple):
+    """One file going into a bundle: inline bytes or a file on disk with its known hash"""
+
+    path: str
+    sha256: str
+    size: int
+    media_type: str
+    data: Union[bytes, Path]
+
+
+def archive_name(version: str) -> str:
+    return f"course-{version}.tar"
+
+
+def manifest_name(version: str) -> str:
+    return f"course-{version}.json"
+
+
+def module_sources(course, module_ids: Optional[Iterable[int]] = None) -> List[BundleSource]:
+    """Each module's content as bundled JSON, asset references left as bundle paths"""
+    content = course.render_content(lambda asset: asset)
+    selected = sorted(content if module_ids is None else set(module_ids).intersection(content))
+    sources = []
+    for module_id in selected:
+        body = dumps(content[module_id])
+        sources.append(BundleSource(f"modules/{module_id}.json", hashlib.sha256(body).hexdigest(), len(body), "application/json", body))
+    return sources
+
+
+def bundle_version(sources: Iterable[BundleSource]) -> str:
+    digest = hashlib.sha256(f"odl-course-bundle/{BUNDLE_FORMAT}\n".encode("ascii"))
+    for source in sorted(sources, key=lambda source: source.path):
+        digest.update(f"{source.path}\0{source.sha256}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def diff_manifests(old: dict, new: dict) -> dict:
+    """Entries of ``new`` that a holder of ``old`` lacks, and paths it should drop"""
+    previous = {entry["path"]: entry["sha256"] for entry in old["entries"]}
+    added, changed = [], []
+    for entry in new["entries"]:
+        digest = previous.pop(entry["path"], None)
+        if digest is None:
+            added.append(entry)
+        elif digest != entry["sha256"]:
+            changed.append(entry)
+    return {
+        "from": old["version"],
+        "to": new["version"],
+        "archive": new["archive"],
+        "added": added,
+        "changed": changed,
+        "removed": sorted(previous),
+        "download_bytes": sum(entry["size"] for entry in added + changed),
+    }
+
+
+def _tar_info(path: str, size: int) -> tarfile.TarInfo:
+    # Fixed metadata, so equal content always produces byte-identical archives
+    info = tarfile.TarInfo(path)
+    info.size = size
+    info.mode = 0o644
+    info.mtime = 0
+    return info
+
+
+class BundleStore:
+    """Directory of built bundles; ``build()`` writes one unless it already exists
+
+    Manifests are kept for every version ever built so diffs against old versions keep
+    working; only the ``keep`` most recent archives are. Writes go to temporary files
+    renamed into place, the manifest last, so a version with a manifest is complete.
+    """
+
+    def __init__(self, directory: Path, keep: int = 3):
+        self.directory = directory
+        self.keep = keep
+        self.current: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def archive_path(self, version: str) -> Optional[Path]:
+        if not VERSION_PATTERN.fullmatch(version):
+            return None
+        path = self.directory / archive_name(version)
+        return path if path.is_file() else None
+
+    def manifest(self, version: str) -> Optional[dict]:
+        if self.current is not None and self.current["version"] == version:
+            return self.current
+        if not VERSION_PATTERN.fullmatch(version):
+            return None
+        return _read_manifest(self.directory / manifest_name(version))
+
+    def build(self, sources: List[BundleSource]) -> dict:
+        """Make the bundle of ``sources`` current, writing it only if this version is new"""
+        version = bundle_version(sources)
+        with self._lock:
+            manifest = _read_manifest(self.directory / manifest_name(version))
+            if manifest is None or not (self.directory / manifest["archive"]).is_file():
+                manifest = self._write(version, sources)
+                logger.info("Course bundle %s: %d entries, %d bytes", version[:12], len(manifest["entries"]), manifest["size"])
+            self._write_json(self.directory / CURRENT_MANIFEST, manifest)
+            self.current = manifest
+            self._prune(version)
+        return manifest
+
+    def build_in_background(self, sources: List[BundleSource]) -> threading.Thread:
+        def build():
+            try:
+                self.build(sources)
+            except (OSError, tarfile.TarError) as exc:
+                logger.warning("Could not build the course bundle: %s", exc)
+
+        thread = threading.Thread(target=build, name="course-bundle", daemon=True)
+        thread.start()
+        return thread
+
+    def _write(self, version: str, sources: List[BundleSource]) -> dict:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        archive = archive_name(version)
+        partial = self.directory / f"{archive}.{os.getpid()}.tmp"
+        entries = []
+        try:
+            with open(partial, "wb") as handle, tarfile.open(fileobj=handle, mode="w", format=tarfile.USTAR_FORMAT) as tar:
+                # Module JSON first: a client streaming the archive can start before the media arrives
+                for source in sorted(sources, key=lambda source: (not source.path.startswith("modules/"), source.path)):
+                    info = _tar_info(source.path, source.size)
+                    offset = tar.offset + len(info.tobuf(tar.format, tar.encoding, tar.errors))
+                    if isinstance(source.data, bytes):
+                        tar.addfile(info, io.BytesIO(source.data))
+                    else:
+                        with open(source.data, "rb") as data:
+                            tar.addfile(info, data)
+                    entries.append({
+                        "path": source.path,
+                        "sha256": source.sha256,
+                        "size": source.size,
+                        "type": source.media_type,
+                        "offset": offset,
+                    })
+                manifest = {"format": BUNDLE_FORMAT, "version": version, "archive": archive, "size": 0, "entries": entries}
+                # The embedded copy cannot know the archive size it ends up in
+                body = dumps(manifest)
+                tar.addfile(_tar_info(MANIFEST_MEMBER, len(body)), io.BytesIO(body))
+            manifest["size"] = partial.stat().st_size
+            partial.replace(self.directory / archive)
+        finally:
+            partial.unlink(missing_ok=True)
+        self._write_json(self.directory / manifest_name(version), manifest)
+        return manifest
+
+    def _write_json(self, path: Path, data: dict) -> None:
+        partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        partial.write_bytes(dumps(data))
+        partial.replace(path)
+
+    def _prune(self, current: str) -> None:
+        archives = sorted(self.directory.glob("course-*.tar"), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in archives[self.keep:]:
+            if path.name != archive_name(current):
+                path.unlink(missing_ok=True)
+
+
+def parse_manifest(data: bytes) -> dict:
+    manifest = json.loads(data)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format {manifest.get('format')!r}")
+    return manifest
+
+
+@lru_cache(maxsize=32)
+def _read_manifest_cached(path: Path, mtime_ns: int) -> dict:
+    return parse_manifest(path.read_bytes())
+
+
+def _read_manifest(path: Path) -> Optional[dict]:
+    try:
+        return _read_manifest_cached(path, path.stat().st_mtime_ns)
+    except (OSError, ValueError):
+        return None
+
+
+def directory_sources(course, static_dir: Path) -> List[BundleSource]:
+    """Module JSON plus the referenced files under ``static_dir``; modules missing media are left out"""
+    sources: Dict[str, BundleSource] = {}
+    available = []
+    for module in course.modules:
+        assets = course.assets(module.id)
+        if not all((static_dir / asset).is_file() for asset in assets):
+            continue
+        available.append(module.id)
+        for asset in assets:
+            if asset not in sources:
+                path = static_dir / asset
+                with open(path, "rb") as handle:
+                    digest = hashlib.file_digest(handle, "sha256").hexdigest()
+                media_type = mimetypes.guess_type(asset)[0] or "application/octet-stream"
+                sources[asset] = BundleSource(asset, digest, path.stat().st_size, media_type, path)
+    return module_sources(course, available) + list(sources.values())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from course_engine import load_course
+
+    root = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description="Build the offline course bundle for upload to the bundles container")
+    parser.add_argument("--static", type=Path, default=root / "backend" / "static", help="media directory")
+    parser.add_argument("--out", type=Path, default=root / "backend" / "data" / "cache" / "bundles")
+    parser.add_argument("--course", help="course.json (default: the packaged one)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    built = BundleStore(args.out).build(directory_sources(load_course(args.course), args.static))
+    print(json.dumps({key: built[key] for key in ("version", "archive", "size")} | {"entries": len(built["entries"])}))
@@ -0,0 +1,37 @@
+"""Course definition shared by the FastAPI backend and the Azure Functions app"""
+
+from .course import Course, ModuleTemplate, load_course
+from .funnel import CourseFunnel, StreamingQuantile, funnel_report, module_transition
+from .responses import (
+    BatchResults,
+    EnrollmentResult,
+    ModuleCompletion,
+    ModuleStatus,
+    ProgressResult,
+    QuizCompletion,
+    SessionStarted,
+    SessionState,
+    SessionSummary,
+)
+from .tokens import SessionClaims, SessionTokenCodec
+
+__all__ = [
+    "BatchResults",
+    "Course",
+    "CourseFunnel",
+    "EnrollmentResult",
+    "ModuleCompletion",
+    "ModuleStatus",
+    "ModuleTemplate",
+    "ProgressResult",
+    "QuizCompletion",
+    "SessionClaims",
+    "SessionStarted",
+    "SessionState",
+    "SessionSummary",
+    "SessionTokenCodec",
+    "StreamingQuantile",
+    "funnel_report",
+    "load_course",
+    "module_transition",
+]
@@ -0,0 +1,151 @@
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .responses import ModuleStatus
+
+DEFAULT_COURSE_PATH = Path(__file__).parent / "course.json"
+STATUSES = ("locked", "unlocked", "completed")
+
+
+class ModuleTemplate(NamedTuple):
+    """Immutable course module; per-session state lives in a completed-module bitmask"""
+
+    id: int
+    title: str
+    description: str
+    type: str
+    prerequisites: Tuple[int, ...]
+    bit: int
+    required_mask: int
+
+
+class Course:
+    """A course definition compiled into O(1) indexes and a prerequisite graph
+
+    Learner progress is a single integer: the bitmask of completed modules. Which
+    modules are unlocked is a pure function of that mask (a module unlocks once all of
+    its prerequisites are completed) and is memoized per distinct mask.
+    """
+
+    def __init__(self, definition: dict):
+        self.id = definition.get("id", "course")
+        self.title = definition.get("title", "")
+        raw_modules = definition["modules"]
+        bits = {module["id"]: 1 << index for index, module in enumerate(raw_modules)}
+        modules = []
+        for module in raw_modules:
+            prerequisites = tuple(module.get("prerequisites", ()))
+            unknown = [p for p in prerequisites if p not in bits]
+            if unknown:
+                raise ValueError(f"Module {module['id']} requires unknown modules {unknown}")
+            required_mask = 0
+            for prerequisite in prerequisites:
+                required_mask |= bits[prerequisite]
+            modules.append(
+                ModuleTemplate(
+                    module["id"], module["title"], module["description"], module["type"],
+                    prerequisites, bits[module["id"]], required_mask,
+                )
+            )
+        self.modules: Tuple[ModuleTemplate, ...] = tuple(modules)
+        self.by_id: Dict[int, ModuleTemplate] = {module.id: module for module in modules}
+        self.all_mask = (1 << len(modules)) - 1
+        self._content = {module["id"]: module.get("content") for module in raw_modules}
+        # module id -> ids of modules listing it as a prerequisite
+        self.dependents: Dict[int, Tuple[int, ...]] = {
+            module.id: tuple(other.id for other in modules if module.id in other.prerequisites) for module in modules
+        }
+        # One shared, immutable entry per (module, status) used to build module lists
+        self._statuses = {
+            (module.id, status): ModuleStatus(module.id, module.title, module.description, status, module.type)
+            for module in modules
+            for status in STATUSES
+        }
+        self.unlocked_mask = lru_cache(maxsize=1024)(self._unlocked_mask)
+
+    def bit(self, module_id: int) -> int:
+        module = self.by_id.get(module_id)
+        return module.bit if module is not None else 0
+
+    def _unlocked_mask(self, completed_mask: int) -> int:
+        unlocked = 0
+        for module in self.modules:
+            if completed_mask & module.required_mask == module.required_mask:
+                unlocked |= module.bit
+        return unlocked
+
+    def status(self, completed_mask: int, module_id: int) -> str:
+        bit = self.bit(module_id)
+        if completed_mask & bit:
+            return "completed"
+        if self.unlocked_mask(completed_mask) & bit:
+            return "unlocked"
+        return "locked"
+
+    def is_unlocked(self, completed_mask: int, module_id: int) -> bool:
+        return bool(self.unlocked_mask(completed_mask) & self.bit(module_id))
+
+    def is_complete(self, completed_mask: int) -> bool:
+        return completed_mask & self.all_mask == self.all_mask
+
+    def completed_ids(self, completed_mask: int) -> List[int]:
+        return [module.id for module in self.modules if completed_mask & module.bit]
+
+    def module_list(self, completed_mask: int) -> List[ModuleStatus]:
+        """Module list for a learner, built from shared immutable entries"""
+        unlocked = self.unlocked_mask(completed_mask)
+        modules = []
+        for module in self.modules:
+            if completed_mask & module.bit:
+                status = "completed"
+            elif unlocked & module.bit:
+                status = "unlocked"
+            else:
+                status = "locked"
+            modules.append(self._statuses[(module.id, status)])
+        return modules
+
+    def assets(self, module_id: int) -> List[str]:
+        """Asset paths ("videos/x.mp4", "comics/y.jpeg") referenced by a module's content"""
+        found: List[str] = []
+        _collect_assets(self._content.get(module_id), found)
+        return found
+
+    def render_content(self, asset_url: Callable[[str], str]) -> Dict[int, dict]:
+        """Content of every module with ``{"asset": path}`` references resolved to URLs"""
+        return {
+            module_id: _render(content, asset_url)
+            for module_id, content in self._content.items()
+            if content is not None
+        }
+
+
+def _render(node, asset_url: Callable[[str], str]):
+    if isinstance(node, dict):
+        if set(node) == {"asset"}:
+            return asset_url(node["asset"])
+        return {key: _render(value, asset_url) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_render(item, asset_url) for item in node]
+    return node
+
+
+def _collect_assets(node, found: List[str]) -> None:
+    if isinstance(node, dict):
+        if set(node) == {"asset"}:
+            found.append(node["asset"])
+            return
+        for value in node.values():
+            _collect_assets(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            _collect_assets(item, found)
+
+
+@lru_cache(maxsize=None)
+def load_course(path: Optional[str] = None) -> Course:
+    """Load and compile a course definition once per path"""
+    with open(path or DEFAULT_COURSE_PATH, encoding="utf-8") as handle:
+        return Course(json.load(handle))
@@ -0,0 +1,171 @@
+import threading
+from typing import List, Optional, Tuple
+
+from .course import Course
+
+
+class StreamingQuantile:
+    """P² estimate of one quantile in constant memory (Jain & Chlamtac, 1985)
+
+    Five markers track the minimum, the maximum, the target quantile and the two
+    points halfway to it; each observation moves them in O(1).
+    """
+
+    def __init__(self, quantile: float = 0.5):
+        self.quantile = quantile
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0.0, 2 * quantile, 4 * quantile, 2 + 2 * quantile, 4.0]
+        self._increments = [0.0, quantile / 2, quantile, (1 + quantile) / 2, 1.0]
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        heights = self._heights
+        if self.count <= 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        positions = self._positions
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            offset = self._desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self._heights[round(self.quantile * (self.count - 1))]
+        return self._heights[2]
+
+
+def module_transition(course: Course, previous_mask: int, completed_mask: int) -> Tuple[int, int, bool]:
+    """(newly completed mask, newly unlocked mask, whether the course was just finished)"""
+    newly_completed = completed_mask & ~previous_mask
+    if not newly_completed:
+        return 0, 0, False
+    newly_unlocked = course.unlocked_mask(completed_mask) & ~course.unlocked_mask(previous_mask)
+    finished = course.is_complete(completed_mask) and not course.is_complete(previous_mask)
+    return newly_completed, newly_unlocked, finished
+
+
+def funnel_report(
+    course: Course,
+    scope: str,
+    sessions_started: int,
+    quiz_completions: int,
+    course_completions: int,
+    median_time_to_complete: Optional[float],
+    reached: List[int],
+    completed: List[int],
+) -> dict:
+    """The ``stats()`` payload; ``reached`` and ``completed`` are indexed like course.modules"""
+    return {
+        "scope": scope,
+        "sessions_started": sessions_started,
+        "quiz_completions": quiz_completions,
+        "course_completions": course_completions,
+        "median_time_to_complete_seconds": median_time_to_complete,
+        "modules": [
+            {
+                "id": module.id,
+                "title": module.title,
+                "type": module.type,
+                "reached": reached[index],
+                "completed": completed[index],
+            }
+            for index, module in enumerate(course.modules)
+        ],
+    }
+
+
+class CourseFunnel:
+    """Completion-funnel counters updated in O(1) at each session state transition
+
+    Callers report transitions with the completed-module mask before and after, so
+    repeated completions are not double counted. Reading ``stats()`` never looks at
+    individual sessions. Counts are per process, which ``stats()`` reports as its
+    ``scope``: with several workers or instances each only sees its own share.
+    """
+
+    scope = "process"
+
+    def __init__(self, course: Course):
+        self.course = course
+        self.sessions_started = 0
+        self.quiz_completions = 0
+        self.course_completions = 0
+        # Indexed like course.modules
+        self.reached = [0] * len(course.modules)
+        self.completed = [0] * len(course.modules)
+        self.time_to_complete = StreamingQuantile(0.5)
+        self._lock = threading.Lock()
+
+    def session_started(self) -> None:
+        with self._lock:
+            self.sessions_started += 1
+            self._count(self.reached, self.course.unlocked_mask(0))
+
+    def module_completed(self, previous_mask: int, completed_mask: int, started_at: float, now: float) -> None:
+        newly_completed, newly_unlocked, finished = module_transition(self.course, previous_mask, completed_mask)
+        if not newly_completed:
+            return
+        with self._lock:
+            self._count(self.completed, newly_completed)
+            self._count(self.reached, newly_unlocked)
+            if finished:
+                self.course_completions += 1
+                # Sessions migrated without a start time report 0 and are left out
+                if started_at > 0:
+                    self.time_to_complete.add(now - started_at)
+
+    def quiz_completed(self, was_completed: bool) -> None:
+        if was_completed:
+            return
+        with self._lock:
+            self.quiz_completions += 1
+
+    def _count(self, counters: List[int], mask: int) -> None:
+        for index, module in enumerate(self.course.modules):
+            if mask & module.bit:
+                counters[index] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return funnel_report(
+                self.course,
+                self.scope,
+                self.sessions_started,
+                self.quiz_completions,
+                self.course_completions,
+                self.time_to_complete.value(),
+                list(self.reached),
+                list(self.completed),
+            )
@@ -0,0 +1,97 @@
+"""Typed response bodies shared by both apps, encoded by ``serialization.dumps``
+
+Slotted dataclasses: no per-instance dict, and orjson serializes them natively in
+field order. Write responses always carry the session id to use from then on, which
+is only ever different from the request's with signed session tokens.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass(frozen=True, slots=True)
+class ModuleStatus:
+    """One entry of a learner's module list; instances are shared templates"""
+
+    id: int
+    title: str
+    description: str
+    status: str
+    type: str
+
+
+@dataclass(slots=True)
+class SessionStarted:
+    session_id: str
+    user_name: str
+
+
+@dataclass(slots=True)
+class SessionSummary:
+    """Session fields without the module list"""
+
+    user_name: str
+    current_module: int
+    quiz_score: int
+    completed_modules: List[int]
+    quiz_completed: bool
+
+
+@dataclass(slots=True)
+class SessionState:
+    user_name: str
+    modules: List[ModuleStatus]
+    current_module: int
+    quiz_score: int
+    completed_modules: List[int]
+    quiz_completed: bool
+
+
+@dataclass(slots=True)
+class ModuleCompletion:
+    success: bool
+    all_completed: bool
+    modules: List[ModuleStatus]
+    session_id: str
+
+
+@dataclass(slots=True)
+class QuizCompletion:
+    success: bool
+    message: str
+    session_id: str
+    quiz_type: str = "genially"
+
+
+@dataclass(slots=True)
+class EnrollmentResult:
+    """Outcome of one roster entry of a cohort enrollment"""
+
+    success: bool
+    user_name: str
+    session_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class ProgressResult:
+    """Outcome of one completion of a batch progress sync"""
+
+    success: bool
+    session_id: Optional[str] = None
+    all_completed: Optional[bool] = None
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class BatchResults:
+    """Per-item results, in request order, with their tallies"""
+
+    succeeded: int
+    failed: int
+    results: list
+
+    @classmethod
+    def of(cls, results: list) -> "BatchResults":
+        succeeded = sum(1 for result in results if result.success)
+        return cls(succeeded, len(results) - succeeded, results)
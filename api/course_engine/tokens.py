@@ -0,0 +1,82 @@
+import base64
+import hashlib
+import hmac
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+SIGNATURE_BYTES = 16
+
+
+class SessionClaims(NamedTuple):
+    user_name: str
+    completed_mask: int
+    quiz_completed: bool
+    issued_at: int
+    started_at: int
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionTokenCodec:
+    """Compact HMAC-SHA256 signed session tokens carrying the learner's progress
+
+    A token is ``base64url(payload).base64url(mac[:16])`` where the payload is
+    ``"<completed mask hex>.<flags>.<issued-at hex>.<started-at hex>.<user name>"``. The signing key is
+    derived from the secret and ``context`` (the course id), so tokens are not valid
+    across courses. Successful verifications are memoized per token string.
+    """
+
+    def __init__(self, secret: str, context: str = "", ttl_seconds: float = 6 * 3600, cache_size: int = 4096):
+        if not secret:
+            raise ValueError("A session token secret is required")
+        self.ttl_seconds = ttl_seconds
+        self._key = hmac.new(secret.encode("utf-8"), context.encode("utf-8"), hashlib.sha256).digest()
+        self._decode = lru_cache(maxsize=cache_size)(self._decode_uncached)
+
+    def issue(
+        self,
+        user_name: str,
+        completed_mask: int = 0,
+        quiz_completed: bool = False,
+        started_at: Optional[int] = None,
+        issued_at: Optional[int] = None,
+    ) -> str:
+        issued_at = int(time.time()) if issued_at is None else issued_at
+        started_at = issued_at if started_at is None else int(started_at)
+        payload = _b64encode(f"{completed_mask:x}.{int(quiz_completed)}.{issued_at:x}.{started_at:x}.{user_name}".encode("utf-8"))
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token: str) -> Optional[SessionClaims]:
+        """Return the claims of a valid, unexpired token, or None"""
+        claims = self._decode(token)
+        if claims is None or time.time() - claims.issued_at > self.ttl_seconds:
+            return None
+        return claims
+
+    def subject(self, user_name: str, started_at: int) -> str:
+        """Stable, non-secret id for one session across all of its refreshed tokens"""
+        message = f"subject.{started_at:x}.{user_name}".encode("utf-8")
+        return _b64encode(hmac.new(self._key, message, hashlib.sha256).digest()[:SIGNATURE_BYTES])
+
+    def cache_info(self):
+        return self._decode.cache_info()
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._key, payload.encode("utf-8"), hashlib.sha256).digest()[:SIGNATURE_BYTES])
+
+    def _decode_uncached(self, token: str) -> Optional[SessionClaims]:
+        payload, _, signature = token.partition(".")
+        if not payload or not signature or not hmac.compare_digest(self._sign(payload).encode("utf-8"), signature.encode("utf-8")):
+            return None
+        try:
+            mask, flags, issued_at, started_at, user_name = _b64decode(payload).decode("utf-8").split(".", 4)
+            return SessionClaims(user_name, int(mask, 16), flags == "1", int(issued_at, 16), int(started_at, 16))
+        except ValueError:
+            return None
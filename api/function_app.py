@@ -1,8 +1,36 @@
+import time
+
+_import_started = time.perf_counter()
+
 import azure.functions as func
-import json
+import functools
+import hashlib
+import hmac
 import uuid
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict
 import logging
+import math
+import os
+
+from admission import DEFAULT_LIMITS, Admission
+from blob_urls import BlobAssetUrls
+from cold_start import measure_first_invocation, record
+from course_bundle import CURRENT_MANIFEST, VERSION_PATTERN, diff_manifests, manifest_name, parse_manifest
+from course_engine import (
+    BatchResults,
+    CourseFunnel,
+    EnrollmentResult,
+    ModuleCompletion,
+    ProgressResult,
+    QuizCompletion,
+    SessionStarted,
+    SessionState,
+    SessionSummary,
+    SessionTokenCodec,
+    load_course,
+)
+from serialization import dumps, dumps_with_raw
 
 # Initialize the Azure Functions app
 app = func.FunctionApp()
@@ -12,72 +40,243 @@ sessions: Dict[str, dict] = {}
 
 # Azure Storage configuration
 STORAGE_ACCOUNT_NAME = "odlwebsitestorage"
-BLOB_BASE_URL = f"https://{STORAGE_ACCOUNT_NAME}.blob.core.windows.net"
-
-# Data models (simplified for Azure Functions)
-INITIAL_MODULES = [
-    {
-        "id": 1,
-        "title": "Info Capsule",
-        "description": "Watch the animation",
-        "status": "unlocked",
-        "type": "video"
-    },
-    {
-        "id": 2,
-        "title": "Fun Quiz",
-        "description": "Who Wants to Be a Millionaire style",
-        "status": "locked",
-        "type": "quiz"
-    },
-    {
-        "id": 3,
-        "title": "Comic World",
-        "description": "Read the story",
-        "status": "locked",
-        "type": "comic"
-    },
-]
-
-# Helper function to handle CORS
+BLOB_BASE_URL = os.environ.get("ODL_BLOB_BASE_URL", f"https://{STORAGE_ACCOUNT_NAME}.blob.core.windows.net")
+_blob_service_client = None
+
+def get_blob_service_client():
+    """Import azure-storage-blob and build the client on first use, not at cold start"""
+    global _blob_service_client
+    if _blob_service_client is None:
+        from azure.storage.blob import BlobServiceClient
+
+        connection_string = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
+        if connection_string:
+            _blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+        else:
+            _blob_service_client = BlobServiceClient(BLOB_BASE_URL)
+    return _blob_service_client
+
+# Final asset URLs embedded in module content. Containers are public unless
+# ODL_BLOB_SAS_TTL_SECONDS is set, in which case URLs carry a cached read-only SAS.
+asset_urls = BlobAssetUrls(
+    BLOB_BASE_URL,
+    sas_ttl_seconds=float(os.environ.get("ODL_BLOB_SAS_TTL_SECONDS", "0")),
+    get_service_client=get_blob_service_client,
+)
+
+# Course structure, content and unlock graph (shared with backend/main.py)
+course = load_course()
+
+def new_session(user_name):
+    """Per-session progress: completed modules as a bitmask over the shared course"""
+    return {
+        "user_name": user_name,
+        "completed_mask": 0,
+        "current_module": 1,
+        "quiz_score": 0,
+        "quiz_completed": False,
+        "started_at": time.time()
+    }
+
+# Completion funnel counters, updated at each session transition. Per instance, like
+# the sessions themselves: manage/stats reports "scope": "process" and only covers
+# the instance that answered.
+funnel = CourseFunnel(course)
+
+# Opt-in stateless mode (ODL_SESSION_BACKEND=token): the session id is a signed token
+# carrying the progress, so any Function instance can serve it and recycling loses nothing
+SESSION_BACKEND = os.environ.get("ODL_SESSION_BACKEND", "memory")
+token_codec = (
+    SessionTokenCodec(
+        os.environ.get("ODL_SESSION_SECRET"),
+        course.id,
+        float(os.environ.get("ODL_SESSION_TTL_SECONDS", str(6 * 3600))),
+    )
+    if SESSION_BACKEND == "token"
+    else None
+)
+
+def create_session(user_name):
+    """Start a session and return its id"""
+    funnel.session_started()
+    if token_codec is not None:
+        return token_codec.issue(user_name)
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = new_session(user_name)
+    return session_id
+
+def load_session(session_id):
+    """Return the session dict for an id, or None if it is unknown or invalid"""
+    if token_codec is None:
+        return sessions.get(session_id)
+    claims = token_codec.verify(session_id)
+    if claims is None:
+        return None
+    session = new_session(claims.user_name)
+    session["completed_mask"] = claims.completed_mask
+    session["quiz_completed"] = claims.quiz_completed
+    session["started_at"] = claims.started_at
+    return session
+
+def save_session(session_id, session):
+    """Persist a changed session and return the id the client should use from now on
+
+    Stored sessions are changed in place, so only token mode has work to do: the
+    refreshed token carries the new state.
+    """
+    if token_codec is None:
+        return session_id
+    return token_codec.issue(
+        session["user_name"], session["completed_mask"], session["quiz_completed"], session["started_at"]
+    )
+
+def session_summary(session):
+    return SessionSummary(
+        session["user_name"],
+        session["current_module"],
+        session["quiz_score"],
+        course.completed_ids(session["completed_mask"]),
+        session["quiz_completed"]
+    )
+
+def session_state(session):
+    return SessionState(
+        session["user_name"],
+        course.module_list(session["completed_mask"]),
+        session["current_module"],
+        session["quiz_score"],
+        course.completed_ids(session["completed_mask"]),
+        session["quiz_completed"]
+    )
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization"
+}
+
+# Header maps are built once; HttpResponse copies them, so sharing is safe
+JSON_HEADERS = {"Content-Type": "application/json", **CORS_HEADERS}
+REDIRECT_CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+
+# Helper function to handle CORS; data is anything serialization.dumps accepts,
+# including the course_engine response types
 def create_response(data, status_code=200):
     return func.HttpResponse(
-        json.dumps(data),
+        dumps(data),
         status_code=status_code,
-        headers={
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, Authorization"
-        }
+        headers=JSON_HEADERS
     )
 
+@lru_cache(maxsize=64)
+def error_body(message):
+    # Error messages are a small fixed set, so each body is encoded once
+    return dumps({"error": message})
+
 def create_error_response(message, status_code=400):
     return func.HttpResponse(
-        json.dumps({"error": message}),
+        error_body(message),
         status_code=status_code,
-        headers={
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, Authorization"
-        }
+        headers=JSON_HEADERS
     )
 
-# Helper function to create redirect response
-def create_redirect_response(url):
+# Admission control (per instance): token buckets per client for session creation
+# and writes, plus a cap on requests in flight. Clients are keyed on the address the
+# Azure front end saw; nothing sits in front of it that could vouch for a client IP
+# header, so ODL_CLIENT_IP_HEADER is only for deployments that add such a proxy.
+admission = Admission(
+    os.environ.get("ODL_RATE_LIMITS", DEFAULT_LIMITS),
+    max_in_flight=int(os.environ.get("ODL_MAX_IN_FLIGHT", "100")),
+    client_ip_header=os.environ.get("ODL_CLIENT_IP_HEADER") or None,
+)
+
+def client_address(req):
+    """Caller address from X-Forwarded-For as ip:port
+
+    The Azure front end appends the address it accepted the connection from, so only
+    the last entry is trustworthy; earlier ones are whatever the client sent.
+    """
+    forwarded = req.headers.get("X-Forwarded-For")
+    if not forwarded:
+        return None
+    address = forwarded.split(",")[-1].strip()
+    if address.startswith("["):
+        return address[1:].split("]")[0]
+    return address.rsplit(":", 1)[0] if address.count(":") == 1 else address
+
+def create_rejection_response(message, status_code, retry_after):
+    return func.HttpResponse(
+        error_body(message),
+        status_code=status_code,
+        headers={**JSON_HEADERS, "Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+def admitted(route_class=None):
+    """Apply the in-flight cap, and the rate limit of route_class if given, to a handler"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(req):
+            if route_class is not None:
+                wait = admission.retry_after(route_class, admission.client_key(req.headers, client_address(req)))
+                if wait:
+                    return create_rejection_response("Too many requests", 429, wait)
+            if not admission.in_flight.try_acquire():
+                return create_rejection_response("Server busy", 503, 1)
+            try:
+                return handler(req)
+            finally:
+                admission.in_flight.release()
+        return wrapper
+    return decorator
+
+def create_raw_response(body, status_code=200):
+    """Like create_response, for a body that is already JSON bytes"""
+    return func.HttpResponse(
+        body,
+        status_code=status_code,
+        headers=JSON_HEADERS
+    )
+
+# Content links straight to blob URLs; the media routes only remain for old links
+ASSET_REDIRECT_CACHE_CONTROL = f"public, max-age={int(os.environ.get('ODL_BLOB_REDIRECT_MAX_AGE', '86400'))}"
+KNOWN_ASSETS = frozenset(asset for module in course.modules for asset in course.assets(module.id))
+
+def create_asset_redirect_response(asset, not_found_message):
+    """Cacheable redirect to an asset's blob URL
+
+    Public URLs never change, so the redirect is a 308 browsers may cache. Signed URLs
+    expire, so the redirect is a 307 cached privately only until the URL is renewed,
+    and only course assets are signed.
+    """
+    if not asset_urls.signed:
+        return func.HttpResponse(
+            "",
+            status_code=308,
+            headers={
+                "Location": asset_urls.url(asset),
+                "Cache-Control": ASSET_REDIRECT_CACHE_CONTROL,
+                **REDIRECT_CORS_HEADERS
+            }
+        )
+    if asset not in KNOWN_ASSETS:
+        return create_error_response(not_found_message, 404)
+    url = asset_urls.url(asset)
+    max_age = max(0, int(asset_urls.valid_until((asset,)) - time.time()))
     return func.HttpResponse(
         "",
-        status_code=302,
+        status_code=307,
         headers={
             "Location": url,
-            "Access-Control-Allow-Origin": "*"
+            "Cache-Control": f"private, max-age={max_age}",
+            **REDIRECT_CORS_HEADERS
         }
     )
 
 # Session endpoints
 @app.function_name(name="start_session")
 @app.route(route="session/start", methods=["POST"])
+@admitted("session_create")
+@measure_first_invocation
 def start_session(req: func.HttpRequest) -> func.HttpResponse:
     try:
         req_body = req.get_json()
@@ -86,212 +285,486 @@ def start_session(req: func.HttpRequest) -> func.HttpResponse:
         if not user_name:
             return create_error_response("user_name is required", 400)
         
-        session_id = str(uuid.uuid4())
-        sessions[session_id] = {
-            "user_name": user_name,
-            "modules": INITIAL_MODULES.copy(),
-            "current_module": 1,
-            "quiz_score": 0,
-            "completed_modules": [],
-            "quiz_completed": False
-        }
+        session_id = create_session(user_name)
         
-        return create_response({
-            "session_id": session_id, 
-            "user_name": user_name
-        })
+        return create_response(SessionStarted(session_id, user_name))
     except Exception as e:
         logging.error(f"Error in start_session: {str(e)}")
         return create_error_response("Internal server error", 500)
 
 @app.function_name(name="get_session")
 @app.route(route="session/{session_id}", methods=["GET"])
+@admitted()
+@measure_first_invocation
 def get_session(req: func.HttpRequest) -> func.HttpResponse:
     try:
         session_id = req.route_params.get('session_id')
         
-        if session_id not in sessions:
+        session = load_session(session_id)
+        if session is None:
             return create_error_response("Session not found", 404)
         
-        return create_response(sessions[session_id])
+        return create_response(session_state(session))
     except Exception as e:
         logging.error(f"Error in get_session: {str(e)}")
         return create_error_response("Internal server error", 500)
 
 @app.function_name(name="get_modules")
 @app.route(route="session/{session_id}/modules", methods=["GET"])
+@admitted()
+@measure_first_invocation
 def get_modules(req: func.HttpRequest) -> func.HttpResponse:
     try:
         session_id = req.route_params.get('session_id')
         
-        if session_id not in sessions:
+        session = load_session(session_id)
+        if session is None:
             return create_error_response("Session not found", 404)
         
-        return create_response(sessions[session_id]["modules"])
+        return create_response(course.module_list(session["completed_mask"]))
     except Exception as e:
         logging.error(f"Error in get_modules: {str(e)}")
         return create_error_response("Internal server error", 500)
 
+# Aggregate endpoints: session state, module list and all module content in one invocation
+BOOTSTRAP_FIELDS = ("session", "modules", "content")
+
+def parse_bootstrap_fields(req):
+    """Return the requested field set, or None if it names an unknown field"""
+    fields = req.params.get("fields")
+    if not fields:
+        return set(BOOTSTRAP_FIELDS)
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    return selected if selected.issubset(BOOTSTRAP_FIELDS) else None
+
+def create_bootstrap_response(session_id, session, fields):
+    payload = {"session_id": session_id}
+    if "session" in fields:
+        payload["session"] = session_summary(session)
+    if "modules" in fields:
+        payload["modules"] = course.module_list(session["completed_mask"])
+    if "content" in fields:
+        refresh_module_content()
+    raw = {"content": compiled_module_content_all} if "content" in fields else {}
+    return create_raw_response(dumps_with_raw(payload, raw))
+
+@app.function_name(name="bootstrap_new_session")
+@app.route(route="session/bootstrap", methods=["POST"])
+@admitted("session_create")
+@measure_first_invocation
+def bootstrap_new_session(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        fields = parse_bootstrap_fields(req)
+        if fields is None:
+            return create_error_response("Unknown fields", 400)
+        
+        req_body = req.get_json()
+        user_name = req_body.get('user_name')
+        
+        if not user_name:
+            return create_error_response("user_name is required", 400)
+        
+        session_id = create_session(user_name)
+        
+        return create_bootstrap_response(session_id, load_session(session_id), fields)
+    except Exception as e:
+        logging.error(f"Error in bootstrap_new_session: {str(e)}")
+        return create_error_response("Internal server error", 500)
+
+@app.function_name(name="bootstrap_session")
+@app.route(route="session/{session_id}/bootstrap", methods=["GET"])
+@admitted()
+@measure_first_invocation
+def bootstrap_session(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        session_id = req.route_params.get('session_id')
+        fields = parse_bootstrap_fields(req)
+        if fields is None:
+            return create_error_response("Unknown fields", 400)
+        
+        session = load_session(session_id)
+        if session is None:
+            return create_error_response("Session not found", 404)
+        
+        return create_bootstrap_response(session_id, session, fields)
+    except Exception as e:
+        logging.error(f"Error in bootstrap_session: {str(e)}")
+        return create_error_response("Internal server error", 500)
+
 @app.function_name(name="complete_module")
 @app.route(route="session/{session_id}/module/{module_id}/complete", methods=["POST"])
+@admitted("session_write")
+@measure_first_invocation
 def complete_module(req: func.HttpRequest) -> func.HttpResponse:
     try:
         session_id = req.route_params.get('session_id')
         module_id = int(req.route_params.get('module_id'))
         
-        if session_id not in sessions:
+        session = load_session(session_id)
+        if session is None:
             return create_error_response("Session not found", 404)
         
-        session = sessions[session_id]
-        
-        # Update module status
-        for module in session["modules"]:
-            if module["id"] == module_id:
-                module["status"] = "completed"
-                if module_id not in session["completed_modules"]:
-                    session["completed_modules"].append(module_id)
-            elif module["id"] == module_id + 1:
-                module["status"] = "unlocked"
-        
-        # Check if all modules completed
-        all_completed = len(session["completed_modules"]) == len(INITIAL_MODULES)
-        
-        return create_response({
-            "success": True,
-            "all_completed": all_completed,
-            "modules": session["modules"]
-        })
+        previous_mask = session["completed_mask"]
+        session["completed_mask"] |= course.bit(module_id)
+        completed_mask = session["completed_mask"]
+        funnel.module_completed(previous_mask, completed_mask, session["started_at"], time.time())
+        
+        payload = ModuleCompletion(
+            True, course.is_complete(completed_mask), course.module_list(completed_mask), save_session(session_id, session)
+        )
+        if req.params.get("include_next", "").lower() not in ("1", "true"):
+            return create_response(payload)
+        
+        # Inline the content of the first module this completion unlocked
+        next_id = next(
+            (dependent for dependent in course.dependents.get(module_id, ()) if course.is_unlocked(completed_mask, dependent)),
+            None
+        )
+        refresh_module_content()
+        compiled = compiled_module_content.get(next_id)
+        next_json = dumps_with_raw({"id": next_id}, {"content": compiled[0]}) if compiled is not None else b"null"
+        return create_raw_response(dumps_with_raw(payload, {"next_module": next_json}))
     except Exception as e:
         logging.error(f"Error in complete_module: {str(e)}")
         return create_error_response("Internal server error", 500)
 
+# Module content, serialized into immutable bytes with strong ETags. Asset references
+# resolve to their final blob URLs, so clients fetch media without a Functions hop.
+# With signed URLs the content is recompiled whenever they are due for renewal.
+CONTENT_CACHE_CONTROL = "public, max-age=300"
+compiled_module_content: Dict[int, tuple] = {}
+
+compiled_module_content_all = b"{}"
+module_content_valid_until = 0.0
+
+def reload_module_content():
+    """Render and compile module content into (body, etag, 304 headers, 200 headers)"""
+    global compiled_module_content, compiled_module_content_all, module_content_valid_until
+    compiled = {}
+    for module_id, data in course.render_content(asset_urls.url).items():
+        body = dumps(data)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        not_modified_headers = {**CORS_HEADERS, "ETag": etag, "Cache-Control": CONTENT_CACHE_CONTROL}
+        ok_headers = {**not_modified_headers, "Content-Type": "application/json"}
+        compiled[module_id] = (body, etag, not_modified_headers, ok_headers)
+    compiled_module_content_all = dumps_with_raw({}, {str(module_id): entry[0] for module_id, entry in compiled.items()})
+    compiled_module_content = compiled
+    module_content_valid_until = asset_urls.valid_until(KNOWN_ASSETS)
+
+def refresh_module_content():
+    if time.time() >= module_content_valid_until:
+        reload_module_content()
+
+# Public URLs are compiled now; signing waits for the first request to keep the
+# storage SDK out of the cold start
+if not asset_urls.signed:
+    reload_module_content()
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
 @app.function_name(name="get_module_content")
 @app.route(route="module/{module_id}/content", methods=["GET"])
+@admitted()
+@measure_first_invocation
 def get_module_content(req: func.HttpRequest) -> func.HttpResponse:
     try:
         module_id = int(req.route_params.get('module_id'))
         
-        if module_id == 1:
-            # Video module - now using Azure Storage URL
-            return create_response({
-                "type": "video",
-                "title": "Understanding Peace",
-                "description": "Educational video about promoting peace and understanding",
-                "video_url": f"{BLOB_BASE_URL}/videos/animation-odl.MP4",
-                "filename": "animation-odl.MP4"
-            })
-        elif module_id == 2:
-            # Genially Quiz module
-            return create_response({
-                "type": "quiz",
-                "title": "Millionaire Quiz: Peace Knowledge",
-                "description": "Test your understanding with this interactive millionaire-style quiz",
-                "quiz_type": "genially",
-                "iframe_url": "https://view.genially.com/682cd17f7e26505a343ccfa1",
-                "iframe_html": '''<div style="width: 100%;"><div style="position: relative; padding-bottom: 56.25%; padding-top: 0; height: 0;"><iframe title="Millionaire Quiz" frameborder="0" width="1200px" height="675px" style="position: absolute; top: 0; left: 0; width: 100%; height: 100%;" src="https://view.genially.com/682cd17f7e26505a343ccfa1" type="text/html" allowscriptaccess="always" allowfullscreen="true" scrolling="yes" allownetworking="all"></iframe> </div> </div>''',
-                "completion_method": "manual"
-            })
-        elif module_id == 3:
-            # Comic module - now using Azure Storage URLs
-            return create_response({
-                "type": "comic",
-                "title": "Visual Journey: The Power of Unity",
-                "pages": [
-                    {
-                        "id": 1,
-                        "title": "A New Friend",
-                        "description": "Sarah is new to the community and feels nervous about making connections.",
-                        "image_url": f"{BLOB_BASE_URL}/comics/comic-1.jpeg"
-                    },
-                    {
-                        "id": 2,
-                        "title": "Building Bridges", 
-                        "description": "The community welcomes Sarah with open arms and understanding.",
-                        "image_url": f"{BLOB_BASE_URL}/comics/comic-2.jpeg"
-                    },
-                    {
-                        "id": 3,
-                        "title": "Growing Together",
-                        "description": "Through shared activities, new friendships begin to bloom.",
-                        "image_url": f"{BLOB_BASE_URL}/comics/comic-3.jpeg"
-                    },
-                    {
-                        "id": 4,
-                        "title": "Supporting Each Other",
-                        "description": "The community comes together to celebrate their diversity.",
-                        "image_url": f"{BLOB_BASE_URL}/comics/comic-4.jpeg"
-                    }
-                ]
-            })
-        else:
+        refresh_module_content()
+        compiled = compiled_module_content.get(module_id)
+        if compiled is None:
             return create_error_response("Module not found", 404)
+        
+        body, etag, not_modified_headers, ok_headers = compiled
+        if etag_matches(req.headers.get("If-None-Match"), etag):
+            return func.HttpResponse(status_code=304, headers=not_modified_headers)
+        return func.HttpResponse(body, status_code=200, headers=ok_headers)
     except Exception as e:
         logging.error(f"Error in get_module_content: {str(e)}")
         return create_error_response("Internal server error", 500)
 
+# Offline course bundle, built by `python course_bundle.py` and uploaded to the
+# bundles container. Manifests are read from there (the current one at most every
+# ODL_BUNDLE_MANIFEST_TTL seconds, older ones once); the archive itself is served
+# by Blob Storage, which handles its Range requests and ETag. A missing current
+# manifest is remembered for ODL_BUNDLE_MISSING_TTL seconds, so the 503s a
+# deployment without a bundle returns do not each cost a blob request.
+BUNDLE_CONTAINER = "bundles"
+BUNDLE_MANIFEST_TTL = float(os.environ.get("ODL_BUNDLE_MANIFEST_TTL", "300"))
+BUNDLE_MISSING_TTL = float(os.environ.get("ODL_BUNDLE_MISSING_TTL", "30"))
+BUNDLE_CACHE_CONTROL = "public, no-cache"
+bundle_manifests: Dict[str, dict] = {}
+compiled_bundle_manifest = None
+bundle_manifest_valid_until = 0.0
+
+def read_bundle_manifest(name):
+    """A manifest blob from the bundles container, or None if there is no such blob"""
+    from azure.core.exceptions import ResourceNotFoundError
+
+    blob = get_blob_service_client().get_blob_client(BUNDLE_CONTAINER, name)
+    try:
+        return parse_manifest(blob.download_blob().readall())
+    except ResourceNotFoundError:
+        return None
+
+def bundle_archive_url(manifest):
+    return asset_urls.url(f"{BUNDLE_CONTAINER}/{manifest['archive']}")
+
+def current_bundle():
+    """(manifest, body, etag, 304 headers, 200 headers) of the current bundle, or None"""
+    global compiled_bundle_manifest, bundle_manifest_valid_until
+    if time.time() >= bundle_manifest_valid_until:
+        manifest = read_bundle_manifest(CURRENT_MANIFEST)
+        if manifest is None:
+            compiled_bundle_manifest = None
+            bundle_manifest_valid_until = time.time() + BUNDLE_MISSING_TTL
+            return None
+        bundle_manifests[manifest["version"]] = manifest
+        body = dumps({**manifest, "url": bundle_archive_url(manifest)})
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        not_modified_headers = {**CORS_HEADERS, "ETag": etag, "Cache-Control": BUNDLE_CACHE_CONTROL}
+        compiled_bundle_manifest = (manifest, body, etag, not_modified_headers, {**not_modified_headers, "Content-Type": "application/json"})
+        archive = f"{BUNDLE_CONTAINER}/{manifest['archive']}"
+        bundle_manifest_valid_until = min(time.time() + BUNDLE_MANIFEST_TTL, asset_urls.valid_until((archive,)))
+    return compiled_bundle_manifest
+
+@app.function_name(name="get_bundle_manifest")
+@app.route(route="bundle/manifest", methods=["GET"])
+@admitted()
+@measure_first_invocation
+def get_bundle_manifest(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        bundle = current_bundle()
+        if bundle is None:
+            return create_error_response("Course bundle is not available", 503)
+        
+        _, body, etag, not_modified_headers, ok_headers = bundle
+        if etag_matches(req.headers.get("If-None-Match"), etag):
+            return func.HttpResponse(status_code=304, headers=not_modified_headers)
+        return func.HttpResponse(body, status_code=200, headers=ok_headers)
+    except Exception as e:
+        logging.error(f"Error in get_bundle_manifest: {str(e)}")
+        return create_error_response("Internal server error", 500)
+
+@app.function_name(name="get_bundle_diff")
+@app.route(route="bundle/diff", methods=["GET"])
+@admitted()
+@measure_first_invocation
+def get_bundle_diff(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        bundle = current_bundle()
+        if bundle is None:
+            return create_error_response("Course bundle is not available", 503)
+        
+        version = req.params.get("from") or ""
+        previous = bundle_manifests.get(version)
+        if previous is None and VERSION_PATTERN.fullmatch(version):
+            previous = read_bundle_manifest(manifest_name(version))
+            if previous is not None:
+                bundle_manifests[version] = previous
+        if previous is None:
+            return create_error_response("Unknown bundle version", 404)
+        
+        diff = diff_manifests(previous, bundle[0])
+        diff["url"] = bundle_archive_url(bundle[0])
+        return func.HttpResponse(dumps(diff), status_code=200, headers={**JSON_HEADERS, "Cache-Control": BUNDLE_CACHE_CONTROL})
+    except Exception as e:
+        logging.error(f"Error in get_bundle_diff: {str(e)}")
+        return create_error_response("Internal server error", 500)
+
 @app.function_name(name="submit_quiz")
 @app.route(route="session/{session_id}/quiz/submit", methods=["POST"])
+@admitted("session_write")
+@measure_first_invocation
 def submit_quiz(req: func.HttpRequest) -> func.HttpResponse:
     try:
         session_id = req.route_params.get('session_id')
         
-        if session_id not in sessions:
+        session = load_session(session_id)
+        if session is None:
             return create_error_response("Session not found", 404)
         
         # For Genially quiz, we just mark it as completed manually
-        sessions[session_id]["quiz_completed"] = True
+        funnel.quiz_completed(session["quiz_completed"])
+        session["quiz_completed"] = True
         
-        return create_response({
-            "success": True,
-            "message": "Quiz completed successfully",
-            "quiz_type": "genially"
-        })
+        return create_response(QuizCompletion(True, "Quiz completed successfully", save_session(session_id, session)))
     except Exception as e:
         logging.error(f"Error in submit_quiz: {str(e)}")
         return create_error_response("Internal server error", 500)
 
 @app.function_name(name="complete_quiz_manual")
 @app.route(route="session/{session_id}/quiz/complete", methods=["POST"])
+@admitted("session_write")
+@measure_first_invocation
 def complete_quiz_manual(req: func.HttpRequest) -> func.HttpResponse:
     try:
         session_id = req.route_params.get('session_id')
         
-        if session_id not in sessions:
+        session = load_session(session_id)
+        if session is None:
             return create_error_response("Session not found", 404)
         
-        sessions[session_id]["quiz_completed"] = True
+        funnel.quiz_completed(session["quiz_completed"])
+        session["quiz_completed"] = True
         
-        return create_response({
-            "success": True,
-            "message": "Quiz marked as completed"
-        })
+        return create_response(QuizCompletion(True, "Quiz marked as completed", save_session(session_id, session)))
     except Exception as e:
         logging.error(f"Error in complete_quiz_manual: {str(e)}")
         return create_error_response("Internal server error", 500)
 
-# Static file serving endpoints (redirect to Azure Storage)
+# Cohort endpoints: a teacher enrolls a whole classroom, or syncs its progress after
+# an offline lesson, in one invocation instead of one per pupil and completion
+BATCH_MAX_ITEMS = int(os.environ.get("ODL_BATCH_MAX_ITEMS", "100"))
+
+def batch_items(req, key):
+    """The list under key in the JSON body, or an error response"""
+    try:
+        body = req.get_json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        return None, create_error_response("Request body must be a JSON object", 400)
+    items = body.get(key)
+    if not isinstance(items, list):
+        return None, create_error_response(f"{key} must be a list", 400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, create_error_response(f"At most {BATCH_MAX_ITEMS} items per batch", 413)
+    return items, None
+
+@app.function_name(name="enroll_cohort")
+@app.route(route="cohort/sessions", methods=["POST"])
+@admitted("cohort")
+@measure_first_invocation
+def enroll_cohort(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        user_names, error = batch_items(req, "user_names")
+        if error is not None:
+            return error
+        
+        results = []
+        for user_name in user_names:
+            if not user_name or not isinstance(user_name, str):
+                results.append(EnrollmentResult(False, user_name, error="user_name is required"))
+            else:
+                results.append(EnrollmentResult(True, user_name, create_session(user_name)))
+        return create_response(BatchResults.of(results))
+    except Exception as e:
+        logging.error(f"Error in enroll_cohort: {str(e)}")
+        return create_error_response("Internal server error", 500)
+
+def progress_item_error(item):
+    if not isinstance(item, dict) or not isinstance(item.get("session_id"), str):
+        return "session_id is required"
+    module_id, quiz_completed = item.get("module_id"), item.get("quiz_completed") is True
+    if (module_id is None) == (not quiz_completed):
+        return "Give either module_id or quiz_completed"
+    if module_id is None:
+        return None
+    # bool is an int subclass, and True would otherwise pass as module 1
+    if not isinstance(module_id, int) or isinstance(module_id, bool):
+        return "module_id must be an integer"
+    if module_id not in course.by_id:
+        return "Module not found"
+    return None
+
+@app.function_name(name="sync_cohort_progress")
+@app.route(route="cohort/progress", methods=["POST"])
+@admitted("cohort")
+@measure_first_invocation
+def sync_cohort_progress(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        items, error = batch_items(req, "items")
+        if error is not None:
+            return error
+        
+        # Each session is loaded once, so several completions for it build on each
+        # other; in token mode one refreshed token per session covers the whole batch
+        loaded = {}
+        errors = []
+        for item in items:
+            error = progress_item_error(item)
+            if error is None:
+                session_id = item["session_id"]
+                if session_id not in loaded:
+                    loaded[session_id] = load_session(session_id)
+                session = loaded[session_id]
+                if session is None:
+                    error = "Session not found"
+                elif item.get("module_id") is not None:
+                    previous_mask = session["completed_mask"]
+                    session["completed_mask"] |= course.bit(item["module_id"])
+                    funnel.module_completed(previous_mask, session["completed_mask"], session["started_at"], time.time())
+                else:
+                    funnel.quiz_completed(session["quiz_completed"])
+                    session["quiz_completed"] = True
+            errors.append(error)
+        
+        saved = {session_id: save_session(session_id, session) for session_id, session in loaded.items() if session is not None}
+        results = [
+            ProgressResult(False, error=error)
+            if error is not None
+            else ProgressResult(True, saved[item["session_id"]], course.is_complete(loaded[item["session_id"]]["completed_mask"]))
+            for item, error in zip(items, errors)
+        ]
+        return create_response(BatchResults.of(results))
+    except Exception as e:
+        logging.error(f"Error in sync_cohort_progress: {str(e)}")
+        return create_error_response("Internal server error", 500)
+
+# Admin endpoints are disabled unless ODL_ADMIN_TOKEN is set (same as backend/main.py)
+ADMIN_TOKEN = os.environ.get("ODL_ADMIN_TOKEN")
+
+def is_admin(req):
+    token = req.headers.get("X-Admin-Token") or ""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+# The Functions host reserves routes starting with "admin", hence "manage/"
+@app.function_name(name="funnel_stats")
+@app.route(route="manage/stats", methods=["GET"])
+@admitted()
+@measure_first_invocation
+def funnel_stats(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        if not is_admin(req):
+            return create_error_response("Not found", 404)
+        
+        return create_response(funnel.stats())
+    except Exception as e:
+        logging.error(f"Error in funnel_stats: {str(e)}")
+        return create_error_response("Internal server error", 500)
+
+# Static file serving endpoints (cacheable redirects to Azure Storage)
 @app.function_name(name="serve_video")
 @app.route(route="videos/{filename}", methods=["GET"])
+@admitted()
+@measure_first_invocation
 def serve_video(req: func.HttpRequest) -> func.HttpResponse:
     try:
         filename = req.route_params.get('filename')
         
-        # Redirect to Azure Blob Storage
-        blob_url = f"{BLOB_BASE_URL}/videos/{filename}"
-        return create_redirect_response(blob_url)
+        return create_asset_redirect_response(f"videos/{filename}", "Video not found")
     except Exception as e:
         logging.error(f"Error in serve_video: {str(e)}")
         return create_error_response("Internal server error", 500)
 
 @app.function_name(name="serve_comic")
 @app.route(route="comics/{filename}", methods=["GET"])
+@admitted()
+@measure_first_invocation
 def serve_comic(req: func.HttpRequest) -> func.HttpResponse:
     try:
         filename = req.route_params.get('filename')
         
-        # Redirect to Azure Blob Storage
-        blob_url = f"{BLOB_BASE_URL}/comics/{filename}"
-        return create_redirect_response(blob_url)
+        return create_asset_redirect_response(f"comics/{filename}", "Comic image not found")
     except Exception as e:
         logging.error(f"Error in serve_comic: {str(e)}")
-        return create_error_response("Internal server error", 500) 
\ No newline at end of file
+        return create_error_response("Internal server error", 500) 
+
+record("import", "function_app", time.perf_counter() - _import_started)
@@ -0,0 +1,44 @@
+"""JSON encoding shared by the FastAPI backend and the Functions app
+
+orjson when it is installed, else the standard library producing the same compact
+output. Response types are slotted dataclasses, which orjson encodes natively
+without building an intermediate dict.
+"""
+
+import dataclasses
+import json
+from typing import Dict
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library is the fallback
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(value):
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data) -> bytes:
+    """Compact UTF-8 JSON for dicts, lists, scalars and the response dataclasses
+
+    Dict keys must be strings: orjson rejects others unless told to convert them,
+    which slows down every dict, and nothing here needs it.
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def dumps_with_raw(data, raw: Dict[str, bytes]) -> bytes:
+    """Serialize ``data`` (an object) plus extra top-level fields that are already JSON bytes"""
+    body = dumps(data)
+    if not raw:
+        return body
+    extra = b",".join(dumps(key) + b":" + value for key, value in raw.items())
+    return body[:-1] + (b"," if body != b"{}" else b"") + extra + b"}"
+
@@ -0,0 +1,62 @@
+import math
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from admission import Admission
+
+RATE_LIMITED_BODY = b'{"detail":"Too many requests"}'
+OVERLOADED_BODY = b'{"detail":"Server busy"}'
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying ``Admission`` before a request reaches routing
+
+    ``classify(method, path)`` names the rate-limit class of a request, or returns
+    None for unlimited routes. Rejections are answered here with a prebuilt body
+    (429 for rate limits, 503 when the in-flight cap is reached) and a Retry-After.
+    """
+
+    def __init__(self, app: ASGIApp, admission: Admission, classify: Callable[[str, str], Optional[str]]):
+        self.app = app
+        self.admission = admission
+        self.classify = classify
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        admission = self.admission
+        route_class = self.classify(scope["method"], scope["path"])
+        if route_class is not None:
+            client = scope.get("client")
+            key = admission.client_key(Headers(scope=scope), client[0] if client else None)
+            wait = admission.retry_after(route_class, key)
+            if wait:
+                await reject(send, 429, RATE_LIMITED_BODY, wait)
+                return
+
+        if not admission.in_flight.try_acquire():
+            await reject(send, 503, OVERLOADED_BODY, 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.in_flight.release()
+
+
+async def reject(send: Send, status: int, body: bytes, retry_after: float) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsLog:
+    """Append-only learning-analytics events written as NDJSON by a background thread
+
+    ``emit()`` only appends a tuple to an in-memory buffer, so request handlers never
+    touch the disk. The writer thread drains the buffer when ``flush_events`` events
+    are waiting or every ``flush_interval`` seconds, and writes each batch with a single
+    ``write``. Files rotate at ``max_file_bytes`` and only the newest ``max_files`` are
+    kept. The buffer holds at most ``capacity`` events; beyond that new events are
+    dropped and counted in ``dropped`` rather than growing memory or blocking.
+
+    Each process writes its own files (the pid is part of the name), so several
+    uvicorn workers can share the directory. With ``directory`` None nothing is
+    recorded.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path],
+        capacity: int = 10000,
+        flush_events: int = 500,
+        flush_interval: float = 2.0,
+        max_file_bytes: int = 16 * 1024 * 1024,
+        max_files: int = 20,
+    ):
+        self.directory = Path(directory) if directory else None
+        self.capacity = capacity
+        self.flush_events = flush_events
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.emitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.rotations = 0
+        # deque append/popleft are atomic, so emitters on the threadpool and the writer
+        # thread need no lock; the capacity check may overshoot by a few events at most
+        self._buffer: deque = deque()
+        self._wake = threading.Event()
+        self._closing = False
+        self._file = None
+        self._writer: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._writer.start()
+
+    def emit(self, event_type: str, session_id: str, **fields) -> bool:
+        """Queue an event; returns False when the buffer is full and the event was dropped"""
+        if not self.enabled:
+            return False
+        if len(self._buffer) >= self.capacity:
+            self.dropped += 1
+            return False
+        self._buffer.append((time.time(), event_type, session_id, fields))
+        self.emitted += 1
+        if len(self._buffer) >= self.flush_events:
+            self._wake.set()
+        return True
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "capacity": self.capacity,
+            "emitted": self.emitted,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "rotations": self.rotations,
+        }
+
+    def close(self) -> None:
+        """Stop the writer after flushing whatever is still buffered"""
+        if self._writer is None:
+            return
+        self._closing = True
+        self._wake.set()
+        self._writer.join(timeout=10)
+        self._writer = None
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            closing = self._closing
+            self._flush()
+            if closing:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _flush(self) -> None:
+        buffer = self._buffer
+        lines = []
+        # Only what is buffered now, so a steady stream of emits cannot keep one flush going
+        for _ in range(len(buffer)):
+            timestamp, event_type, session_id, fields = buffer.popleft()
+            lines.append(json.dumps({"ts": timestamp, "type": event_type, "session_id": session_id, **fields}, separators=(",", ":")))
+        if not lines:
+            return
+        try:
+            handle = self._current_file()
+            handle.write(("\n".join(lines) + "\n").encode("utf-8"))
+            handle.flush()
+        except OSError:
+            self.failed += len(lines)
+            logger.exception("Could not write %d analytics events", len(lines))
+            return
+        self.written += len(lines)
+        if handle.tell() >= self.max_file_bytes:
+            try:
+                self._rotate()
+            except OSError:
+                logger.exception("Could not rotate the analytics files")
+
+    def _current_file(self):
+        if self._file is None:
+            name = f"events-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{self.rotations}.ndjson"
+            self._file = open(self.directory / name, "ab")
+        return self._file
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        self.rotations += 1
+        # Other workers rotate the same directory and may delete files under us
+        files = []
+        for path in self.directory.glob("events-*.ndjson"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files.sort()
+        for _, path in files[: max(0, len(files) - self.max_files)]:
+            path.unlink(missing_ok=True)
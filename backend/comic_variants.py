@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import warnings
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; originals are served without it
+    Image = None
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; there concurrent builds are not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Preferred output formats, best first: (format name, file extension, MIME type, Pillow save options)
+FORMATS = [
+    ("avif", "avif", "image/avif", {"quality": 55}),
+    ("webp", "webp", "image/webp", {"quality": 78, "method": 4}),
+    ("jpeg", "jpeg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+]
+DEFAULT_WIDTHS = (320, 640, 960)
+# "<page>-<source hash>-<width>.<extension>", as written by build()
+VARIANT_NAME = re.compile(r".+-[0-9a-f]{16}-\d+\.(?:avif|webp|jpeg)")
+BUILD_LOCK = ".build.lock"
+# Weight given to JPEG when the Accept header mentions neither it nor a wildcard
+JPEG_FALLBACK_Q = 0.001
+
+
+def _format_supported(name: str) -> bool:
+    if Image is None:
+        return False
+    if name == "avif":
+        try:
+            import pillow_avif  # noqa: F401  (AVIF plugin for Pillow releases without native support)
+            return True
+        except ImportError:
+            pass
+        with warnings.catch_warnings():
+            # Older Pillow warns about the unknown feature name and returns False
+            warnings.simplefilter("ignore")
+            return bool(features.check("avif"))
+    if name == "webp":
+        return bool(features.check("webp"))
+    return True
+
+
+def accept_weights(accept: Optional[str]) -> Dict[str, float]:
+    """Media range -> q-value of an Accept header; parameters other than q are ignored"""
+    weights = {}
+    for item in (accept or "").split(","):
+        media_range, *params = item.split(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[media_range] = max(q, weights.get(media_range, 0.0))
+    return weights
+
+
+class ComicVariants:
+    """Resized, re-encoded copies of each comic page in a disk cache keyed by source hash
+
+    ``build()`` only encodes variants whose cache file is missing, so it is cheap to
+    run on every startup and safe to run ahead of time from the command line. Builds
+    take an exclusive lock on the cache directory: with several workers one encodes
+    and the others wait, then find every variant in place. The build also removes
+    temporary files left by interrupted encodes and variants of outdated sources.
+    """
+
+    def __init__(self, source_dir: Path, cache_dir: Path, widths=DEFAULT_WIDTHS):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.widths = tuple(sorted(widths))
+        self.formats = [f for f in FORMATS if _format_supported(f[0])]
+        # filename -> list of (mime type, width, path), ordered by width
+        self.variants: Dict[str, List[Tuple[str, int, Path]]] = {}
+        self._sizes: Dict[str, Tuple[int, int]] = {}
+
+    def source_widths(self, filename: str) -> List[int]:
+        """Widths offered for a page: configured widths below the original, plus the original"""
+        size = self._source_size(filename)
+        if size is None:
+            return []
+        original = size[0]
+        return [w for w in self.widths if w < original] + [original]
+
+    def build(self) -> None:
+        if Image is None:
+            logger.warning("Pillow is not installed; comic variants are disabled")
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_dir / BUILD_LOCK, "a") as lock:
+            # Released by the kernel if the process dies, so a crash leaves no stale lock
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Nobody else is encoding now, so any temporary file is left over from a crash
+            for partial in self.cache_dir.glob("*.tmp"):
+                partial.unlink(missing_ok=True)
+            variants = self._build_variants()
+            self._prune({entry[2].name for entries in variants.values() for entry in entries})
+        self.variants = variants
+        logger.info("Comic variants ready for %d pages", len(variants))
+
+    def _build_variants(self) -> Dict[str, List[Tuple[str, int, Path]]]:
+        variants = {}
+        for source in sorted(self.source_dir.glob("*.jpeg")):
+            digest = hashlib.sha256(source.read_bytes()).hexdigest()[:16]
+            entries = []
+            image = None
+            for width in self.source_widths(source.name):
+                for name, extension, mime, options in self.formats:
+                    target = self.cache_dir / f"{source.stem}-{digest}-{width}.{extension}"
+                    if not target.exists():
+                        if image is None:
+                            image = Image.open(source).convert("RGB")
+                        resized = image if width == image.width else image.resize(
+                            (width, round(image.height * width / image.width)), Image.LANCZOS
+                        )
+                        partial = target.with_suffix(f"{target.suffix}.{os.getpid()}.tmp")
+                        try:
+                            resized.save(partial, format=name.upper(), **options)
+                            partial.replace(target)
+                        finally:
+                            partial.unlink(missing_ok=True)
+                    entries.append((mime, width, target))
+            variants[source.name] = sorted(entries, key=lambda entry: entry[1])
+        return variants
+
+    def _prune(self, current: set) -> None:
+        """Delete variants of sources that changed or are gone"""
+        for path in self.cache_dir.iterdir():
+            if VARIANT_NAME.fullmatch(path.name) and path.name not in current:
+                path.unlink(missing_ok=True)
+
+    def build_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.build, name="comic-variants", daemon=True)
+        thread.start()
+        return thread
+
+    def select(self, filename: str, accept: str, width: Optional[int]) -> Optional[Tuple[str, Path]]:
+        """Pick the best (mime type, path) for an Accept header and target pixel width"""
+        entries = self.variants.get(filename)
+        if not entries:
+            return None
+        weights = accept_weights(accept)
+        # AVIF and WebP only when listed by name: image/* from older browsers does not
+        # mean they decode them. JPEG also matches wildcards and is the last resort
+        # when nothing matches, unless refused outright with q=0.
+        acceptable = []
+        for preference, (_, _, mime, _) in enumerate(self.formats):
+            if mime == "image/jpeg":
+                q = next((weights[key] for key in ("image/jpeg", "image/*", "*/*") if key in weights), JPEG_FALLBACK_Q)
+            else:
+                q = weights.get(mime, 0.0)
+            if q > 0:
+                acceptable.append((-q, preference, mime))
+        for _, _, mime in sorted(acceptable):
+            candidates = [entry for entry in entries if entry[0] == mime]
+            if not candidates:
+                continue
+            chosen = candidates[-1]
+            if width:
+                for candidate in candidates:
+                    if candidate[1] >= width:
+                        chosen = candidate
+                        break
+            return chosen[0], chosen[2]
+        return None
+
+    def _source_size(self, filename: str) -> Optional[Tuple[int, int]]:
+        if Image is None:
+            return None
+        if filename not in self._sizes:
+            # Image.open only parses the header, so this does not decode the page
+            with Image.open(self.source_dir / filename) as image:
+                self._sizes[filename] = image.size
+        return self._sizes[filename]
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    here = Path(__file__).parent
+    cache = Path(sys.argv[1]) if len(sys.argv) > 1 else here / "data" / "cache" / "comics"
+    ComicVariants(here / "static" / "comics", cache).build()
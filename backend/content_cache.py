@@ -0,0 +1,73 @@
+import hashlib
+from typing import Callable, Dict, Hashable, Optional
+
+from starlette.responses import JSONResponse, Response
+
+from serialization import dumps, dumps_with_raw
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded by the shared serializer (orjson when installed)
+
+    The app's default response class. Endpoints on hot paths return it directly
+    with a response dataclass, which also skips FastAPI's ``jsonable_encoder``.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class CompiledJSON:
+    """Immutable, pre-serialized JSON body with its strong ETag"""
+
+    __slots__ = ("body", "etag", "headers")
+
+    def __init__(self, data, cache_control: str):
+        self.body = dumps(data)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.headers = {"ETag": self.etag, "Cache-Control": cache_control}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class PrecompiledResponses:
+    """JSON responses compiled once from ``build()`` and served by key
+
+    ``build`` returns a mapping of key -> JSON-serializable data. Call ``reload()``
+    after the underlying content changes to recompile every entry.
+    """
+
+    def __init__(self, build: Callable[[], Dict[Hashable, object]], cache_control: str = "public, max-age=300"):
+        self.build = build
+        self.cache_control = cache_control
+        self.entries: Dict[Hashable, CompiledJSON] = {}
+        # Every entry as one JSON object keyed by str(key), for aggregate responses
+        self.combined = b"{}"
+        self.reload()
+
+    def reload(self) -> None:
+        # Swap the whole table at once so readers never see a partial rebuild
+        entries = {key: CompiledJSON(data, self.cache_control) for key, data in self.build().items()}
+        self.combined = dumps_with_raw({}, {str(key): entry.body for key, entry in entries.items()})
+        self.entries = entries
+
+    def response(self, key: Hashable, if_none_match: Optional[str] = None) -> Optional[Response]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if etag_matches(if_none_match, entry.etag):
+            return Response(status_code=304, headers=entry.headers)
+        return Response(content=entry.body, media_type="application/json", headers=entry.headers)
@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from content_cache import etag_matches
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/manifest+json")
+MIN_COMPRESS_SIZE = 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Preferred first when the client weights encodings equally
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class Asset:
+    __slots__ = ("path", "media_type", "etag", "cache_control", "encodings")
+
+    def __init__(self, path: Path, media_type: str, etag: str, cache_control: str):
+        self.path = path
+        self.media_type = media_type
+        self.etag = etag
+        self.cache_control = cache_control
+        # encoding name -> file holding the encoded bytes ("identity" is the original)
+        self.encodings: Dict[str, Path] = {"identity": path}
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> str:
+    """Pick the best available content-coding for an Accept-Encoding header"""
+    if not accept_encoding or len(available) == 1:
+        return "identity"
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = "identity", 0.0
+    for encoding in ENCODING_SUFFIXES:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if encoding in available and q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class FrontendAssets:
+    """Serves the built SPA from a startup index, precompressed variants and a bounded byte cache
+
+    Every file under ``dist_dir`` is indexed once (so lookups never touch the disk and
+    cannot escape the directory). Compressible files get ``.br``/``.gz`` siblings written
+    next to them unless an up-to-date one already exists.
+    """
+
+    def __init__(self, dist_dir: Path, max_cache_bytes: int = 32 * 1024 * 1024):
+        self.dist_dir = dist_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.assets: Dict[str, Asset] = {}
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    def build(self) -> None:
+        assets = {}
+        for path in sorted(self.dist_dir.rglob("*")):
+            if not path.is_file() or path.suffix in (".gz", ".br"):
+                continue
+            relative = path.relative_to(self.dist_dir).as_posix()
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            data = path.read_bytes()
+            etag = '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+            # Vite fingerprints everything under assets/, so those names never change content
+            cache_control = IMMUTABLE if relative.startswith("assets/") else REVALIDATE
+            asset = Asset(path, media_type, etag, cache_control)
+            if len(data) >= MIN_COMPRESS_SIZE and media_type.startswith(COMPRESSIBLE_TYPES):
+                self._precompress(asset, data)
+            assets[relative] = asset
+        self.assets = assets
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+        logger.info("Indexed %d frontend files from %s", len(assets), self.dist_dir)
+
+    async def response(self, relative: str, request_headers) -> Optional[Response]:
+        asset = self.assets.get(relative)
+        if asset is None:
+            return None
+        encoding = choose_encoding(request_headers.get("accept-encoding"), asset.encodings)
+        etag = asset.etag if encoding == "identity" else f'{asset.etag[:-1]}-{encoding}"'
+        headers = {"ETag": etag, "Cache-Control": asset.cache_control}
+        if len(asset.encodings) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        body = self._cache_get((relative, encoding))
+        if body is None:
+            body = await run_in_threadpool(asset.encodings[encoding].read_bytes)
+            self._cache_put((relative, encoding), body)
+        return Response(content=body, media_type=asset.media_type, headers=headers)
+
+    def stats(self) -> dict:
+        return {"files": len(self.assets), "cached_entries": len(self._cache), "cached_bytes": self._cache_bytes}
+
+    def _precompress(self, asset: Asset, data: bytes) -> None:
+        mtime = asset.path.stat().st_mtime
+        compressors = {"gzip": lambda raw: gzip.compress(raw, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressors["br"] = lambda raw: brotli.compress(raw, quality=11)
+        for encoding, compress in compressors.items():
+            target = asset.path.with_name(asset.path.name + ENCODING_SUFFIXES[encoding])
+            if not target.exists() or target.stat().st_mtime < mtime:
+                encoded = compress(data)
+                if len(encoded) >= len(data):
+                    continue
+                # Workers may start together; each writes its own temp file
+                partial = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+                partial.write_bytes(encoded)
+                partial.replace(target)
+            asset.encodings[encoding] = target
+
+    def _cache_get(self, key) -> Optional[bytes]:
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _cache_put(self, key, body: bytes) -> None:
+        if len(body) > self.max_cache_bytes:
+            return
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = body
+            self._cache_bytes += len(body)
+            while self._cache_bytes > self.max_cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
@@ -1,14 +1,77 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, StrictInt
 from typing import Dict, List, Optional
-import uuid
+from email.utils import formatdate
+from functools import lru_cache
 from pathlib import Path
+import hmac
+import math
 import os
+import sys
+import time
 
-app = FastAPI(title="MOOC Backend", version="1.0.0")
+# Make sibling modules importable whether run as `main:app` or `backend.main:app`,
+# plus the course engine shared with the Azure Functions app
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from course_engine import (
+    BatchResults,
+    EnrollmentResult,
+    ModuleCompletion,
+    ProgressResult,
+    QuizCompletion,
+    SessionStarted,
+    load_course,
+)
+from admission import DEFAULT_LIMITS, Admission
+from admission_middleware import AdmissionMiddleware
+from analytics import AnalyticsLog
+from comic_variants import ComicVariants
+from content_cache import CompiledJSON, FastJSONResponse, PrecompiledResponses, etag_matches
+from course_bundle import BundleSource, BundleStore, diff_manifests, module_sources
+from frontend_assets import FrontendAssets
+from media_manifest import MediaManifest, not_modified, not_modified_response
+from mp4_faststart import FaststartVideos
+from preload_hints import EarlyHintsMiddleware, PreloadHints
+from profiling import SamplingProfiler, SlowRequestLog, SlowRequestMiddleware, collapsed, speedscope
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, RouteMetrics, metrics_authorized
+from range_stream import FileDescriptorPool, RangeFileResponse
+from serialization import dumps_with_raw
+from session_store import ProgressUpdate, create_session_store
+
+# Responses are encoded by the serializer shared with the Functions app
+app = FastAPI(title="MOOC Backend", version="1.0.0", default_response_class=FastJSONResponse)
+
+# 103 Early Hints for the module that comes next, on servers that support them;
+# innermost so requests turned away by admission control get none
+app.add_middleware(EarlyHintsMiddleware, links=lambda method, path: preload_hints.early_hint_links(method, path))
+
+# Admission control: per-client token buckets for session creation and writes, plus a
+# cap on requests in flight. Clients are keyed by peer address unless
+# ODL_CLIENT_IP_HEADER names a header set by a proxy every request passes through
+# (CF-Connecting-IP behind the Cloudflare tunnel, see deploy-pi.sh); anywhere else a
+# client could pick a new key per request by sending it. Added first so it runs
+# inside CORS and metrics, which then see its rejections.
+admission = Admission(
+    os.environ.get("ODL_RATE_LIMITS", DEFAULT_LIMITS),
+    max_in_flight=int(os.environ.get("ODL_MAX_IN_FLIGHT", "256")),
+    client_ip_header=os.environ.get("ODL_CLIENT_IP_HEADER") or None,
+)
+SESSION_CREATE_PATHS = ("/api/session/start", "/api/session/bootstrap")
+
+def rate_limit_class(method: str, path: str) -> Optional[str]:
+    if method != "POST":
+        return None
+    if path.startswith("/api/cohort/"):
+        return "cohort"
+    if not path.startswith("/api/session/"):
+        return None
+    return "session_create" if path in SESSION_CREATE_PATHS else "session_write"
+
+app.add_middleware(AdmissionMiddleware, admission=admission, classify=rate_limit_class)
 
 # CORS middleware
 app.add_middleware(
@@ -19,8 +82,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage for sessions
-sessions: Dict[str, dict] = {}
+# Per-route request metrics, exposed in Prometheus text format on /metrics. Each
+# uvicorn worker keeps its own counters.
+metrics = RouteMetrics()
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+metrics.gauge("requests_shed", "Requests rejected by the in-flight cap", lambda: admission.in_flight.rejected)
+metrics.gauge(
+    "requests_rate_limited",
+    "Requests rejected by per-client rate limits",
+    lambda: sum(limiter.rejected for limiter in admission.limiters.values()),
+)
+METRICS_TOKEN = os.environ.get("ODL_METRICS_TOKEN")
+
+# Slow-request capture, off unless ODL_SLOW_REQUEST_MS is set: requests slower than
+# that are kept with their timing breakdown and sampled stacks, the most recent
+# ODL_SLOW_REQUEST_BUFFER of them per worker. Outermost, so the time includes every
+# other middleware; when off it is not installed at all.
+SLOW_REQUEST_MS = os.environ.get("ODL_SLOW_REQUEST_MS")
+slow_requests = None
+if SLOW_REQUEST_MS:
+    slow_requests = SlowRequestLog(
+        float(SLOW_REQUEST_MS) / 1000,
+        capacity=int(os.environ.get("ODL_SLOW_REQUEST_BUFFER", "50")),
+    )
+    app.add_middleware(SlowRequestMiddleware, log=slow_requests)
+    metrics.gauge("slow_requests_captured", "Requests captured as slower than ODL_SLOW_REQUEST_MS", lambda: slow_requests.captured)
+
+# On-demand sampling profiles of this worker, see /api/admin/profile
+profiler = SamplingProfiler()
+
+# Admin endpoints are disabled unless ODL_ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get("ODL_ADMIN_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not ADMIN_TOKEN or not hmac.compare_digest((x_admin_token or "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=404, detail="Not found")
 
 # Data models
 class UserSession(BaseModel):
@@ -37,241 +133,600 @@ class QuizAnswer(BaseModel):
 class QuizSubmission(BaseModel):
     answers: List[QuizAnswer]
 
-# Initial module structure
-INITIAL_MODULES = [
-    {
-        "id": 1,
-        "title": "Info Capsule",
-        "description": "Watch the animation",
-        "status": "unlocked",
-        "type": "video"
-    },
-    {
-        "id": 2,
-        "title": "Fun Quiz",
-        "description": "Who Wants to Be a Millionaire style",
-        "status": "locked",
-        "type": "quiz"
-    },
-    {
-        "id": 3,
-        "title": "Comic World",
-        "description": "Read the story",
-        "status": "locked",
-        "type": "comic"
-    },
-]
+class CohortEnrollment(BaseModel):
+    user_names: List[str]
+
+class ProgressItem(BaseModel):
+    session_id: str
+    # Strict, so true is not taken for module 1 (same check as the Functions app)
+    module_id: Optional[StrictInt] = None
+    quiz_completed: bool = False
+
+class ProgressBatch(BaseModel):
+    items: List[ProgressItem]
+
+# Course structure, content and unlock graph (shared with api/function_app.py)
+course = load_course(os.environ.get("ODL_COURSE_FILE"))
+
+# Session storage: bounded in-memory by default, SQLite (WAL) so several uvicorn
+# workers share sessions and progress survives restarts, or "token" for stateless
+# signed session ids that need no storage at all
+sessions = create_session_store(
+    course,
+    os.environ.get("ODL_SESSION_BACKEND", "memory"),
+    path=os.environ.get("ODL_SESSION_DB", str(Path(__file__).parent / "data" / "sessions.sqlite3")),
+    secret=os.environ.get("ODL_SESSION_SECRET"),
+    max_sessions=int(os.environ.get("ODL_SESSION_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.environ.get("ODL_SESSION_TTL_SECONDS", str(6 * 3600))),
+)
+
+metrics.gauge("sessions_live", "Sessions currently held by the session store", lambda: len(sessions))
+metrics.gauge("sessions_evicted", "Sessions dropped to stay under ODL_SESSION_MAX_ENTRIES", lambda: sessions.evictions)
+metrics.gauge("sessions_expired", "Sessions dropped after ODL_SESSION_TTL_SECONDS idle", lambda: sessions.expirations)
+# The counters SessionStore.stats() adds for the sqlite and token backends
+if hasattr(sessions, "batches"):
+    metrics.gauge("session_write_batches", "Transactions committed by the session writer thread", lambda: sessions.batches)
+    metrics.gauge("session_batched_writes", "Session writes committed in those transactions", lambda: sessions.batched_writes)
+if sessions.stateless:
+    metrics.gauge("session_verify_cache_hits", "Session tokens verified from the cache", lambda: sessions.codec.cache_info().hits)
+    metrics.gauge("session_verify_cache_misses", "Session tokens verified by checking the signature", lambda: sessions.codec.cache_info().misses)
+
+# Learning-analytics events (session starts, module and quiz completions) appended
+# as NDJSON by a background thread; ODL_ANALYTICS_DIR="" turns them off
+analytics = AnalyticsLog(
+    os.environ.get("ODL_ANALYTICS_DIR", str(Path(__file__).parent / "data" / "analytics")),
+    capacity=int(os.environ.get("ODL_ANALYTICS_BUFFER", "10000")),
+)
+metrics.gauge("analytics_events_buffered", "Analytics events waiting to be written", lambda: len(analytics))
+metrics.gauge("analytics_events_dropped", "Analytics events dropped because the buffer was full", lambda: analytics.dropped)
+
+@app.on_event("startup")
+def start_analytics():
+    analytics.start()
+    if slow_requests is not None:
+        slow_requests.start()
+
+@app.on_event("shutdown")
+def close_sessions():
+    sessions.close()
+    analytics.close()
+    if slow_requests is not None:
+        slow_requests.close()
 
 # API Routes
+# Session endpoints are plain functions: FastAPI runs them in its threadpool, so a
+# request waiting on a batched SQLite commit never blocks the event loop
 @app.post("/api/session/start")
-async def start_session(user_data: UserSession):
+def start_session(user_data: UserSession):
     """Create a new user session"""
-    session_id = str(uuid.uuid4())
-    sessions[session_id] = {
-        "user_name": user_data.user_name,
-        "modules": INITIAL_MODULES.copy(),
-        "current_module": 1,
-        "quiz_score": 0,
-        "completed_modules": [],
-        "quiz_completed": False
-    }
-    return {"session_id": session_id, "user_name": user_data.user_name}
+    session_id = sessions.create(user_data.user_name)
+    analytics.emit("session_started", sessions.analytics_id(session_id), user_name=user_data.user_name)
+    return FastJSONResponse(SessionStarted(session_id, user_data.user_name))
 
 @app.get("/api/session/{session_id}")
-async def get_session(session_id: str):
+def get_session(session_id: str):
     """Get session data"""
-    if session_id not in sessions:
+    session = sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return sessions[session_id]
+    return FastJSONResponse(sessions.state(session))
 
 @app.get("/api/session/{session_id}/modules")
-async def get_modules(session_id: str):
+def get_modules(session_id: str):
     """Get user's module progress"""
-    if session_id not in sessions:
+    session = sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return sessions[session_id]["modules"]
+    return FastJSONResponse(sessions.module_list(session))
 
 @app.post("/api/session/{session_id}/module/{module_id}/complete")
-async def complete_module(session_id: str, module_id: int):
-    """Mark a module as completed and unlock next module"""
-    if session_id not in sessions:
+def complete_module(session_id: str, module_id: int, include_next: bool = False):
+    """Mark a module as completed and unlock next module
+
+    With ``include_next=true`` the content of the first module this completion
+    unlocked is returned inline, saving the client a follow-up content request.
+    A ``Link`` header preloads the content and first assets of unlocked modules.
+    """
+    session = sessions.complete_module(session_id, module_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = sessions[session_id]
-    
-    # Update module status
-    for module in session["modules"]:
-        if module["id"] == module_id:
-            module["status"] = "completed"
-            session["completed_modules"].append(module_id)
-        elif module["id"] == module_id + 1:
-            module["status"] = "unlocked"
-    
-    # Check if all modules completed
-    all_completed = len(session["completed_modules"]) == len(INITIAL_MODULES)
-    
-    return {
-        "success": True,
-        "all_completed": all_completed,
-        "modules": session["modules"]
-    }
+    all_completed = sessions.all_completed(session)
+    analytics.emit("module_completed", sessions.analytics_id(session_id, session), module_id=module_id, all_completed=all_completed)
+    payload = ModuleCompletion(True, all_completed, sessions.module_list(session), sessions.issue_id(session_id, session))
+    unlocked = [dependent for dependent in course.dependents.get(module_id, ()) if sessions.is_unlocked(session, dependent)]
+    link = preload_hints.preload(unlocked)
+    headers = {"Link": link} if link else None
+    if not include_next:
+        return FastJSONResponse(payload, headers=headers)
+    next_id = unlocked[0] if unlocked else None
+    next_content = module_content.entries.get(next_id)
+    next_module = dumps_with_raw({"id": next_id}, {"content": next_content.body}) if next_content is not None else b"null"
+    return Response(dumps_with_raw(payload, {"next_module": next_module}), media_type="application/json", headers=headers)
+
+# Aggregate endpoints: session state, module list and all module content in one round trip
+BOOTSTRAP_FIELDS = ("session", "modules", "content")
+
+def parse_bootstrap_fields(fields: Optional[str]):
+    if not fields:
+        return BOOTSTRAP_FIELDS
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected.difference(BOOTSTRAP_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected
+
+def bootstrap_response(session_id: str, session, fields) -> Response:
+    payload = {"session_id": session_id}
+    if "session" in fields:
+        payload["session"] = sessions.summary(session)
+    if "modules" in fields:
+        payload["modules"] = sessions.module_list(session)
+    # Module content is spliced in from the precompiled bytes, not re-encoded
+    raw = {"content": module_content.combined} if "content" in fields else {}
+    return Response(dumps_with_raw(payload, raw), media_type="application/json")
+
+@app.post("/api/session/bootstrap")
+def bootstrap_new_session(user_data: UserSession, fields: Optional[str] = None):
+    """Start a session and return everything the learner journey needs"""
+    selected = parse_bootstrap_fields(fields)
+    session_id = sessions.create(user_data.user_name)
+    analytics.emit("session_started", sessions.analytics_id(session_id), user_name=user_data.user_name)
+    return bootstrap_response(session_id, sessions.get(session_id), selected)
+
+@app.get("/api/session/{session_id}/bootstrap")
+def bootstrap_session(session_id: str, fields: Optional[str] = None):
+    """Return session state, modules and content for an existing session"""
+    selected = parse_bootstrap_fields(fields)
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return bootstrap_response(session_id, session, selected)
+
+# Module content, compiled once into immutable JSON bytes with strong ETags
+STATIC_DIR = Path(os.environ.get("ODL_STATIC_DIR", str(Path(__file__).parent / "static")))
+VIDEO_DIR = STATIC_DIR / "videos"
+COMIC_DIR = STATIC_DIR / "comics"
+DATA_DIR = Path(__file__).parent / "data"
+
+# Every file under static/ with its size, mtime, content hash and MIME type, scanned
+# once; media requests are answered from it without touching the filesystem to
+# find or validate files. POST /api/admin/media/refresh rescans after changes.
+media = MediaManifest(STATIC_DIR, hash_cache=DATA_DIR / "cache" / "media-manifest.json")
+media.refresh()
+MEDIA_CACHE_CONTROL = "public, max-age=3600"
+
+# Resized WebP/AVIF/JPEG comic pages, built in the background on startup
+comic_variants = ComicVariants(
+    COMIC_DIR,
+    Path(os.environ.get("ODL_COMIC_CACHE", str(DATA_DIR / "cache" / "comics"))),
+)
+
+@app.on_event("startup")
+def build_comic_variants():
+    comic_variants.build_in_background()
+
+# Fast-start copies of videos whose moov box sits after the media data, so players
+# can start without first fetching the end of the file. Written in the background
+# on startup (or ahead of time with `python mp4_faststart.py`); until a copy is
+# ready the original is served. Module content only carries video_hints for the
+# file actually served, so it is recompiled once new copies are in place.
+faststart_videos = FaststartVideos(Path(os.environ.get("ODL_VIDEO_CACHE", str(DATA_DIR / "cache" / "videos"))))
+
+def manifest_videos():
+    return [entry for relative, entry in media.files.items() if relative.startswith("videos/")]
+
+@app.on_event("startup")
+def build_faststart_videos():
+    faststart_videos.build_in_background(manifest_videos(), on_added=module_content.reload)
+
+# Link headers for the modules that follow each module, rebuilt with the content
+preload_hints = PreloadHints(course.dependents, lambda module_id: f"/api/module/{module_id}/content")
+
+def build_module_content() -> Dict[int, dict]:
+    """Return the content payload of every available module, keyed by module id"""
+    content = course.render_content(lambda asset: f"/api/{asset}")
+    # Modules whose media is missing on disk are not offered
+    for module_id in list(content):
+        if not all(media.lookup(asset) for asset in course.assets(module_id)):
+            del content[module_id]
+    # Where the first frame ends in the served (fast-start) file, for range preloads
+    for module_id, data in content.items():
+        videos = [asset for asset in course.assets(module_id) if asset.startswith("videos/")]
+        if videos:
+            hints = faststart_videos.hints(media.lookup(videos[0]))
+            if hints is not None:
+                data["video_hints"] = hints
+    # Let the browser pick a page width; the format is negotiated in serve_comic
+    for data in content.values():
+        for page in data.get("pages", ()):
+            widths = comic_variants.source_widths(page["image_url"].rsplit("/", 1)[1])
+            if widths:
+                page["srcset"] = ", ".join(f"{page['image_url']}?w={width} {width}w" for width in widths)
+    preload_hints.rebuild(content)
+    return content
+
+module_content = PrecompiledResponses(build_module_content)
+
+# Offline course bundle: every available module's content JSON and media in one
+# content-addressed tar with a manifest, for classroom proxies and offline clients.
+# Written in the background, only when the content version is new.
+course_bundles = BundleStore(
+    Path(os.environ.get("ODL_BUNDLE_CACHE", str(DATA_DIR / "cache" / "bundles"))),
+    keep=int(os.environ.get("ODL_BUNDLE_KEEP", "3")),
+)
+
+def bundle_sources() -> List[BundleSource]:
+    module_ids = list(module_content.entries)
+    assets = dict.fromkeys(asset for module_id in module_ids for asset in course.assets(module_id))
+    files = [(asset, media.lookup(asset)) for asset in assets]
+    return module_sources(course, module_ids) + [
+        BundleSource(asset, entry.digest, entry.size, entry.media_type, entry.path) for asset, entry in files
+    ]
+
+@app.on_event("startup")
+def build_course_bundle():
+    course_bundles.build_in_background(bundle_sources())
 
 @app.get("/api/module/{module_id}/content")
-async def get_module_content(module_id: int):
+async def get_module_content(module_id: int, request: Request):
     """Get content for a specific module"""
-    if module_id == 1:
-        # Video module with real video file
-        video_path = Path(__file__).parent / "static" / "videos" / "animation-odl.MP4"
-        if video_path.exists():
-            return {
-                "type": "video",
-                "title": "Understanding Peace",
-                "description": "Educational video about promoting peace and understanding",
-                "video_url": "/api/videos/animation-odl.MP4",
-                "filename": "animation-odl.MP4"
-            }
-        else:
+    response = module_content.response(module_id, request.headers.get("if-none-match"))
+    if response is None:
+        module = course.by_id.get(module_id)
+        if module is not None and module.type == "video":
             raise HTTPException(status_code=404, detail="Video file not found")
-    elif module_id == 2:
-        # Genially Quiz module
-        return {
-            "type": "quiz",
-            "title": "Millionaire Quiz: Peace Knowledge",
-            "description": "Test your understanding with this interactive millionaire-style quiz",
-            "quiz_type": "genially",
-            "iframe_url": "https://view.genially.com/682cd17f7e26505a343ccfa1",
-            "iframe_html": '''<div style="width: 100%;"><div style="position: relative; padding-bottom: 56.25%; padding-top: 0; height: 0;"><iframe title="Millionaire Quiz" frameborder="0" width="1200px" height="675px" style="position: absolute; top: 0; left: 0; width: 100%; height: 100%;" src="https://view.genially.com/682cd17f7e26505a343ccfa1" type="text/html" allowscriptaccess="always" allowfullscreen="true" scrolling="yes" allownetworking="all"></iframe> </div> </div>''',
-            "completion_method": "manual"
-        }
-    elif module_id == 3:
-        # Comic module - Updated for real comic images
-        return {
-            "type": "comic",
-            "title": "Visual Journey: The Power of Unity",
-            "pages": [
-                {
-                    "id": 1,
-                    "title": "A New Friend",
-                    "description": "Sarah is new to the community and feels nervous about making connections.",
-                    "image_url": "/api/comics/comic-1.jpeg"
-                },
-                {
-                    "id": 2,
-                    "title": "Building Bridges", 
-                    "description": "The community welcomes Sarah with open arms and understanding.",
-                    "image_url": "/api/comics/comic-2.jpeg"
-                },
-                {
-                    "id": 3,
-                    "title": "Growing Together",
-                    "description": "Through shared activities, new friendships begin to bloom.",
-                    "image_url": "/api/comics/comic-3.jpeg"
-                },
-                {
-                    "id": 4,
-                    "title": "Supporting Each Other",
-                    "description": "The community comes together to celebrate their diversity.",
-                    "image_url": "/api/comics/comic-4.jpeg"
-                }
-            ]
-        }
-    else:
         raise HTTPException(status_code=404, detail="Module not found")
+    # Let the browser fetch the next module's content while this one is in use
+    link = preload_hints.next_prefetch.get(module_id)
+    if link:
+        response.headers["Link"] = link
+    return response
+
+@app.get("/api/admin/stats", dependencies=[Depends(require_admin)])
+def funnel_stats():
+    """Completion funnel, kept up to date at every session transition
+
+    With the sqlite backend the counters live in the database and cover every worker
+    (``"scope": "database"``). The memory and token backends count per process
+    (``"scope": "process"``): run a single worker for whole-deployment numbers.
+    """
+    return sessions.funnel.stats()
+
+@app.post("/api/admin/media/refresh", dependencies=[Depends(require_admin)])
+def refresh_media():
+    """Rescan static/ after media files changed, then rebuild variants and module content"""
+    hashed = media.refresh()
+    comic_variants.build_in_background()
+    faststart_videos.build_in_background(manifest_videos(), on_added=module_content.reload)
+    module_content.reload()
+    course_bundles.build_in_background(bundle_sources())
+    return {"success": True, "files": len(media), "hashed": hashed}
+
+@app.post("/api/admin/content/reload", dependencies=[Depends(require_admin)])
+async def reload_content():
+    """Recompile module content after the course material changed"""
+    module_content.reload()
+    course_bundles.build_in_background(bundle_sources())
+    return {"success": True, "modules": sorted(module_content.entries)}
+
+PROFILE_FORMATS = ("collapsed", "speedscope")
+
+@app.post("/api/admin/profile", dependencies=[Depends(require_admin)])
+def profile_worker(seconds: float = 10, interval_ms: float = 5, format: str = "collapsed", idle: bool = False):
+    """Sample this worker's stacks for ``seconds`` (at most 60) and return the profile
+
+    ``collapsed`` is the folded format flamegraph.pl and most flame graph tools read;
+    ``speedscope`` opens directly in https://www.speedscope.app. Holds one threadpool
+    thread for the duration; only the worker that received the request is profiled.
+    """
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(PROFILE_FORMATS)}")
+    # NaN fails every comparison, so the range checks are written to reject it
+    if not (math.isfinite(seconds) and 0 < seconds <= profiler.max_seconds):
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {profiler.max_seconds:g}")
+    if not (math.isfinite(interval_ms) and 0 < interval_ms <= seconds * 1000):
+        raise HTTPException(status_code=400, detail="interval_ms must be positive and at most the profile length")
+    result = profiler.run(seconds, interval_ms / 1000, include_idle=idle)
+    if result is None:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    counts, ticks, elapsed = result
+    name = f"odl-backend-{os.getpid()}-{int(time.time())}"
+    headers = {"X-Profile-Samples": str(ticks)}
+    if format == "speedscope":
+        headers["Content-Disposition"] = f'attachment; filename="{name}.speedscope.json"'
+        return FastJSONResponse(speedscope(counts, elapsed / ticks, elapsed, name), headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="{name}.collapsed.txt"'
+    return Response(collapsed(counts), media_type="text/plain", headers=headers)
+
+@app.get("/api/admin/slow-requests", dependencies=[Depends(require_admin)])
+def list_slow_requests(limit: int = 50):
+    """Most recent requests over ODL_SLOW_REQUEST_MS in this worker, newest first"""
+    if slow_requests is None:
+        return {"enabled": False, "threshold_ms": None, "captured": 0, "requests": []}
+    entries = slow_requests.snapshot()[::-1][:max(limit, 0)]
+    return {
+        "enabled": True,
+        "threshold_ms": slow_requests.threshold * 1000,
+        "captured": slow_requests.captured,
+        "requests": entries,
+    }
 
 @app.post("/api/session/{session_id}/quiz/submit")
-async def submit_quiz(session_id: str, submission: QuizSubmission):
+def submit_quiz(session_id: str, submission: QuizSubmission):
     """Submit quiz answers and get score - For Genially quiz, this is manual completion"""
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
     # For Genially quiz, we just mark it as completed manually
     # Score is not tracked since it's external quiz
-    sessions[session_id]["quiz_completed"] = True
+    session = sessions.complete_quiz(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
     
-    return {
-        "success": True,
-        "message": "Quiz completed successfully",
-        "quiz_type": "genially"
-    }
+    analytics.emit("quiz_submitted", sessions.analytics_id(session_id, session), answers=len(submission.answers))
+    return FastJSONResponse(QuizCompletion(True, "Quiz completed successfully", sessions.issue_id(session_id, session)))
 
 # Add a simpler endpoint for manual quiz completion
 @app.post("/api/session/{session_id}/quiz/complete")
-async def complete_quiz_manual(session_id: str):
+def complete_quiz_manual(session_id: str):
     """Mark Genially quiz as completed manually"""
-    if session_id not in sessions:
+    session = sessions.complete_quiz(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    sessions[session_id]["quiz_completed"] = True
-    
-    return {
-        "success": True,
-        "message": "Quiz marked as completed"
-    }
+    analytics.emit("quiz_completed", sessions.analytics_id(session_id, session))
+    return FastJSONResponse(QuizCompletion(True, "Quiz marked as completed", sessions.issue_id(session_id, session)))
+
+# Cohort endpoints: a teacher enrolls a whole classroom, or syncs its progress after
+# an offline lesson, in one request and one session-store transaction
+BATCH_MAX_ITEMS = int(os.environ.get("ODL_BATCH_MAX_ITEMS", "100"))
+
+def check_batch_size(count: int):
+    if count > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+
+@app.post("/api/cohort/sessions")
+def enroll_cohort(enrollment: CohortEnrollment):
+    """Start one session per roster name; results are in roster order"""
+    check_batch_size(len(enrollment.user_names))
+    session_ids = iter(sessions.create_many([name for name in enrollment.user_names if name]))
+    results = []
+    for user_name in enrollment.user_names:
+        if not user_name:
+            results.append(EnrollmentResult(False, user_name, error="user_name is required"))
+            continue
+        session_id = next(session_ids)
+        analytics.emit("session_started", sessions.analytics_id(session_id), user_name=user_name, cohort=True)
+        results.append(EnrollmentResult(True, user_name, session_id))
+    return FastJSONResponse(BatchResults.of(results))
+
+def progress_item_error(item: ProgressItem) -> Optional[str]:
+    if (item.module_id is None) == (not item.quiz_completed):
+        return "Give either module_id or quiz_completed"
+    if item.module_id is not None and item.module_id not in course.by_id:
+        return "Module not found"
+    return None
+
+@app.post("/api/cohort/progress")
+def sync_cohort_progress(batch: ProgressBatch):
+    """Apply module and quiz completions for many sessions; results are in request order
+
+    With signed session tokens every result carries the token to use from then on,
+    reflecting all of that session's completions in the batch.
+    """
+    check_batch_size(len(batch.items))
+    errors = [progress_item_error(item) for item in batch.items]
+    records = iter(sessions.apply_progress([
+        ProgressUpdate(item.session_id, item.module_id) for item, error in zip(batch.items, errors) if error is None
+    ]))
+    results = []
+    for item, error in zip(batch.items, errors):
+        record = next(records) if error is None else None
+        if record is None:
+            results.append(ProgressResult(False, error=error or "Session not found"))
+            continue
+        all_completed = sessions.all_completed(record)
+        if item.module_id is not None:
+            analytics.emit("module_completed", sessions.analytics_id(item.session_id, record), module_id=item.module_id, all_completed=all_completed, cohort=True)
+        else:
+            analytics.emit("quiz_completed", sessions.analytics_id(item.session_id, record), cohort=True)
+        results.append(ProgressResult(True, sessions.issue_id(item.session_id, record), all_completed))
+    return FastJSONResponse(BatchResults.of(results))
 
 # Video serving endpoint
+VIDEO_BLOCK_SIZE = int(os.environ.get("ODL_STREAM_BLOCK_SIZE", str(64 * 1024)))
+video_descriptors = FileDescriptorPool()
+
 @app.get("/api/videos/{filename}")
-async def serve_video(filename: str):
-    """Serve video files"""
-    video_path = Path(__file__).parent / "static" / "videos" / filename
-    if video_path.exists():
-        return FileResponse(
-            path=video_path,
+async def serve_video(filename: str, request: Request):
+    """Serve video files with HTTP Range support"""
+    video = media.lookup(f"videos/{filename}")
+    if video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    path, stat_result, etag = faststart_videos.served(video) or (video.path, video.stat, video.etag)
+    # Validators of the file being served, which for a fast-start copy is not the original
+    if not_modified(request.headers, etag, stat_result.st_mtime):
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        return not_modified_response(etag, last_modified, {"Cache-Control": MEDIA_CACHE_CONTROL})
+    try:
+        return RangeFileResponse(
+            path,
+            request.headers,
+            video_descriptors,
             media_type="video/mp4",
+            block_size=VIDEO_BLOCK_SIZE,
             headers={
-                "Accept-Ranges": "bytes",
-                "Content-Disposition": f"inline; filename={filename}"
-            }
+                "Content-Disposition": f"inline; filename={filename}",
+                "Cache-Control": MEDIA_CACHE_CONTROL
+            },
+            stat_result=stat_result,
+            etag=etag
         )
-    else:
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Video not found")
 
 # Comic serving endpoint
+# Client hints are clamped to sane ranges before they pick a variant
+MAX_COMIC_DPR = 4.0
+MAX_COMIC_WIDTH = 8192
+
+def comic_target_width(width, dpr) -> Optional[int]:
+    """Pixel width wanted from the w/Sec-CH-Width and dpr/Sec-CH-DPR hints, None if unusable"""
+    try:
+        width = float(width) if width else None
+        dpr = float(dpr) if dpr else 1.0
+    except (ValueError, OverflowError):
+        return None
+    if width is None or not (math.isfinite(width) and math.isfinite(dpr)) or width <= 0:
+        return None
+    return int(min(width, MAX_COMIC_WIDTH) * min(max(dpr, 1.0), MAX_COMIC_DPR))
+
 @app.get("/api/comics/{filename}")
-async def serve_comic(filename: str):
-    """Serve comic image files"""
-    comic_path = Path(__file__).parent / "static" / "comics" / filename
-    if comic_path.exists():
-        return FileResponse(
-            path=comic_path,
-            media_type="image/jpeg",
-            headers={
-                "Content-Disposition": f"inline; filename={filename}"
-            }
-        )
-    else:
+async def serve_comic(filename: str, request: Request, w: Optional[int] = None, dpr: Optional[float] = None):
+    """Serve comic image files, picking the best variant for Accept and width/DPR hints"""
+    target_width = comic_target_width(w or request.headers.get("sec-ch-width"), dpr or request.headers.get("sec-ch-dpr"))
+    comic = media.lookup(f"comics/{filename}")
+    if comic is None:
         raise HTTPException(status_code=404, detail="Comic image not found")
+    headers = {
+        "Content-Disposition": f"inline; filename={filename}",
+        "Vary": "Accept, Sec-CH-Width, Sec-CH-DPR",
+        "Cache-Control": MEDIA_CACHE_CONTROL,
+        "Last-Modified": comic.last_modified
+    }
+    variant = comic_variants.select(filename, request.headers.get("accept", ""), target_width)
+    if variant is None:
+        path, media_type, stat_result, etag = comic.path, comic.media_type, comic.stat, comic.etag
+    else:
+        # Variant files are named after the source hash, width and format, so the
+        # name is a strong validator
+        media_type, path = variant
+        stat_result, etag = None, f'"{path.name}"'
+    headers["ETag"] = etag
+    if not_modified(request.headers, etag, comic.mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path=path, media_type=media_type, headers=headers, stat_result=stat_result)
+
+# Offline course bundle. The manifest is revalidated on every use (it names the
+# current version); archives are immutable and named after their version.
+BUNDLE_MANIFEST_CACHE_CONTROL = "public, no-cache"
+BUNDLE_ARCHIVE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def bundle_url(archive: str) -> str:
+    return f"/api/bundle/{archive.removeprefix('course-')}"
+
+@lru_cache(maxsize=4)
+def compiled_bundle_manifest(version: str) -> CompiledJSON:
+    manifest = course_bundles.manifest(version)
+    return CompiledJSON({**manifest, "url": bundle_url(manifest["archive"])}, BUNDLE_MANIFEST_CACHE_CONTROL)
+
+def current_bundle() -> dict:
+    manifest = course_bundles.current
+    if manifest is None:
+        raise HTTPException(status_code=503, detail="Course bundle is being built", headers={"Retry-After": "30"})
+    return manifest
+
+@app.get("/api/bundle/manifest")
+async def get_bundle_manifest(request: Request):
+    """Entries of the current course bundle with their hashes and offsets in the archive"""
+    compiled = compiled_bundle_manifest(current_bundle()["version"])
+    if etag_matches(request.headers.get("if-none-match"), compiled.etag):
+        return Response(status_code=304, headers=compiled.headers)
+    return Response(content=compiled.body, media_type="application/json", headers=compiled.headers)
+
+@app.get("/api/bundle/diff")
+async def get_bundle_diff(from_version: str = Query(alias="from")):
+    """What a holder of bundle ``from`` needs to fetch (as archive byte ranges) to be current
+
+    Unknown versions get a 404: the client then downloads the whole archive.
+    """
+    manifest = current_bundle()
+    previous = course_bundles.manifest(from_version)
+    if previous is None:
+        raise HTTPException(status_code=404, detail="Unknown bundle version")
+    diff = diff_manifests(previous, manifest)
+    diff["url"] = bundle_url(manifest["archive"])
+    return FastJSONResponse(diff, headers={"Cache-Control": BUNDLE_MANIFEST_CACHE_CONTROL})
+
+@app.get("/api/bundle/{version}.tar")
+async def serve_bundle(version: str, request: Request):
+    """A bundle archive with Range support; its version is its strong ETag"""
+    path = course_bundles.archive_path(version)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    etag = f'"{version}"'
+    headers = {
+        "Content-Disposition": f"attachment; filename=course-{version[:12]}.tar",
+        "Cache-Control": BUNDLE_ARCHIVE_CACHE_CONTROL
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, **headers})
+    try:
+        return RangeFileResponse(
+            path,
+            request.headers,
+            video_descriptors,
+            media_type="application/x-tar",
+            block_size=VIDEO_BLOCK_SIZE,
+            headers=headers,
+            etag=etag
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Bundle not found")
 
 # Placeholder endpoints for media content
 @app.get("/api/placeholder/comic/{page_id}")
 async def placeholder_comic(page_id: int):
     return {"message": f"Comic page {page_id} will be served here"}
 
+@app.on_event("startup")
+def register_metric_routes():
+    metrics.register_routes(app.routes)
+
+# Declared before the frontend catch-all so it is not shadowed
+@app.get("/metrics", include_in_schema=False)
+def serve_metrics(authorization: Optional[str] = Header(default=None)):
+    if not metrics_authorized(authorization, METRICS_TOKEN):
+        raise HTTPException(status_code=404, detail="Not found")
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 # Serve frontend static files
 frontend_dist_path = Path(__file__).parent.parent / "frontend" / "dist"
+frontend_assets = FrontendAssets(
+    frontend_dist_path,
+    max_cache_bytes=int(os.environ.get("ODL_FRONTEND_CACHE_BYTES", str(32 * 1024 * 1024))),
+)
 
-# Mount static files
+# Index and precompress the build once; a rebuilt frontend needs a restart
 if frontend_dist_path.exists():
-    app.mount("/assets", StaticFiles(directory=str(frontend_dist_path / "assets")), name="assets")
+    frontend_assets.build()
+
+@app.get("/assets/{path:path}")
+async def serve_assets(path: str, request: Request):
+    response = await frontend_assets.response(f"assets/{path}", request.headers)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
 
 # Serve index.html for all frontend routes
 @app.get("/")
-async def serve_frontend():
-    index_path = frontend_dist_path / "index.html"
-    if index_path.exists():
-        return FileResponse(str(index_path))
+async def serve_frontend(request: Request):
+    response = await frontend_assets.response("index.html", request.headers)
+    if response is not None:
+        return response
     else:
         return {"message": "Frontend not built. Run 'npm run build' in frontend directory."}
 
 @app.get("/{path:path}")
-async def serve_frontend_routes(path: str):
+async def serve_frontend_routes(path: str, request: Request):
     # If it's an API route, let it pass through
     if path.startswith("api/"):
         raise HTTPException(status_code=404, detail="API endpoint not found")
     
-    # For all other routes, serve the frontend
-    index_path = frontend_dist_path / "index.html"
-    if index_path.exists():
-        return FileResponse(str(index_path))
+    # Real files from the build (favicon etc.), otherwise the SPA shell
+    response = await frontend_assets.response(path, request.headers)
+    if response is None:
+        response = await frontend_assets.response("index.html", request.headers)
+    if response is not None:
+        return response
     else:
         return {"message": "Frontend not built. Run 'npm run build' in frontend directory."}
 
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.responses import Response
+
+from content_cache import etag_matches
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class MediaFile:
+    """A file under the media root with its validators, captured when the manifest was built"""
+
+    __slots__ = ("path", "stat", "size", "mtime", "digest", "etag", "last_modified", "media_type")
+
+    def __init__(self, path: Path, st: os.stat_result, digest: str, media_type: str):
+        self.path = path
+        self.stat = st
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.digest = digest
+        self.etag = f'"{digest[:32]}"'
+        self.last_modified = formatdate(st.st_mtime, usegmt=True)
+        self.media_type = media_type
+
+
+def not_modified(request_headers, etag: str, mtime: float) -> bool:
+    """RFC 9110 13.2.2: If-None-Match wins; If-Modified-Since only applies without it"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def not_modified_response(etag: str, last_modified: str, headers: Optional[dict] = None) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Last-Modified": last_modified, **(headers or {})})
+
+
+class MediaManifest:
+    """Index of every file under ``root`` built by one scan, with hashes and MIME types
+
+    Lookups are a dict access keyed by the POSIX path relative to ``root``, so only
+    files found by the scan can ever be served; ``..`` or absolute paths simply miss.
+    Content hashes are kept in ``hash_cache`` keyed by (size, mtime), so restarts and
+    ``refresh()`` only hash files that changed. Dotfiles are skipped.
+    """
+
+    def __init__(self, root: Path, hash_cache: Optional[Path] = None):
+        self.root = root
+        self.hash_cache = hash_cache
+        self.files: Dict[str, MediaFile] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def lookup(self, relative: str) -> Optional[MediaFile]:
+        return self.files.get(relative)
+
+    def refresh(self) -> int:
+        """Rescan ``root``; returns the number of files hashed"""
+        with self._lock:
+            known = self._load_hashes()
+            files: Dict[str, MediaFile] = {}
+            hashed = 0
+            for directory, dirnames, filenames in os.walk(self.root):
+                dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+                for name in filenames:
+                    if name.startswith("."):
+                        continue
+                    path = Path(directory) / name
+                    relative = path.relative_to(self.root).as_posix()
+                    st = path.stat()
+                    cached = known.get(relative)
+                    if cached is not None and cached[:2] == [st.st_size, st.st_mtime_ns]:
+                        digest = cached[2]
+                    else:
+                        digest = hash_file(path)
+                        hashed += 1
+                    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                    files[relative] = MediaFile(path, st, digest, media_type)
+            # Swapped in whole so readers never see a half-built index
+            self.files = files
+            self._save_hashes(files)
+        logger.info("Media manifest: %d files under %s (%d hashed)", len(files), self.root, hashed)
+        return hashed
+
+    def _load_hashes(self) -> dict:
+        if self.hash_cache is None or not self.hash_cache.exists():
+            return {}
+        try:
+            return json.loads(self.hash_cache.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_hashes(self, files: Dict[str, MediaFile]) -> None:
+        if self.hash_cache is None:
+            return
+        data = {relative: [entry.size, entry.stat.st_mtime_ns, entry.digest] for relative, entry in files.items()}
+        try:
+            self.hash_cache.parent.mkdir(parents=True, exist_ok=True)
+            partial = self.hash_cache.with_suffix(f".{os.getpid()}.tmp")
+            partial.write_text(json.dumps(data), encoding="utf-8")
+            partial.replace(self.hash_cache)
+        except OSError:
+            logger.warning("Could not write media hash cache %s", self.hash_cache)
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,173 @@
+import hmac
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Upper bounds in seconds; the last bucket (+Inf) is implicit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+# Starlette appends "; charset=utf-8" to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+UNMATCHED = "<unmatched>"
+
+
+class RouteSlot:
+    """Preallocated counters for one (method, templated route) pair"""
+
+    __slots__ = ("method", "route", "statuses", "buckets", "duration_sum", "bytes", "exceptions")
+
+    def __init__(self, method: str, route: str, bucket_count: int):
+        self.method = method
+        self.route = route
+        self.statuses = [0] * len(STATUS_CLASSES)
+        self.buckets = [0] * (bucket_count + 1)
+        self.duration_sum = 0.0
+        self.bytes = 0
+        self.exceptions = 0
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RouteMetrics:
+    """Per-route request counters and latency histograms with Prometheus exposition
+
+    Slots are allocated once per route when ``register_routes`` runs, and are labelled
+    by the route's templated path, so raw ids never create new series. Recording only
+    happens on the event loop thread (see ``MetricsMiddleware``), so it needs no lock:
+    a dict lookup, a bisect and a few integer increments per request. Gauges are
+    callables evaluated at scrape time.
+    """
+
+    def __init__(self, prefix: str = "odl", buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        self._slots: Dict[Tuple[str, str], RouteSlot] = {}
+        self._unmatched = RouteSlot("", UNMATCHED, len(self.buckets))
+        self._gauges: List[Tuple[str, str, Callable[[], float]]] = []
+        self.in_flight = 0
+
+    def register_routes(self, routes) -> None:
+        for route in routes:
+            path = getattr(route, "path", None)
+            for method in sorted(getattr(route, "methods", None) or ()):
+                if path is not None and (path, method) not in self._slots:
+                    self._slots[(path, method)] = RouteSlot(method, path, len(self.buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> None:
+        self._gauges.append((f"{self.prefix}_{name}", documentation, read))
+
+    def slot(self, route, method: str) -> RouteSlot:
+        if route is None:
+            return self._unmatched
+        return self._slots.get((route.path, method), self._unmatched)
+
+    def observe(self, slot: RouteSlot, status: int, seconds: float, size: int) -> None:
+        slot.statuses[min(max(status // 100, 1), 5) - 1] += 1
+        slot.buckets[bisect_left(self.buckets, seconds)] += 1
+        slot.duration_sum += seconds
+        slot.bytes += size
+
+    def render(self) -> bytes:
+        prefix = self.prefix
+        slots = [slot for slot in self._slots.values() if any(slot.statuses) or slot.exceptions]
+        if any(self._unmatched.statuses) or self._unmatched.exceptions:
+            slots.append(self._unmatched)
+        lines = [
+            f"# HELP {prefix}_http_requests_total HTTP responses by route and status class",
+            f"# TYPE {prefix}_http_requests_total counter",
+        ]
+        for slot in slots:
+            labels = f'method="{slot.method}",route="{_label(slot.route)}"'
+            for status_class, count in zip(STATUS_CLASSES, slot.statuses):
+                if count:
+                    lines.append(f'{prefix}_http_requests_total{{{labels},status="{status_class}"}} {count}')
+
+        lines += [
+            f"# HELP {prefix}_http_request_duration_seconds Time until the response body was sent",
+            f"# TYPE {prefix}_http_request_duration_seconds histogram",
+        ]
+        for slot in slots:
+            labels = f'method="{slot.method}",route="{_label(slot.route)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, slot.buckets):
+                cumulative += count
+                lines.append(f'{prefix}_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += slot.buckets[-1]
+            lines.append(f'{prefix}_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{prefix}_http_request_duration_seconds_sum{{{labels}}} {slot.duration_sum}")
+            lines.append(f"{prefix}_http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines += [
+            f"# HELP {prefix}_http_response_bytes_total Response body bytes sent by route",
+            f"# TYPE {prefix}_http_response_bytes_total counter",
+        ]
+        for slot in slots:
+            lines.append(f'{prefix}_http_response_bytes_total{{method="{slot.method}",route="{_label(slot.route)}"}} {slot.bytes}')
+
+        lines += [
+            f"# HELP {prefix}_http_exceptions_total Requests that raised instead of completing a response",
+            f"# TYPE {prefix}_http_exceptions_total counter",
+        ]
+        for slot in slots:
+            if slot.exceptions:
+                lines.append(f'{prefix}_http_exceptions_total{{method="{slot.method}",route="{_label(slot.route)}"}} {slot.exceptions}')
+
+        lines += [
+            f"# HELP {prefix}_http_requests_in_flight Requests currently being handled",
+            f"# TYPE {prefix}_http_requests_in_flight gauge",
+            f"{prefix}_http_requests_in_flight {self.in_flight}",
+        ]
+        for name, documentation, read in self._gauges:
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request into ``RouteMetrics``
+
+    The route is read from ``scope["route"]``, which FastAPI sets while routing, once
+    the inner app returns. Everything here runs on the event loop thread.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: RouteMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        metrics = self.metrics
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            metrics.slot(scope.get("route"), scope["method"]).exceptions += 1
+            raise
+        finally:
+            metrics.in_flight -= 1
+            metrics.observe(metrics.slot(scope.get("route"), scope["method"]), status, time.perf_counter() - started, size)
+
+
+def metrics_authorized(authorization: Optional[str], token: Optional[str]) -> bool:
+    """Scrapes are open unless a token is configured, then ``Authorization: Bearer <token>``"""
+    if not token:
+        return True
+    return hmac.compare_digest((authorization or "").encode("utf-8"), f"Bearer {token}".encode("utf-8"))
@@ -0,0 +1,367 @@
+import hashlib
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Boxes whose payload is nothing but child boxes, on the way from moov to the sample tables
+CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+# Larger than any sane course video needs; a bigger moov is rejected instead of read
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+class Mp4Error(ValueError):
+    pass
+
+
+class Box(NamedTuple):
+    type: str
+    offset: int
+    size: int
+    header_size: int
+
+
+def iter_boxes(handle: BinaryIO, start: int, end: int) -> Iterator[Box]:
+    """Boxes laid out back to back in the file between ``start`` and ``end``"""
+    offset = start
+    while offset + 8 <= end:
+        handle.seek(offset)
+        header = handle.read(8)
+        if len(header) < 8:
+            break
+        size, kind = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", handle.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            raise Mp4Error(f"Truncated or corrupt {kind!r} box at offset {offset}")
+        yield Box(kind.decode("latin-1"), offset, size, header_size)
+        offset += size
+
+
+def _children(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """(type, payload start, box end) of the boxes inside ``data[start:end]``"""
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        payload = offset + 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            payload += 8
+        elif size == 0:
+            size = end - offset
+        if size < payload - offset or offset + size > end:
+            raise Mp4Error(f"Corrupt {kind!r} box inside moov")
+        yield kind, payload, offset + size
+        offset += size
+
+
+def _walk(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    for kind, payload, box_end in _children(data, start, end):
+        yield kind, payload, box_end
+        if kind in CONTAINERS:
+            yield from _walk(data, payload, box_end)
+
+
+def _chunk_offset_tables(moov: bytes) -> Iterator[Tuple[int, int, int]]:
+    """(entry count, first entry position, entry width) of every stco/co64 in a moov box"""
+    for kind, payload, _ in _walk(moov, 0, len(moov)):
+        if kind in (b"stco", b"co64"):
+            count = struct.unpack_from(">I", moov, payload + 4)[0]
+            yield count, payload + 8, 4 if kind == b"stco" else 8
+
+
+class Mp4Layout:
+    """Top-level box layout of an MP4 file and where playback can start
+
+    ``first_keyframe_offset``/``first_keyframe_end`` locate the first sync sample of
+    the first video track as laid out in the fast-start copy, so ``bytes=0-<end - 1>``
+    is everything a player needs to show the first frame.
+    """
+
+    __slots__ = ("path", "size", "boxes", "moov", "first_mdat", "first_keyframe_offset", "first_keyframe_end")
+
+    def __init__(self, path: Path, size: int, boxes: List[Box]):
+        self.path = path
+        self.size = size
+        self.boxes = boxes
+        moov = [box for box in boxes if box.type == "moov"]
+        if len(moov) != 1:
+            raise Mp4Error(f"{path.name}: expected one moov box, found {len(moov)}")
+        self.moov = moov[0]
+        self.first_mdat = next((box for box in boxes if box.type == "mdat"), None)
+        self.first_keyframe_offset: Optional[int] = None
+        self.first_keyframe_end: Optional[int] = None
+
+    @property
+    def faststart(self) -> bool:
+        """Whether moov already precedes the media data"""
+        return self.first_mdat is None or self.moov.offset < self.first_mdat.offset
+
+    @property
+    def moov_size(self) -> int:
+        return self.moov.size
+
+    def relocated(self, offset: int) -> int:
+        """Where a byte of the original file ends up in the fast-start copy"""
+        if self.faststart or offset < self.first_mdat.offset or offset >= self.moov.offset:
+            return offset
+        return offset + self.moov.size
+
+    def summary(self) -> dict:
+        return {
+            "file": str(self.path),
+            "size": self.size,
+            "faststart": self.faststart,
+            "boxes": [[box.type, box.offset, box.size] for box in self.boxes],
+            "moov_size": self.moov_size,
+            "first_keyframe_offset": self.first_keyframe_offset,
+            "first_keyframe_end": self.first_keyframe_end,
+        }
+
+
+def analyze(path: Path) -> Mp4Layout:
+    """Read the box layout and sample tables; only box headers and moov are read"""
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        layout = Mp4Layout(path, size, list(iter_boxes(handle, 0, size)))
+        moov = _read_moov(handle, layout.moov)
+    keyframe = _first_keyframe(moov, layout.moov.header_size)
+    if keyframe is not None:
+        offset, length = keyframe
+        layout.first_keyframe_offset = layout.relocated(offset)
+        layout.first_keyframe_end = layout.first_keyframe_offset + length
+    return layout
+
+
+def _read_moov(handle: BinaryIO, box: Box) -> bytearray:
+    if box.size > MAX_MOOV_BYTES:
+        raise Mp4Error(f"moov box of {box.size} bytes is larger than {MAX_MOOV_BYTES}")
+    handle.seek(box.offset)
+    moov = bytearray(handle.read(box.size))
+    if len(moov) != box.size:
+        raise Mp4Error("File ends inside the moov box")
+    return moov
+
+
+def _first_keyframe(moov: bytes, header_size: int) -> Optional[Tuple[int, int]]:
+    """(file offset, size) of the first sync sample of the first video track"""
+    for kind, payload, box_end in _children(moov, header_size, len(moov)):
+        if kind != b"trak":
+            continue
+        tables: Dict[bytes, int] = {}
+        handler = None
+        for child, child_payload, _ in _walk(moov, payload, box_end):
+            if child == b"hdlr":
+                handler = bytes(moov[child_payload + 8:child_payload + 12])
+            elif child in (b"stss", b"stsc", b"stsz", b"stco", b"co64"):
+                tables[child] = child_payload
+        if handler != b"vide":
+            continue
+        if b"stsc" not in tables or b"stsz" not in tables or not (b"stco" in tables or b"co64" in tables):
+            return None
+        return _sample_location(moov, tables, _first_sync_sample(moov, tables.get(b"stss")))
+    return None
+
+
+def _first_sync_sample(moov: bytes, stss: Optional[int]) -> int:
+    # Without stss every sample is a sync sample
+    if stss is None or struct.unpack_from(">I", moov, stss + 4)[0] == 0:
+        return 1
+    return struct.unpack_from(">I", moov, stss + 8)[0]
+
+
+def _sample_location(moov: bytes, tables: Dict[bytes, int], sample: int) -> Optional[Tuple[int, int]]:
+    stsz = tables[b"stsz"]
+    uniform_size, sample_count = struct.unpack_from(">II", moov, stsz + 4)
+    if not 1 <= sample <= sample_count:
+        return None
+
+    def sample_size(number: int) -> int:
+        return uniform_size or struct.unpack_from(">I", moov, stsz + 12 + 4 * (number - 1))[0]
+
+    if b"co64" in tables:
+        chunk_table, width, fmt = tables[b"co64"], 8, ">Q"
+    else:
+        chunk_table, width, fmt = tables[b"stco"], 4, ">I"
+    chunk_count = struct.unpack_from(">I", moov, chunk_table + 4)[0]
+
+    stsc = tables[b"stsc"]
+    runs = [
+        struct.unpack_from(">II", moov, stsc + 8 + 12 * index)
+        for index in range(struct.unpack_from(">I", moov, stsc + 4)[0])
+    ]
+    first_in_chunk = 1
+    for index, (first_chunk, per_chunk) in enumerate(runs):
+        last_chunk = runs[index + 1][0] - 1 if index + 1 < len(runs) else chunk_count
+        run_samples = (last_chunk - first_chunk + 1) * per_chunk
+        if per_chunk and sample < first_in_chunk + run_samples:
+            chunk = first_chunk + (sample - first_in_chunk) // per_chunk
+            first_in_chunk += (chunk - first_chunk) * per_chunk
+            offset = struct.unpack_from(fmt, moov, chunk_table + 8 + width * (chunk - 1))[0]
+            offset += sum(sample_size(number) for number in range(first_in_chunk, sample))
+            return offset, sample_size(sample)
+        first_in_chunk += run_samples
+    return None
+
+
+def write_faststart(source: Path, target: Path, layout: Optional[Mp4Layout] = None) -> Mp4Layout:
+    """Write a copy of ``source`` with moov moved in front of the first mdat
+
+    Every stco/co64 chunk offset pointing into the data that moves is shifted by the
+    size of moov. The copy is written to a temporary file and renamed into place.
+    """
+    layout = layout or analyze(source)
+    if layout.faststart:
+        raise Mp4Error(f"{source.name} is already fast-start")
+    insert_at, moov_box = layout.first_mdat.offset, layout.moov
+    with open(source, "rb") as src:
+        moov = _read_moov(src, moov_box)
+        for count, first, width in _chunk_offset_tables(moov):
+            fmt = ">I" if width == 4 else ">Q"
+            for position in range(first, first + count * width, width):
+                offset = struct.unpack_from(fmt, moov, position)[0]
+                moved = layout.relocated(offset)
+                if moved >= 1 << (8 * width):
+                    # Would need stco upgraded to co64, which changes moov's own size
+                    raise Mp4Error(f"{source.name}: chunk offset {moved} no longer fits in stco")
+                struct.pack_into(fmt, moov, position, moved)
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_suffix(f"{target.suffix}.{os.getpid()}.tmp")
+        with open(partial, "wb") as dst:
+            _copy_range(src, dst, 0, insert_at)
+            dst.write(moov)
+            _copy_range(src, dst, insert_at, moov_box.offset - insert_at)
+            moov_end = moov_box.offset + moov_box.size
+            _copy_range(src, dst, moov_end, layout.size - moov_end)
+        partial.replace(target)
+    return layout
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, start: int, length: int) -> None:
+    src.seek(start)
+    while length > 0:
+        block = src.read(min(COPY_BLOCK_SIZE, length))
+        if not block:
+            raise Mp4Error("Source file shrank while it was being copied")
+        dst.write(block)
+        length -= len(block)
+
+
+def copy_path(cache_dir: Path, source: Path, digest: str) -> Path:
+    return cache_dir / f"{source.stem}-{digest[:16]}-faststart.mp4"
+
+
+class FaststartVideos:
+    """Fast-start copies of the course videos in a disk cache keyed by source hash
+
+    ``analyze()`` is cheap (box headers and moov only) and gives the preload hints
+    for the fast-start layout straight away; ``build()`` writes the copies that are
+    missing, so like the comic variants it is safe to run on every startup or ahead of
+    time from the command line. Until a copy exists the original is served, and
+    ``hints()`` returns None for it: the hints describe the fast-start layout only.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        # Keyed by source content hash
+        self.layouts: Dict[str, Mp4Layout] = {}
+        self.copies: Dict[str, Tuple[Path, os.stat_result]] = {}
+
+    def analyze(self, video) -> Optional[Mp4Layout]:
+        """Layout of a manifest entry, or None when it cannot be parsed as MP4"""
+        layout = self.layouts.get(video.digest)
+        if layout is None:
+            try:
+                layout = self.layouts[video.digest] = analyze(video.path)
+            except (Mp4Error, OSError, struct.error) as exc:
+                logger.warning("Not an MP4 we can rewrite: %s (%s)", video.path, exc)
+                return None
+        return layout
+
+    def hints(self, video) -> Optional[dict]:
+        """Byte ranges of the file ``served()`` gives for ``video``, None while that is a slow-start original"""
+        layout = self.analyze(video)
+        if layout is None or not (layout.faststart or video.digest in self.copies):
+            return None
+        return {
+            "moov_size": layout.moov_size,
+            "first_keyframe_offset": layout.first_keyframe_offset,
+            "first_keyframe_end": layout.first_keyframe_end,
+        }
+
+    def build(self, videos: Iterable) -> bool:
+        """Write the missing copies; True when a video got a copy it was not served from before"""
+        copies = dict(self.copies)
+        for video in videos:
+            layout = self.analyze(video)
+            if layout is None or layout.faststart:
+                continue
+            target = copy_path(self.cache_dir, video.path, video.digest)
+            try:
+                if not target.exists():
+                    write_faststart(video.path, target, layout)
+                    logger.info("Wrote fast-start copy of %s (moov %d bytes moved to the front)", video.path.name, layout.moov_size)
+                copies[video.digest] = (target, target.stat())
+            except (Mp4Error, OSError, struct.error) as exc:
+                logger.warning("Could not write a fast-start copy of %s: %s", video.path, exc)
+        added = copies.keys() - self.copies.keys()
+        self.copies = copies
+        return bool(added)
+
+    def build_in_background(self, videos: Iterable, on_added: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """Run ``build()`` in a thread, then ``on_added()`` if new copies are being served"""
+        def build(videos):
+            if self.build(videos) and on_added is not None:
+                on_added()
+
+        thread = threading.Thread(target=build, args=(list(videos),), name="video-faststart", daemon=True)
+        thread.start()
+        return thread
+
+    def served(self, video) -> Optional[Tuple[Path, os.stat_result, str]]:
+        """(path, stat, ETag) of the fast-start copy to serve instead of ``video``"""
+        copy = self.copies.get(video.digest)
+        if copy is None:
+            return None
+        path, st = copy
+        # Named after the source hash, so the name is a strong validator
+        return path, st, f'"{path.name}"'
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    here = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Report MP4 box layout and write fast-start copies")
+    parser.add_argument("files", nargs="*", type=Path, help="MP4 files (default: static/videos/*)")
+    parser.add_argument("--cache", type=Path, default=here / "data" / "cache" / "videos", help="where fast-start copies go")
+    parser.add_argument("--check", action="store_true", help="only report, do not write copies")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    files = args.files or sorted(path for path in (here / "static" / "videos").glob("*") if not path.name.startswith("."))
+    for path in files:
+        try:
+            layout = analyze(path)
+        except (Mp4Error, OSError, struct.error) as exc:
+            print(json.dumps({"file": str(path), "error": str(exc)}))
+            continue
+        print(json.dumps(layout.summary()))
+        if not args.check and not layout.faststart:
+            with open(path, "rb") as handle:
+                digest = hashlib.file_digest(handle, "sha256").hexdigest()
+            target = copy_path(args.cache, path, digest)
+            if not target.exists():
+                write_faststart(path, target, layout)
+            print(json.dumps(analyze(target).summary()))
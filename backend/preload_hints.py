@@ -0,0 +1,127 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Must match the sizes attribute of the comic <img>, or the browser picks another
+# srcset candidate than the one preloaded and downloads the page twice
+COMIC_IMAGE_SIZES = "(max-width: 768px) 100vw, 768px"
+EARLY_HINT_EXTENSION = "http.response.early_hint"
+
+
+class ModuleLinks:
+    """``Link`` header values pointing at one module's content and assets"""
+
+    __slots__ = ("prefetch", "preload")
+
+    def __init__(self, prefetch: List[str], preload: List[str]):
+        # While the learner is still in a prerequisite module: fetch when idle
+        self.prefetch = prefetch
+        # Right after the completion that unlocked it: fetch now
+        self.preload = preload
+
+
+def _module_links(content_url: str, data: dict) -> ModuleLinks:
+    origins, images = [], []
+    _collect(data, origins, images)
+    preconnect = [f"<{origin}>; rel=preconnect" for origin in dict.fromkeys(origins)]
+    prefetch = [f"<{content_url}>; rel=prefetch; as=fetch; crossorigin"] + preconnect
+    preload = [f"<{content_url}>; rel=preload; as=fetch; crossorigin"] + preconnect
+    for index, (url, srcset) in enumerate(images):
+        if srcset:
+            # Only a preload can say which srcset candidate it is for; prefetching a
+            # fixed width would likely fetch a page the browser then does not use
+            if index == 0:
+                preload.append(f'<{url}>; rel=preload; as=image; imagesrcset="{srcset}"; imagesizes="{COMIC_IMAGE_SIZES}"')
+            continue
+        prefetch.append(f"<{url}>; rel=prefetch; as=image")
+        preload.append(f"<{url}>; rel={'preload' if index == 0 else 'prefetch'}; as=image")
+    return ModuleLinks(prefetch, preload)
+
+
+def _collect(node, origins: List[str], images: List[Tuple[str, Optional[str]]]) -> None:
+    # Videos are left out on purpose: a preload fetches the whole file, which the
+    # <video> element's own range requests cannot reuse
+    if isinstance(node, dict):
+        if "image_url" in node:
+            images.append((node["image_url"], node.get("srcset")))
+        for key, value in node.items():
+            if key.endswith("iframe_url") and isinstance(value, str):
+                origins.append("{0.scheme}://{0.netloc}".format(urlsplit(value)))
+            else:
+                _collect(value, origins, images)
+    elif isinstance(node, list):
+        for item in node:
+            _collect(item, origins, images)
+
+
+MODULE_PATH = re.compile(r"^/api/(?:module/(\d+)/content|session/[^/]+/module/(\d+)/complete)$")
+
+
+class PreloadHints:
+    """Preload/prefetch ``Link`` values for the modules that follow each module
+
+    Everything is computed by ``rebuild()`` from the module graph and the rendered
+    module content, so requests only look strings up. Call it whenever the module
+    content is recompiled.
+    """
+
+    def __init__(self, dependents: Dict[int, Tuple[int, ...]], content_url: Callable[[int], str]):
+        self.dependents = dependents
+        self.content_url = content_url
+        self.modules: Dict[int, ModuleLinks] = {}
+        # module id -> Link header for that module's content response
+        self.next_prefetch: Dict[int, str] = {}
+        # (method, module id) -> 103 links for a content GET or completion POST
+        self.early_hints: Dict[Tuple[str, int], List[bytes]] = {}
+
+    def rebuild(self, content: Dict[int, dict]) -> None:
+        modules = {module_id: _module_links(self.content_url(module_id), data) for module_id, data in content.items()}
+        next_prefetch, early_hints = {}, {}
+        for module_id, dependents in self.dependents.items():
+            following = [modules[dependent] for dependent in dependents if dependent in modules]
+            if not following:
+                continue
+            prefetch = [link for links in following for link in links.prefetch]
+            next_prefetch[module_id] = ", ".join(prefetch)
+            early_hints["GET", module_id] = [link.encode("latin-1") for link in prefetch]
+            # Sent before the completion is processed, so for every dependent; the
+            # final response only preloads the ones it actually unlocked
+            early_hints["POST", module_id] = [link.encode("latin-1") for links in following for link in links.preload]
+        # Swapped in whole, like the compiled content itself
+        self.modules, self.next_prefetch, self.early_hints = modules, next_prefetch, early_hints
+
+    def preload(self, module_ids) -> Optional[str]:
+        """Link header preloading the given (just unlocked) modules"""
+        links = [link for module_id in module_ids if module_id in self.modules for link in self.modules[module_id].preload]
+        return ", ".join(links) or None
+
+    def early_hint_links(self, method: str, path: str) -> Optional[List[bytes]]:
+        match = MODULE_PATH.match(path)
+        if match is None:
+            return None
+        content_id, completed_id = match.groups()
+        if content_id and method == "GET":
+            return self.early_hints.get(("GET", int(content_id)))
+        if completed_id and method == "POST":
+            return self.early_hints.get(("POST", int(completed_id)))
+        return None
+
+
+class EarlyHintsMiddleware:
+    """Sends 103 Early Hints before the response when the server supports them
+
+    Uses the ASGI ``http.response.early_hint`` extension (Hypercorn, for example);
+    servers without it, uvicorn included, are left alone. ``links(method, path)``
+    returns the Link values for a request or None.
+    """
+
+    def __init__(self, app, links: Callable[[str, str], Optional[List[bytes]]]):
+        self.app = app
+        self.links = links
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and EARLY_HINT_EXTENSION in scope.get("extensions", {}):
+            links = self.links(scope["method"], scope["path"])
+            if links:
+                await send({"type": EARLY_HINT_EXTENSION, "links": links})
+        await self.app(scope, receive, send)
@@ -0,0 +1,256 @@
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Leaf frames of threads parked waiting for work; sampling them only adds noise
+IDLE_LEAVES = {("threading.py", "wait"), ("selectors.py", "select"), ("threading.py", "_wait_for_tstate_lock")}
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+
+def _short_path(filename: str) -> str:
+    for marker in ("site-packages" + os.sep, "backend" + os.sep, "api" + os.sep):
+        index = filename.rfind(marker)
+        if index >= 0:
+            return filename[index + len(marker):] if marker.startswith("site") else filename[index:]
+    return os.path.basename(filename)
+
+
+def sample_stacks(skip: Iterable[int] = (), include_idle: bool = False) -> Dict[int, Stack]:
+    """Current Python stack of every thread, outermost frame first, keyed by thread id"""
+    stacks = {}
+    skip = set(skip)
+    for ident, frame in sys._current_frames().items():
+        if ident in skip:
+            continue
+        code = frame.f_code
+        if not include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+            continue
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()
+        stacks[ident] = tuple(stack)
+    return stacks
+
+
+def _frame_name(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({_short_path(filename)}:{line})"
+
+
+def collapsed(counts: Counter) -> str:
+    """Brendan Gregg's folded format: ``thread;outer;...;inner count`` per line"""
+    return "".join(
+        ";".join([thread] + [_frame_name(frame) for frame in stack]) + f" {count}\n"
+        for (thread, stack), count in counts.most_common()
+    )
+
+
+def speedscope(counts: Counter, interval: float, duration: float, name: str) -> dict:
+    """speedscope's file format: one sampled profile per thread, identical stacks merged"""
+    frames: List[dict] = []
+    frame_index: Dict[Tuple[str, str, int], int] = {}
+    profiles: Dict[str, dict] = {}
+    for (thread, stack), count in counts.most_common():
+        indexes = []
+        for frame in stack:
+            index = frame_index.get(frame)
+            if index is None:
+                index = frame_index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": _short_path(frame[1]), "line": frame[2]})
+            indexes.append(index)
+        profile = profiles.setdefault(
+            thread,
+            {"type": "sampled", "name": thread, "unit": "seconds", "startValue": 0, "endValue": duration, "samples": [], "weights": []},
+        )
+        profile["samples"].append(indexes)
+        profile["weights"].append(count * interval)
+    return {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "name": name,
+        "exporter": "odl-backend",
+        "shared": {"frames": frames},
+        "profiles": list(profiles.values()),
+    }
+
+
+class SamplingProfiler:
+    """Time-boxed statistical profiler for the whole worker process
+
+    ``run()`` polls ``sys._current_frames()`` every ``interval`` seconds from the
+    calling thread and counts identical (thread, stack) pairs. Nothing is installed in
+    the interpreter, so requests pay nothing, and the cost while sampling is one
+    stack walk per busy thread per tick. One profile runs at a time per process.
+    """
+
+    def __init__(self, max_seconds: float = 60.0, min_interval: float = 0.001):
+        self.max_seconds = max_seconds
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, interval: float = 0.005, include_idle: bool = False) -> Optional[Tuple[Counter, int, float]]:
+        """Sample for ``seconds``; returns (counts, ticks, elapsed), or None if a profile is running"""
+        if not (math.isfinite(seconds) and math.isfinite(interval)):
+            # A NaN deadline is never reached, and the lock would be held forever
+            raise ValueError("seconds and interval must be finite")
+        seconds = min(max(seconds, interval), self.max_seconds)
+        interval = max(interval, self.min_interval)
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            counts: Counter = Counter()
+            me = threading.get_ident()
+            started = time.perf_counter()
+            deadline = started + seconds
+            ticks = 0
+            while True:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, stack in sample_stacks(skip=(me,), include_idle=include_idle).items():
+                    counts[(names.get(ident, str(ident)), stack)] += 1
+                ticks += 1
+                now = time.perf_counter()
+                if now >= deadline:
+                    return counts, ticks, now - started
+                time.sleep(min(interval, deadline - now))
+        finally:
+            self._lock.release()
+
+
+class _InFlight:
+    __slots__ = ("method", "path", "started", "response_started", "status", "stacks")
+
+    def __init__(self, method: str, path: str, started: float):
+        self.method = method
+        self.path = path
+        self.started = started
+        self.response_started: Optional[float] = None
+        self.status: Optional[int] = None
+        self.stacks: Counter = Counter()
+
+
+class SlowRequestLog:
+    """Requests slower than ``threshold`` seconds, newest last, at most ``capacity`` of them
+
+    A watchdog thread checks the in-flight requests every ``interval`` seconds. Only
+    while one of them has run past the threshold does it sample thread stacks, which
+    are attributed to every request over the threshold at that moment (on a busy
+    worker that includes stacks of the requests they were competing with, which is
+    usually the point). A request that finishes over the threshold is recorded with
+    its timing breakdown and its most frequent stacks.
+    """
+
+    def __init__(self, threshold: float, capacity: int = 50, interval: float = 0.01, max_stacks: int = 20):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.captured = 0
+        self.entries: deque = deque(maxlen=capacity)
+        self._in_flight: Dict[int, _InFlight] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._watchdog = threading.Thread(target=self._watch, name="slow-request-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=5)
+            self._watchdog = None
+
+    def begin(self, method: str, path: str) -> Tuple[int, _InFlight]:
+        request = _InFlight(method, path, time.perf_counter())
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._in_flight[request_id] = request
+        return request_id, request
+
+    def end(self, request_id: int, request: _InFlight, route: Optional[str]) -> None:
+        with self._lock:
+            del self._in_flight[request_id]
+        finished = time.perf_counter()
+        duration = finished - request.started
+        if duration < self.threshold:
+            return
+        first_byte = (request.response_started or finished) - request.started
+        with self._lock:
+            stacks = request.stacks.most_common(self.max_stacks)
+        self.captured += 1
+        self.entries.append(
+            {
+                "at": time.time() - (finished - request.started),
+                "method": request.method,
+                "path": request.path,
+                "route": route,
+                "status": request.status,
+                "seconds": {"total": duration, "until_response_start": first_byte, "sending_body": duration - first_byte},
+                "samples": sum(request.stacks.values()),
+                "stacks": [
+                    {"thread": thread, "count": count, "frames": [_frame_name(frame) for frame in stack]}
+                    for (thread, stack), count in stacks
+                ],
+            }
+        )
+
+    def snapshot(self) -> List[dict]:
+        return list(self.entries)
+
+    def _watch(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            with self._lock:
+                slow = [request for request in self._in_flight.values() if now - request.started >= self.threshold]
+            if not slow:
+                continue
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            samples = [(names.get(ident, str(ident)), stack) for ident, stack in sample_stacks(skip=(me,)).items()]
+            with self._lock:
+                for request in slow:
+                    request.stacks.update(samples)
+
+
+class SlowRequestMiddleware:
+    """Pure ASGI middleware feeding ``SlowRequestLog``; installed only when enabled"""
+
+    def __init__(self, app: ASGIApp, log: SlowRequestLog):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id, request = self.log.begin(scope["method"], scope["path"])
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                request.response_started = time.perf_counter()
+                request.status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.log.end(request_id, request, getattr(route, "path", None))
@@ -0,0 +1,246 @@
+import logging
+import os
+import secrets
+import stat
+import threading
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """Parse a Range header into sorted, merged inclusive (start, end) byte ranges
+
+    Returns None when the header should be ignored (absent, malformed, not bytes,
+    or too many ranges) and raises RangeNotSatisfiable when no range overlaps the file.
+    """
+    if not header:
+        return None
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+    ranges = []
+    for spec in specs.split(","):
+        first, dash, last = spec.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else max(start, size - 1)
+                if start > end:
+                    return None
+            else:
+                suffix = int(last)
+                start, end = max(size - suffix, 0), size - 1
+                if suffix == 0:
+                    continue
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class FileDescriptorPool:
+    """Shares one read-only descriptor per file between concurrent streams
+
+    Reads use ``os.pread`` so any number of streams can read the same descriptor at
+    different offsets. Up to ``max_idle`` unused descriptors stay open for reuse.
+    When a file is replaced while streams still read it, new streams get a fresh
+    descriptor and the old one is closed once its last stream releases it.
+    """
+
+    def __init__(self, max_idle: int = 8):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        # path -> [fd, users, (st_size, st_mtime_ns)]
+        self._open: Dict[str, list] = {}
+        # fd -> entry, for descriptors of replaced files still in use
+        self._retired: Dict[int, list] = {}
+
+    def acquire(self, path: str, signature: Tuple[int, int]) -> int:
+        with self._lock:
+            entry = self._open.get(path)
+            if entry is not None and entry[2] != signature:
+                # File was replaced since the descriptor was opened
+                del self._open[path]
+                if entry[1] == 0:
+                    os.close(entry[0])
+                else:
+                    self._retired[entry[0]] = entry
+                entry = None
+            if entry is None:
+                entry = [os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0)), 0, signature]
+                self._open[path] = entry
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, path: str, fd: int) -> None:
+        with self._lock:
+            retired = self._retired.get(fd)
+            if retired is not None:
+                retired[1] -= 1
+                if retired[1] == 0:
+                    os.close(self._retired.pop(fd)[0])
+                return
+            entry = self._open[path]
+            entry[1] -= 1
+            idle = [p for p, e in self._open.items() if e[1] == 0]
+            while len(idle) > self.max_idle:
+                os.close(self._open.pop(idle.pop(0))[0])
+
+
+def _pread(fd: int, length: int, offset: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(fd, length, offset)
+    # Windows has no pread; duplicate the descriptor so the shared offset is untouched
+    with os.fdopen(os.dup(fd), "rb") as handle:
+        handle.seek(offset)
+        return handle.read(length)
+
+
+class RangeFileResponse(Response):
+    """File response honoring Range/If-Range with 200, 206 (single or multipart) and 416"""
+
+    def __init__(
+        self,
+        path: Path,
+        request_headers,
+        pool: FileDescriptorPool,
+        media_type: str,
+        block_size: int = 64 * 1024,
+        headers: Optional[dict] = None,
+        stat_result: Optional[os.stat_result] = None,
+        etag: Optional[str] = None,
+    ):
+        self.path = str(path)
+        self.pool = pool
+        self.block_size = block_size
+        self.media_type = media_type
+        self.background = None
+        st = stat_result or os.stat(self.path)
+        if not stat.S_ISREG(st.st_mode):
+            raise FileNotFoundError(self.path)
+        self.size = st.st_size
+        self.signature = (st.st_size, st.st_mtime_ns)
+        etag = etag or f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        last_modified = formatdate(st.st_mtime, usegmt=True)
+        base_headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": etag,
+            "Last-Modified": last_modified,
+            **(headers or {}),
+        }
+
+        ranges = None
+        if_range = request_headers.get("if-range")
+        if if_range is None or if_range.strip() in (etag, last_modified):
+            try:
+                ranges = parse_range(request_headers.get("range"), self.size)
+            except RangeNotSatisfiable:
+                self.status_code = 416
+                self.body = b""
+                self.parts: List[Tuple[bytes, int, int]] = []
+                self.trailer = b""
+                base_headers["Content-Range"] = f"bytes */{self.size}"
+                self.init_headers(base_headers)
+                return
+
+        if ranges is None:
+            self.status_code = 200
+            self.parts = [(b"", 0, self.size)] if self.size else []
+            self.trailer = b""
+            content_length = self.size
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            self.parts = [(b"", start, end - start + 1)]
+            self.trailer = b""
+            content_length = end - start + 1
+            base_headers["Content-Range"] = f"bytes {start}-{end}/{self.size}"
+        else:
+            boundary = secrets.token_hex(16)
+            self.status_code = 206
+            self.parts = [
+                (
+                    f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n".encode("latin-1"),
+                    start,
+                    end - start + 1,
+                )
+                for start, end in ranges
+            ]
+            self.trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            # Every part after the first is preceded by the CRLF that ends the previous one
+            self.parts = [self.parts[0]] + [(b"\r\n" + prefix, s, n) for prefix, s, n in self.parts[1:]]
+            content_length = sum(len(prefix) + n for prefix, _, n in self.parts) + len(self.trailer)
+            self.media_type = f"multipart/byteranges; boundary={boundary}"
+        base_headers["Content-Length"] = str(content_length)
+        self.init_headers(base_headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or not self.parts:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with anyio.create_task_group() as task_group:
+
+            async def stream_and_cancel() -> None:
+                await self._stream(send)
+                task_group.cancel_scope.cancel()
+
+            async def cancel_on_disconnect() -> None:
+                while (await receive())["type"] != "http.disconnect":
+                    pass
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(stream_and_cancel)
+            await cancel_on_disconnect()
+
+    async def _stream(self, send: Send) -> None:
+        fd = self.pool.acquire(self.path, self.signature)
+        try:
+            for prefix, offset, remaining in self.parts:
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                while remaining > 0:
+                    chunk = await run_in_threadpool(_pread, fd, min(self.block_size, remaining), offset)
+                    if not chunk:
+                        # The file shrank underneath us. Content-Length is already out,
+                        # so fail the response: the server then closes the connection
+                        # instead of leaving the client waiting on a truncated body.
+                        logger.warning("%s shrank while streaming it (%d bytes missing)", self.path, remaining)
+                        raise OSError(f"{self.path} shrank while streaming")
+                    offset += len(chunk)
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": self.trailer, "more_body": False})
+        finally:
+            self.pool.release(self.path, fd)
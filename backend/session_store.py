@@ -0,0 +1,349 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+from course_engine import Course, CourseFunnel, ModuleStatus, SessionState, SessionSummary, SessionTokenCodec
+
+
+class SessionRecord:
+    """Compact per-session progress; completed modules are kept as a bitmask"""
+
+    __slots__ = (
+        "user_name",
+        "current_module",
+        "quiz_score",
+        "quiz_completed",
+        "completed_mask",
+        "last_seen",
+        "started_at",
+    )
+
+    def __init__(self, user_name: str, now: float):
+        self.user_name = user_name
+        self.current_module = 1
+        self.quiz_score = 0
+        self.quiz_completed = False
+        self.completed_mask = 0
+        self.last_seen = now
+        self.started_at = now
+
+
+class ProgressUpdate(NamedTuple):
+    """One completion of a batch: a module when ``module_id`` is set, else the quiz"""
+
+    session_id: str
+    module_id: Optional[int] = None
+
+
+class SessionStore:
+    """Base class for session backends; serializes progress through the course engine
+
+    Implementations report every state transition to ``funnel``, so completion
+    statistics never require scanning the stored sessions.
+    """
+
+    # True when the session id itself carries the state and changes on every write
+    stateless = False
+
+    def __init__(self, course: Course, max_sessions: int = 10000, ttl_seconds: float = 6 * 3600):
+        self.course = course
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self.expirations = 0
+        self.funnel = CourseFunnel(course)
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def create(self, user_name: str) -> str:
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    def complete_module(self, session_id: str, module_id: int) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    def complete_quiz(self, session_id: str) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    def create_many(self, user_names: List[str]) -> List[str]:
+        """Create one session per name, in a single store transaction where there is one"""
+        return [self.create(user_name) for user_name in user_names]
+
+    def apply_progress(self, updates: List[ProgressUpdate]) -> List[Optional[SessionRecord]]:
+        """Apply completions in order; one result per update, None for unknown sessions
+
+        Results are the stored records, so several updates to one session all show
+        its state after the whole batch.
+        """
+        return [
+            self.complete_module(update.session_id, update.module_id)
+            if update.module_id is not None
+            else self.complete_quiz(update.session_id)
+            for update in updates
+        ]
+
+    def close(self) -> None:
+        pass
+
+    def issue_id(self, session_id: str, record: SessionRecord) -> str:
+        """Session id the client should use after a write"""
+        return session_id
+
+    def analytics_id(self, session_id: str, record: Optional[SessionRecord] = None) -> str:
+        """Id to record in analytics events: stable for the session and not a credential"""
+        return session_id
+
+    def all_completed(self, record: SessionRecord) -> bool:
+        return self.course.is_complete(record.completed_mask)
+
+    def module_list(self, record: SessionRecord) -> List[ModuleStatus]:
+        return self.course.module_list(record.completed_mask)
+
+    def is_unlocked(self, record: SessionRecord, module_id: int) -> bool:
+        return self.course.is_unlocked(record.completed_mask, module_id)
+
+    def summary(self, record: SessionRecord) -> SessionSummary:
+        return SessionSummary(
+            record.user_name,
+            record.current_module,
+            record.quiz_score,
+            self.course.completed_ids(record.completed_mask),
+            record.quiz_completed,
+        )
+
+    def state(self, record: SessionRecord) -> SessionState:
+        return SessionState(
+            record.user_name,
+            self.module_list(record),
+            record.current_module,
+            record.quiz_score,
+            self.course.completed_ids(record.completed_mask),
+            record.quiz_completed,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend_name,
+            "size": len(self),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """In-memory session store bounded by entry count and idle TTL (LRU eviction)"""
+
+    backend_name = "memory"
+
+    def __init__(self, course: Course, max_sessions: int = 10000, ttl_seconds: float = 6 * 3600):
+        super().__init__(course, max_sessions, ttl_seconds)
+        self._sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, user_name: str) -> str:
+        now = time.monotonic()
+        session_id = str(uuid.uuid4())
+        with self._lock:
+            self._expire(now)
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+            self._sessions[session_id] = SessionRecord(user_name, now)
+        self.funnel.session_started()
+        return session_id
+
+    def create_many(self, user_names: List[str]) -> List[str]:
+        now = time.monotonic()
+        session_ids = [str(uuid.uuid4()) for _ in user_names]
+        with self._lock:
+            self._expire(now)
+            while self._sessions and len(self._sessions) + len(session_ids) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+            for session_id, user_name in zip(session_ids, user_names):
+                self._sessions[session_id] = SessionRecord(user_name, now)
+        for _ in session_ids:
+            self.funnel.session_started()
+        return session_ids
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            return self._touch(session_id)
+
+    def complete_module(self, session_id: str, module_id: int) -> Optional[SessionRecord]:
+        bit = self.course.bit(module_id)
+        with self._lock:
+            record = self._touch(session_id)
+            if record is None:
+                return None
+            previous_mask = record.completed_mask
+            record.completed_mask |= bit
+            completed_mask = record.completed_mask
+        # Memory sessions keep monotonic timestamps, so started_at pairs with last_seen
+        self.funnel.module_completed(previous_mask, completed_mask, record.started_at, record.last_seen)
+        return record
+
+    def complete_quiz(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            record = self._touch(session_id)
+            if record is None:
+                return None
+            was_completed = record.quiz_completed
+            record.quiz_completed = True
+        self.funnel.quiz_completed(was_completed)
+        return record
+
+    def apply_progress(self, updates: List[ProgressUpdate]) -> List[Optional[SessionRecord]]:
+        results, transitions = [], []
+        with self._lock:
+            for update in updates:
+                record = self._touch(update.session_id)
+                results.append(record)
+                if record is None:
+                    continue
+                if update.module_id is not None:
+                    previous_mask = record.completed_mask
+                    record.completed_mask |= self.course.bit(update.module_id)
+                    transitions.append((previous_mask, record.completed_mask, record.started_at, record.last_seen))
+                else:
+                    transitions.append(record.quiz_completed)
+                    record.quiz_completed = True
+        for transition in transitions:
+            if isinstance(transition, tuple):
+                self.funnel.module_completed(*transition)
+            else:
+                self.funnel.quiz_completed(transition)
+        return results
+
+    def _touch(self, session_id: str) -> Optional[SessionRecord]:
+        record = self._sessions.get(session_id)
+        if record is None:
+            return None
+        now = time.monotonic()
+        if now - record.last_seen > self.ttl_seconds:
+            del self._sessions[session_id]
+            self.expirations += 1
+            return None
+        record.last_seen = now
+        self._sessions.move_to_end(session_id)
+        return record
+
+    def _expire(self, now: float) -> None:
+        # Entries are kept in last-seen order, so expired ones sit at the front
+        while self._sessions:
+            session_id, record = next(iter(self._sessions.items()))
+            if now - record.last_seen <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            self.expirations += 1
+
+
+class TokenSessionStore(SessionStore):
+    """Stateless sessions: the session id is a signed token holding the progress
+
+    Nothing is stored server-side, so any worker or Function instance can serve any
+    learner. Every write returns a refreshed token via ``issue_id``.
+    """
+
+    backend_name = "token"
+    stateless = True
+
+    def __init__(self, course: Course, secret: str, ttl_seconds: float = 6 * 3600, **_):
+        super().__init__(course, max_sessions=0, ttl_seconds=ttl_seconds)
+        self.codec = SessionTokenCodec(secret, course.id, ttl_seconds)
+
+    def __len__(self) -> int:
+        return 0
+
+    def create(self, user_name: str) -> str:
+        self.funnel.session_started()
+        return self.codec.issue(user_name)
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        claims = self.codec.verify(session_id)
+        if claims is None:
+            return None
+        record = SessionRecord(claims.user_name, claims.issued_at)
+        record.completed_mask = claims.completed_mask
+        record.quiz_completed = claims.quiz_completed
+        record.started_at = claims.started_at
+        return record
+
+    def complete_module(self, session_id: str, module_id: int) -> Optional[SessionRecord]:
+        record = self.get(session_id)
+        if record is None:
+            return None
+        previous_mask = record.completed_mask
+        record.completed_mask |= self.course.bit(module_id)
+        self.funnel.module_completed(previous_mask, record.completed_mask, record.started_at, time.time())
+        return record
+
+    def complete_quiz(self, session_id: str) -> Optional[SessionRecord]:
+        record = self.get(session_id)
+        if record is None:
+            return None
+        self.funnel.quiz_completed(record.quiz_completed)
+        record.quiz_completed = True
+        return record
+
+    def apply_progress(self, updates: List[ProgressUpdate]) -> List[Optional[SessionRecord]]:
+        # Several updates for one token build on each other, so each token is verified
+        # once and every result for it carries the state after the whole batch
+        records: Dict[str, Optional[SessionRecord]] = {}
+        results = []
+        for update in updates:
+            if update.session_id not in records:
+                records[update.session_id] = self.get(update.session_id)
+            record = records[update.session_id]
+            results.append(record)
+            if record is None:
+                continue
+            if update.module_id is not None:
+                previous_mask = record.completed_mask
+                record.completed_mask |= self.course.bit(update.module_id)
+                self.funnel.module_completed(previous_mask, record.completed_mask, record.started_at, time.time())
+            else:
+                self.funnel.quiz_completed(record.quiz_completed)
+                record.quiz_completed = True
+        return results
+
+    def analytics_id(self, session_id: str, record: Optional[SessionRecord] = None) -> str:
+        # The token itself is a bearer credential and changes on every write
+        record = record or self.get(session_id)
+        if record is None:
+            return ""
+        return self.codec.subject(record.user_name, int(record.started_at))
+
+    def issue_id(self, session_id: str, record: SessionRecord) -> str:
+        return self.codec.issue(record.user_name, record.completed_mask, record.quiz_completed, record.started_at)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        cache = self.codec.cache_info()
+        stats.update(verify_cache_hits=cache.hits, verify_cache_misses=cache.misses)
+        return stats
+
+
+def create_session_store(course: Course, backend: str, **options) -> SessionStore:
+    """Build the session backend selected by name ("memory", "sqlite" or "token")"""
+    if backend == "token":
+        options.pop("path", None)
+        return TokenSessionStore(course, **options)
+    options.pop("secret", None)
+    if backend == "memory":
+        options.pop("path", None)
+        return MemorySessionStore(course, **options)
+    if backend == "sqlite":
+        from sqlite_session_store import SQLiteSessionStore
+        return SQLiteSessionStore(course, **options)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,406 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from course_engine import Course, funnel_report, module_transition
+from session_store import ProgressUpdate, SessionRecord, SessionStore
+
+logger = logging.getLogger(__name__)
+
+# Statements are constant strings so sqlite3's per-connection statement cache reuses them
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_name TEXT NOT NULL,
+    current_module INTEGER NOT NULL,
+    quiz_score INTEGER NOT NULL,
+    quiz_completed INTEGER NOT NULL,
+    completed_mask INTEGER NOT NULL,
+    last_seen REAL NOT NULL,
+    started_at REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+CREATE TABLE IF NOT EXISTS funnel_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS completion_times (seconds REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS completion_times_seconds ON completion_times (seconds);
+"""
+# Databases created before started_at existed get the column added on open
+ADD_STARTED_AT = "ALTER TABLE sessions ADD COLUMN started_at REAL NOT NULL DEFAULT 0"
+SELECT_SESSION = (
+    "SELECT user_name, current_module, quiz_score, quiz_completed, completed_mask, last_seen, started_at "
+    "FROM sessions WHERE session_id = ?"
+)
+INSERT_SESSION = (
+    "INSERT INTO sessions (session_id, user_name, current_module, quiz_score, quiz_completed, completed_mask, last_seen, started_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SELECT_PROGRESS = "SELECT completed_mask, quiz_completed, started_at FROM sessions WHERE session_id = ?"
+UPDATE_MODULE = "UPDATE sessions SET completed_mask = completed_mask | ?, last_seen = ? WHERE session_id = ?"
+UPDATE_QUIZ = "UPDATE sessions SET quiz_completed = 1, last_seen = ? WHERE session_id = ?"
+UPDATE_LAST_SEEN = "UPDATE sessions SET last_seen = ? WHERE session_id = ?"
+DELETE_EXPIRED = "DELETE FROM sessions WHERE last_seen < ?"
+DELETE_OLDEST = "DELETE FROM sessions WHERE session_id IN (SELECT session_id FROM sessions ORDER BY last_seen LIMIT ?)"
+COUNT_SESSIONS = "SELECT COUNT(*) FROM sessions"
+BUMP_COUNTER = (
+    "INSERT INTO funnel_counters (name, value) VALUES (?, ?) "
+    "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value"
+)
+INSERT_COMPLETION_TIME = "INSERT INTO completion_times (seconds) VALUES (?)"
+SELECT_COUNTERS = "SELECT name, value FROM funnel_counters"
+COUNT_COMPLETION_TIMES = "SELECT COUNT(*) FROM completion_times"
+SELECT_COMPLETION_TIME = "SELECT seconds FROM completion_times ORDER BY seconds LIMIT 1 OFFSET ?"
+
+
+class SQLiteFunnel:
+    """Completion funnel kept in the session database, shared by every worker
+
+    The committer counts each transition inside the transaction that applies it, from
+    the session row as that transaction sees it. The write lock is held from that read
+    to the update, so concurrent completions of one module count once, whichever
+    thread or worker they come from. The median time to complete is exact, read from
+    an index over every completion time.
+    """
+
+    scope = "database"
+
+    def __init__(self, course: Course, query: Callable[[str, tuple], list]):
+        self.course = course
+        self.query = query
+
+    def count_started(self, counts: Counter, sessions: int) -> None:
+        counts["sessions_started"] += sessions
+        self._count(counts, "reached", self.course.unlocked_mask(0), sessions)
+
+    def count_module(self, counts: Counter, times: List[float], previous_mask: int, completed_mask: int, started_at: float, now: float) -> None:
+        newly_completed, newly_unlocked, finished = module_transition(self.course, previous_mask, completed_mask)
+        self._count(counts, "completed", newly_completed)
+        self._count(counts, "reached", newly_unlocked)
+        if finished:
+            counts["course_completions"] += 1
+            # Sessions migrated without a start time report 0 and are left out
+            if started_at > 0:
+                times.append(now - started_at)
+
+    def _count(self, counts: Counter, kind: str, mask: int, amount: int = 1) -> None:
+        for module in self.course.modules:
+            if mask & module.bit:
+                counts[f"{kind}:{module.id}"] += amount
+
+    @staticmethod
+    def save(conn: sqlite3.Connection, counts: Counter, times: List[float]) -> None:
+        if counts:
+            conn.executemany(BUMP_COUNTER, counts.items())
+        if times:
+            conn.executemany(INSERT_COMPLETION_TIME, [(seconds,) for seconds in times])
+
+    def stats(self) -> dict:
+        counters = dict(self.query(SELECT_COUNTERS, ()))
+        completions = self.query(COUNT_COMPLETION_TIMES, ())[0][0]
+        median = self.query(SELECT_COMPLETION_TIME, (round(0.5 * (completions - 1)),))[0][0] if completions else None
+        return funnel_report(
+            self.course,
+            self.scope,
+            counters.get("sessions_started", 0),
+            counters.get("quiz_completions", 0),
+            counters.get("course_completions", 0),
+            median,
+            [counters.get(f"reached:{module.id}", 0) for module in self.course.modules],
+            [counters.get(f"completed:{module.id}", 0) for module in self.course.modules],
+        )
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=64)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite (WAL) session store shared by every uvicorn worker on the host
+
+    Writes are queued to a single committer thread which groups whatever arrives
+    within ``batch_window`` seconds into one transaction. Callers block until their
+    batch is committed, so a session is visible to other workers as soon as the
+    request that wrote it returns. Reads go through a small per-worker cache that is
+    dropped whenever ``PRAGMA data_version`` reports a commit from any connection.
+    Funnel counters live in the same database (``SQLiteFunnel``).
+    """
+
+    backend_name = "sqlite"
+
+    def __init__(
+        self,
+        course: Course,
+        path: str,
+        max_sessions: int = 10000,
+        ttl_seconds: float = 6 * 3600,
+        cache_size: int = 256,
+        batch_window: float = 0.002,
+        max_batch: int = 128,
+    ):
+        super().__init__(course, max_sessions, ttl_seconds)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.cache_size = cache_size
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.batched_writes = 0
+
+        self._writer = _connect(path)
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        self._writer.executescript(SCHEMA)
+        columns = {row[1] for row in self._writer.execute("PRAGMA table_info(sessions)")}
+        if "started_at" not in columns:
+            self._writer.execute(ADD_STARTED_AT)
+
+        self._reader = _connect(path)
+        self._read_lock = threading.Lock()
+        self._data_version = None
+        self._cache: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self.funnel = SQLiteFunnel(course, self._query)
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._last_purge = 0.0
+        self._committer = threading.Thread(target=self._run_committer, name="session-committer", daemon=True)
+        self._committer.start()
+
+    def __len__(self) -> int:
+        with self._read_lock:
+            return self._reader.execute(COUNT_SESSIONS).fetchone()[0]
+
+    def create(self, user_name: str) -> str:
+        return self.create_many([user_name])[0]
+
+    def create_many(self, user_names: List[str]) -> List[str]:
+        now = time.time()
+        session_ids = [str(uuid.uuid4()) for _ in user_names]
+        statements = []
+        for session_id, user_name in zip(session_ids, user_names):
+            record = SessionRecord(user_name, now)
+            statements.append(
+                (
+                    INSERT_SESSION,
+                    (
+                        session_id,
+                        record.user_name,
+                        record.current_module,
+                        record.quiz_score,
+                        0,
+                        record.completed_mask,
+                        record.last_seen,
+                        record.started_at,
+                    ),
+                )
+            )
+        counts: Counter = Counter()
+        self.funnel.count_started(counts, len(session_ids))
+        statements.extend((BUMP_COUNTER, item) for item in counts.items())
+        # One transaction for the whole roster, counters included
+        self._write_all(statements)
+        return session_ids
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        record = self._read(session_id)
+        if record is None:
+            return None
+        now = time.time()
+        if now - record.last_seen > self.ttl_seconds:
+            return None
+        # Refresh the idle timer occasionally rather than on every read
+        if now - record.last_seen > min(60.0, self.ttl_seconds / 10):
+            record.last_seen = now
+            self._queue.put((self._statements([(UPDATE_LAST_SEEN, (now, session_id))]), None))
+        return record
+
+    def complete_module(self, session_id: str, module_id: int) -> Optional[SessionRecord]:
+        return self.apply_progress([ProgressUpdate(session_id, module_id)])[0]
+
+    def complete_quiz(self, session_id: str) -> Optional[SessionRecord]:
+        return self.apply_progress([ProgressUpdate(session_id)])[0]
+
+    def apply_progress(self, updates: List[ProgressUpdate]) -> List[Optional[SessionRecord]]:
+        # Expired sessions are refused before anything is written
+        live = {session_id for session_id in {update.session_id for update in updates} if self.get(session_id) is not None}
+        now = time.time()
+        writes = [update for update in updates if update.session_id in live]
+        applied = self._run(lambda conn: self._apply(conn, writes, now)) if writes else set()
+        current = {session_id: self._read(session_id) for session_id in applied}
+        return [current.get(update.session_id) for update in updates]
+
+    def _apply(self, conn: sqlite3.Connection, updates: List[ProgressUpdate], now: float) -> set:
+        """Apply completions and count their funnel transitions, in the committer's transaction
+
+        Returns the ids of the sessions that still existed.
+        """
+        counts: Counter = Counter()
+        times: List[float] = []
+        states: Dict[str, Optional[list]] = {}
+        for update in updates:
+            if update.session_id not in states:
+                row = conn.execute(SELECT_PROGRESS, (update.session_id,)).fetchone()
+                states[update.session_id] = list(row) if row is not None else None
+            state = states[update.session_id]
+            if state is None:
+                continue
+            completed_mask, quiz_completed, started_at = state
+            if update.module_id is not None:
+                bit = self.course.bit(update.module_id)
+                conn.execute(UPDATE_MODULE, (bit, now, update.session_id))
+                self.funnel.count_module(counts, times, completed_mask, completed_mask | bit, started_at, now)
+                state[0] = completed_mask | bit
+            else:
+                conn.execute(UPDATE_QUIZ, (now, update.session_id))
+                if not quiz_completed:
+                    counts["quiz_completions"] += 1
+                state[1] = True
+        self.funnel.save(conn, counts, times)
+        return {session_id for session_id, state in states.items() if state is not None}
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update(
+            cached=len(self._cache),
+            batches=self.batches,
+            batched_writes=self.batched_writes,
+        )
+        return stats
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._committer.join(timeout=5)
+        self._writer.close()
+        self._reader.close()
+
+    def _read(self, session_id: str) -> Optional[SessionRecord]:
+        with self._read_lock:
+            data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._cache.clear()
+                self._data_version = data_version
+            record = self._cache.get(session_id)
+            if record is not None:
+                self._cache.move_to_end(session_id)
+                return record
+            row = self._reader.execute(SELECT_SESSION, (session_id,)).fetchone()
+            if row is None:
+                return None
+            record = SessionRecord(row[0], row[5])
+            record.current_module = row[1]
+            record.quiz_score = row[2]
+            record.quiz_completed = bool(row[3])
+            record.completed_mask = row[4]
+            record.started_at = row[6]
+            self._cache[session_id] = record
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return record
+
+    def _query(self, sql: str, params: tuple) -> list:
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _statements(statements: List[tuple]) -> Callable[[sqlite3.Connection], None]:
+        def work(conn: sqlite3.Connection) -> None:
+            for sql, params in statements:
+                conn.execute(sql, params)
+        return work
+
+    def _write_all(self, statements: List[tuple]) -> None:
+        """Run (sql, params) statements in one transaction, possibly shared with other writers"""
+        self._run(self._statements(statements))
+
+    def _run(self, work: Callable[[sqlite3.Connection], object]):
+        """Run ``work(connection)`` in the committer's next transaction and return its result"""
+        done: Future = Future()
+        self._queue.put((work, done))
+        return done.result()
+
+    def _run_committer(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch) -> None:
+        # One transaction for the batch and a savepoint per item, so an item that fails
+        # is rolled back on its own and only its caller sees the exception
+        try:
+            self._writer.execute("BEGIN IMMEDIATE")
+            outcomes = [self._in_savepoint(work) for work, _ in batch]
+            purge_failed, purged = self._in_savepoint(self._maybe_purge)
+            if purge_failed:
+                logger.warning("Could not purge expired sessions: %s", purged)
+            self._writer.execute("COMMIT")
+        except Exception as exc:
+            if self._writer.in_transaction:
+                self._writer.execute("ROLLBACK")
+            for _, done in batch:
+                if done is not None:
+                    done.set_exception(exc)
+            return
+        # Counted only now that the deletes are committed
+        if not purge_failed:
+            self.expirations += purged[0]
+            self.evictions += purged[1]
+        self.batches += 1
+        self.batched_writes += sum(1 for failed, _ in outcomes if not failed)
+        for (_, done), (failed, outcome) in zip(batch, outcomes):
+            if done is None:
+                continue
+            if failed:
+                done.set_exception(outcome)
+            else:
+                done.set_result(outcome)
+
+    def _in_savepoint(self, work: Callable[[sqlite3.Connection], object]) -> tuple:
+        """(False, result) of ``work``, or (True, exception) with only its writes rolled back"""
+        self._writer.execute("SAVEPOINT item")
+        try:
+            result = work(self._writer)
+        except Exception as exc:
+            # Errors such as SQLITE_FULL end the whole transaction; then every item fails
+            if not self._writer.in_transaction:
+                raise
+            self._writer.execute("ROLLBACK TO item")
+            self._writer.execute("RELEASE item")
+            return True, exc
+        self._writer.execute("RELEASE item")
+        return False, result
+
+    def _maybe_purge(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        """(expired, evicted) sessions deleted; runs inside the committer's transaction at most every ten seconds"""
+        now = time.time()
+        if now - self._last_purge < 10:
+            return 0, 0
+        self._last_purge = now
+        expired = conn.execute(DELETE_EXPIRED, (now - self.ttl_seconds,)).rowcount
+        excess = conn.execute(COUNT_SESSIONS).fetchone()[0] - self.max_sessions
+        evicted = conn.execute(DELETE_OLDEST, (excess,)).rowcount if excess > 0 else 0
+        return expired, evicted
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Same import layout as main.py: backend modules and the shared api/ modules are top-level
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR.parent / "api"))
+sys.path.insert(0, str(BACKEND_DIR))
+# For the in-process clients in bench/
+sys.path.append(str(BACKEND_DIR.parent))
+
+# main.py and function_app.py read their configuration at import time; keep everything
+# they write out of the tree
+ADMIN_TOKEN = "test-admin-token"
+_scratch = Path(tempfile.mkdtemp(prefix="odl-tests-"))
+os.environ.update(
+    ODL_ADMIN_TOKEN=ADMIN_TOKEN,
+    ODL_ANALYTICS_DIR=str(_scratch / "analytics"),
+    ODL_SESSION_DB=str(_scratch / "sessions.sqlite3"),
+    ODL_COMIC_CACHE=str(_scratch / "comics"),
+    ODL_VIDEO_CACHE=str(_scratch / "videos"),
+    ODL_BUNDLE_CACHE=str(_scratch / "bundles"),
+    ODL_RATE_LIMITS="session_create=100000/min,session_write=100000/min,cohort=100000/min",
+)
+
+
+@pytest.fixture(scope="session")
+def main():
+    import main
+
+    return main
+
+
+@pytest.fixture
+def client(main):
+    from starlette.testclient import TestClient
+
+    # No lifespan: background builds are not needed for endpoint tests
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def admin():
+    return {"X-Admin-Token": ADMIN_TOKEN}
+
+
+@pytest.fixture(scope="session")
+def functions():
+    """Calls the Azure Functions handlers in process, see bench/functions_client.py"""
+    from bench.functions_client import FunctionsClient
+
+    return FunctionsClient()
@@ -0,0 +1,87 @@
+import pytest
+
+from admission import Admission, TokenBucketLimiter, parse_rate
+
+
+def test_bucket_allows_the_burst_then_reports_the_wait():
+    limiter = TokenBucketLimiter(rate=1.0, burst=2)
+
+    assert limiter.acquire("a", now=0.0) == 0
+    assert limiter.acquire("a", now=0.0) == 0
+    assert limiter.acquire("a", now=0.0) == pytest.approx(1.0)
+    assert limiter.acquire("a", now=0.5) == pytest.approx(0.5)
+    assert limiter.acquire("a", now=1.5) == 0
+    assert limiter.rejected == 2
+    # Other clients have their own bucket
+    assert limiter.acquire("b", now=0.0) == 0
+
+
+def test_idle_and_excess_buckets_are_dropped():
+    limiter = TokenBucketLimiter(rate=1.0, burst=2, max_buckets=2)
+    limiter.acquire("a", now=0.0)
+    limiter.acquire("b", now=1.0)
+
+    limiter.acquire("c", now=2.5)
+    assert len(limiter) == 2
+
+    limiter.acquire("d", now=2.5)
+    assert len(limiter) == 2
+
+
+@pytest.mark.parametrize("spec", ["0/min", "10/fortnight", "-1/s"])
+def test_invalid_rates_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_rate(spec)
+
+
+def test_client_key_uses_the_proxy_header_only_when_configured():
+    headers = {"cf-connecting-ip": "203.0.113.7"}
+
+    assert Admission("", client_ip_header="CF-Connecting-IP").client_key(headers, "10.0.0.1") == "203.0.113.7"
+    assert Admission("", client_ip_header="CF-Connecting-IP").client_key({}, "10.0.0.1") == "10.0.0.1"
+    assert Admission("").client_key(headers, "10.0.0.1") == "10.0.0.1"
+
+
+@pytest.fixture
+def tight_limits(main, monkeypatch):
+    monkeypatch.setitem(main.admission.limiters, "session_create", TokenBucketLimiter(rate=1 / 60, burst=2))
+
+
+def test_backend_rate_limits_session_creation(client, tight_limits):
+    statuses = [client.post("/api/session/start", json={"user_name": "ada"}).status_code for _ in range(3)]
+    rejected = client.post("/api/session/bootstrap", json={"user_name": "ada"})
+
+    assert statuses == [200, 200, 429]
+    assert rejected.status_code == 429
+    assert rejected.json() == {"detail": "Too many requests"}
+    assert 1 <= int(rejected.headers["retry-after"]) <= 60
+    # Reads are not rate limited
+    assert client.get("/api/module/999/content").status_code == 404
+
+
+def test_backend_sheds_load_over_the_in_flight_cap(main, client, monkeypatch):
+    monkeypatch.setattr(main.admission.in_flight, "limit", 1)
+    monkeypatch.setattr(main.admission.in_flight, "in_flight", 1)
+    shed = main.admission.in_flight.rejected
+
+    response = client.get("/api/module/999/content")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert main.admission.in_flight.rejected == shed + 1
+
+
+def test_functions_app_applies_the_same_limits(functions, monkeypatch):
+    admission = functions.app.admission
+    monkeypatch.setitem(admission.limiters, "session_create", TokenBucketLimiter(rate=1 / 60, burst=1))
+    start = lambda: functions.call("start_session", "POST", json_body={"user_name": "ada"})
+
+    assert start().status_code == 200
+    rejected = start()
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+    monkeypatch.setitem(admission.limiters, "session_create", TokenBucketLimiter(rate=1, burst=100))
+    monkeypatch.setattr(admission.in_flight, "limit", 1)
+    monkeypatch.setattr(admission.in_flight, "in_flight", 1)
+    assert start().status_code == 503
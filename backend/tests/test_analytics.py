@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+from analytics import AnalyticsLog
+from course_engine import load_course
+from session_store import MemorySessionStore, TokenSessionStore
+
+
+def read_events(directory):
+    return [json.loads(line) for path in sorted(directory.glob("events-*.ndjson")) for line in path.read_text().splitlines()]
+
+
+def test_events_are_written_and_rotated(tmp_path):
+    log = AnalyticsLog(tmp_path, max_file_bytes=200, max_files=2)
+    log.directory.mkdir(exist_ok=True)
+    for index in range(20):
+        log.emit("module_completed", f"s{index}", module_id=index)
+        log._flush()
+    assert log.written == 20 and log.failed == 0
+    assert len(list(tmp_path.glob("events-*.ndjson"))) <= 3
+    assert "s19" in {event["session_id"] for event in read_events(tmp_path)}
+
+
+def test_rotation_skips_files_another_worker_deleted(tmp_path, monkeypatch):
+    log = AnalyticsLog(tmp_path, max_file_bytes=1, max_files=1)
+    vanished = tmp_path / "events-00000000T000000-1-0.ndjson"
+    real_glob = Path.glob
+    monkeypatch.setattr(Path, "glob", lambda self, pattern: [vanished, *real_glob(self, pattern)])
+    log.emit("session_started", "s1")
+    log._flush()
+    assert log.written == 1
+    assert log.failed == 0
+    assert log.rotations == 1
+
+
+def test_token_sessions_are_recorded_under_a_stable_non_secret_id():
+    store = TokenSessionStore(load_course(), secret="test-secret")
+    token = store.create("ada")
+    analytics_id = store.analytics_id(token)
+    record = store.complete_module(token, store.course.modules[0].id)
+    refreshed = store.issue_id(token, record)
+    assert refreshed != token
+    assert store.analytics_id(refreshed) == store.analytics_id(refreshed, record) == analytics_id
+    assert analytics_id not in token and "ada" not in analytics_id
+    assert store.analytics_id(store.create("grace")) != analytics_id
+
+
+def test_stored_sessions_are_recorded_under_their_id():
+    store = MemorySessionStore(load_course())
+    session_id = store.create("ada")
+    assert store.analytics_id(session_id) == session_id
@@ -0,0 +1,116 @@
+import json
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from blob_urls import BlobAssetUrls
+
+BASE_URL = "https://odl.blob.core.windows.net"
+
+
+class CountingUrls(BlobAssetUrls):
+    """Signs with a counter instead of the storage SDK, to test the URL cache"""
+
+    def __init__(self, clock, **kwargs):
+        super().__init__(BASE_URL, clock=lambda: clock.now, **kwargs)
+        self.signatures = 0
+
+    def _sign(self, asset, now):
+        self.signatures += 1
+        url = f"{self.base_url}/{asset}?sig={self.signatures}"
+        self._signed[asset] = (url, now + self.sas_ttl_seconds)
+        return url
+
+
+@pytest.fixture
+def clock():
+    return SimpleNamespace(now=1000.0)
+
+
+def test_public_urls_are_plain_and_quoted():
+    urls = BlobAssetUrls(BASE_URL + "/")
+
+    assert not urls.signed
+    assert urls.url("comics/page 1.jpeg") == f"{BASE_URL}/comics/page%201.jpeg"
+    assert urls.valid_until(["comics/page 1.jpeg"]) == float("inf")
+
+
+def test_signed_urls_are_reused_until_the_refresh_margin(clock):
+    urls = CountingUrls(clock, sas_ttl_seconds=3600, refresh_margin=600)
+
+    first = urls.url("videos/intro.mp4")
+    clock.now += 2999
+    assert urls.url("videos/intro.mp4") == first
+    assert urls.valid_until(["videos/intro.mp4"]) == 1000.0 + 3600 - 600
+
+    clock.now += 1
+    assert urls.url("videos/intro.mp4") != first
+    assert urls.signatures == 2
+
+
+def test_valid_until_is_the_earliest_renewal(clock):
+    urls = CountingUrls(clock, sas_ttl_seconds=3600)
+    urls.url("videos/intro.mp4")
+    clock.now += 100
+    urls.url("comics/comic-1.jpeg")
+
+    assert urls.refresh_margin == 600
+    assert urls.valid_until(["videos/intro.mp4", "comics/comic-1.jpeg"]) == 1000.0 + 3600 - 600
+    # Assets never signed need signing now
+    assert urls.valid_until(["comics/comic-2.jpeg"]) == -600
+
+
+def test_sas_is_read_only_and_expires_with_the_ttl(clock):
+    pytest.importorskip("azure.storage.blob")
+    client = SimpleNamespace(
+        account_name="odl", url=BASE_URL, credential=SimpleNamespace(account_key="a2V5a2V5a2V5a2V5a2V5a2V5")
+    )
+    urls = BlobAssetUrls(BASE_URL, sas_ttl_seconds=3600, get_service_client=lambda: client, clock=lambda: clock.now)
+
+    url = urls.url("videos/intro.mp4")
+
+    assert url.startswith(f"{BASE_URL}/videos/intro.mp4?")
+    query = parse_qs(urlsplit(url).query)
+    assert query["sp"] == ["r"]
+    assert query["se"] == ["1970-01-01T01:16:40Z"]
+    assert urls.url("videos/intro.mp4") == url
+
+
+def test_functions_content_embeds_blob_urls(functions):
+    app = functions.app
+    module = next(module for module in app.course.modules if any(a.startswith("comics/") for a in app.course.assets(module.id)))
+
+    response = functions.call("get_module_content", route_params={"module_id": str(module.id)})
+
+    body = response.get_body().decode()
+    assert response.status_code == 200
+    for asset in app.course.assets(module.id):
+        assert json.dumps(app.asset_urls.url(asset)) in body
+    assert "/api/comics/" not in body
+
+
+def test_functions_media_routes_redirect_permanently_to_public_urls(functions):
+    response = functions.call("serve_comic", route_params={"filename": "comic-1.jpeg"})
+
+    assert response.status_code == 308
+    assert response.headers["Location"] == functions.app.asset_urls.url("comics/comic-1.jpeg")
+    assert response.headers["Cache-Control"] == functions.app.ASSET_REDIRECT_CACHE_CONTROL
+
+
+def test_functions_signed_redirects_are_private_and_limited_to_course_assets(functions, clock, monkeypatch):
+    app = functions.app
+    urls = CountingUrls(clock, sas_ttl_seconds=3600)
+    monkeypatch.setattr(app, "asset_urls", urls)
+    asset = next(asset for asset in sorted(app.KNOWN_ASSETS) if asset.startswith("videos/"))
+    clock.now = app.time.time()
+
+    response = functions.call("serve_video", route_params={"filename": asset.split("/", 1)[1]})
+    missing = functions.call("serve_video", route_params={"filename": "other.mp4"})
+
+    assert response.status_code == 307
+    assert response.headers["Location"] == urls.url(asset)
+    max_age = int(response.headers["Cache-Control"].removeprefix("private, max-age="))
+    assert 3000 - 5 <= max_age <= 3000
+    assert missing.status_code == 404
+    assert urls.signatures == 1
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+
+def call(functions, handler, body):
+    response = functions.call(handler, "POST", json_body=body)
+    return response.status_code, json.loads(response.get_body())
+
+
+def start(functions, name="ada"):
+    status, body = call(functions, "start_session", {"user_name": name})
+    assert status == 200
+    return body["session_id"]
+
+
+@pytest.mark.parametrize("body", [[{"session_id": "x", "module_id": 1}], 5, "items"])
+def test_non_object_body_is_a_client_error(functions, body):
+    status, payload = call(functions, "sync_cohort_progress", body)
+    assert status == 400
+    assert call(functions, "enroll_cohort", body)[0] == 400
+
+
+def test_items_must_be_a_list(functions):
+    assert call(functions, "sync_cohort_progress", {"items": {"session_id": "x"}})[0] == 400
+
+
+def test_invalid_module_ids_fail_only_their_item(functions):
+    session_id = start(functions)
+    first_module = functions.app.course.modules[0].id
+    status, payload = call(
+        functions,
+        "sync_cohort_progress",
+        {
+            "items": [
+                {"session_id": session_id, "module_id": [1]},
+                {"session_id": session_id, "module_id": True},
+                {"session_id": session_id, "module_id": "1"},
+                {"session_id": session_id, "module_id": 10 ** 6},
+                {"session_id": session_id, "module_id": first_module},
+            ]
+        },
+    )
+    assert status == 200
+    results = payload["results"]
+    assert [result["success"] for result in results] == [False, False, False, False, True]
+    assert results[0]["error"] == results[1]["error"] == results[2]["error"] == "module_id must be an integer"
+    assert results[3]["error"] == "Module not found"
+
+
+def test_enroll_cohort_reports_each_name(functions):
+    status, payload = call(functions, "enroll_cohort", {"user_names": ["ada", "", 7]})
+    assert status == 200
+    assert [result["success"] for result in payload["results"]] == [True, False, False]
+
+
+def test_backend_rejects_boolean_module_ids(client):
+    session_id = client.post("/api/session/start", json={"user_name": "ada"}).json()["session_id"]
+    response = client.post("/api/cohort/progress", json={"items": [{"session_id": session_id, "module_id": True}]})
+    assert response.status_code == 422
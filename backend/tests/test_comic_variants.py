@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from comic_variants import ComicVariants, accept_weights
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def pages(tmp_path):
+    source_dir = tmp_path / "comics"
+    source_dir.mkdir()
+    Image.new("RGB", (800, 400), (200, 80, 40)).save(source_dir / "comic-1.jpeg")
+    return source_dir
+
+
+@pytest.fixture
+def variants(pages, tmp_path):
+    variants = ComicVariants(pages, tmp_path / "cache", widths=(320,))
+    variants.build()
+    return variants
+
+
+def test_accept_weights_parse_q_values():
+    assert accept_weights("image/avif;q=0.5, image/webp, */*;q=0.1, image/png;foo=bar;q=x") == {
+        "image/avif": 0.5,
+        "image/webp": 1.0,
+        "*/*": 0.1,
+        "image/png": 0.0,
+    }
+
+
+def test_select_honours_q_values_and_width(variants):
+    formats = [mime for _, _, mime, _ in variants.formats]
+    assert "image/webp" in formats
+    assert variants.select("comic-1.jpeg", "image/webp,*/*", 300)[0] == "image/webp"
+    mime, path = variants.select("comic-1.jpeg", "image/webp;q=0.5,image/jpeg", 1000)
+    assert mime == "image/jpeg" and path.name.endswith("-800.jpeg")
+    # Wildcards do not imply AVIF or WebP support; an empty Accept still gets JPEG
+    assert variants.select("comic-1.jpeg", "image/*", None)[0] == "image/jpeg"
+    assert variants.select("comic-1.jpeg", "", None)[0] == "image/jpeg"
+    assert variants.select("comic-1.jpeg", "image/jpeg;q=0", None) is None
+
+
+def test_build_sweeps_partial_files_and_outdated_variants(variants, pages):
+    cache = variants.cache_dir
+    stale_partial = cache / "comic-1-0123456789abcdef-640.avif.4242.tmp"
+    stale_partial.write_bytes(b"")
+    old_digest = {path.name for path in cache.glob("comic-1-*")}
+    Image.new("RGB", (800, 400), (10, 10, 10)).save(pages / "comic-1.jpeg")
+
+    variants.build()
+    names = {path.name for path in cache.iterdir()}
+    assert not stale_partial.exists()
+    assert not names & old_digest
+    assert not [name for name in names if name.endswith(".tmp")]
+    assert {entry[2].name for entry in variants.variants["comic-1.jpeg"]} == names - {".build.lock"}
+
+
+def test_concurrent_builds_encode_each_variant_once(pages, tmp_path, monkeypatch):
+    saved = []
+    real_save = Image.Image.save
+
+    def counting_save(self, fp, *args, **kwargs):
+        saved.append(str(fp))
+        return real_save(self, fp, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, "save", counting_save)
+    builders = [ComicVariants(pages, tmp_path / "cache", widths=(320,)) for _ in range(3)]
+    threads = [threading.Thread(target=builder.build) for builder in builders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(saved) == len(builders[0].variants["comic-1.jpeg"])
+    assert all(builder.variants == builders[0].variants for builder in builders)
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from course_bundle import CURRENT_MANIFEST, BundleStore, manifest_name, module_sources
+
+
+@pytest.fixture
+def bundle(main):
+    return main.course_bundles.build(main.bundle_sources())
+
+
+def test_manifest_is_unavailable_until_built(client, main, monkeypatch):
+    monkeypatch.setattr(main.course_bundles, "current", None)
+
+    response = client.get("/api/bundle/manifest")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "30"
+
+
+def test_manifest_conditional_get(client, bundle):
+    response = client.get("/api/bundle/manifest")
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, no-cache"
+    assert response.json()["version"] == bundle["version"]
+    assert response.json()["url"] == f"/api/bundle/{bundle['version']}.tar"
+
+    revalidated = client.get("/api/bundle/manifest", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert client.get("/api/bundle/manifest", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_archive_is_immutable_and_ranged(client, bundle):
+    url = f"/api/bundle/{bundle['version']}.tar"
+    entry = bundle["entries"][0]
+
+    part = client.get(url, headers={"Range": f"bytes={entry['offset']}-{entry['offset'] + entry['size'] - 1}"})
+
+    assert part.status_code == 206
+    assert len(part.content) == entry["size"]
+    assert part.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert client.get(url, headers={"If-None-Match": f'"{bundle["version"]}"'}).status_code == 304
+    assert client.get(f"/api/bundle/{'0' * 64}.tar").status_code == 404
+    assert client.get("/api/bundle/..%2Fsessions.tar").status_code == 404
+
+
+def test_diff_against_the_current_version_is_empty(client, bundle):
+    diff = client.get("/api/bundle/diff", params={"from": bundle["version"]}).json()
+
+    assert diff["added"] == diff["changed"] == diff["removed"] == []
+    assert diff["download_bytes"] == 0
+    assert client.get("/api/bundle/diff", params={"from": "unknown"}).status_code == 404
+
+
+class BundleBlobs:
+    """Manifests the Functions app reads from the bundles container, with a read count"""
+
+    def __init__(self):
+        self.manifests = {}
+        self.reads = []
+
+    def __call__(self, name):
+        self.reads.append(name)
+        return self.manifests.get(name)
+
+
+@pytest.fixture
+def blobs(functions, monkeypatch):
+    app = functions.app
+    blobs = BundleBlobs()
+    monkeypatch.setattr(app, "read_bundle_manifest", blobs)
+    monkeypatch.setattr(app, "bundle_manifests", {})
+    monkeypatch.setattr(app, "compiled_bundle_manifest", None)
+    monkeypatch.setattr(app, "bundle_manifest_valid_until", 0.0)
+    return blobs
+
+
+def publish(blobs, tmp_path, course, module_ids):
+    manifest = BundleStore(tmp_path).build(module_sources(course, module_ids))
+    blobs.manifests[CURRENT_MANIFEST] = blobs.manifests[manifest_name(manifest["version"])] = manifest
+    return manifest
+
+
+def test_functions_remembers_a_missing_bundle(functions, blobs, monkeypatch):
+    assert functions.call("get_bundle_manifest").status_code == 503
+    assert functions.call("get_bundle_diff", params={"from": "0" * 64}).status_code == 503
+    assert blobs.reads == [CURRENT_MANIFEST]
+
+    monkeypatch.setattr(functions.app, "bundle_manifest_valid_until", 0.0)
+    functions.call("get_bundle_manifest")
+    assert blobs.reads == [CURRENT_MANIFEST] * 2
+
+
+def test_functions_manifest_conditional_get(functions, blobs, tmp_path):
+    manifest = publish(blobs, tmp_path, functions.app.course, None)
+
+    response = functions.call("get_bundle_manifest")
+    etag = response.headers["ETag"]
+    revalidated = functions.call("get_bundle_manifest", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, no-cache"
+    body = json.loads(response.get_body())
+    assert body["version"] == manifest["version"]
+    assert body["url"] == functions.app.bundle_archive_url(manifest)
+    assert revalidated.status_code == 304
+    assert revalidated.get_body() == b""
+    # Served from the cached copy until the TTL runs out
+    assert blobs.reads == [CURRENT_MANIFEST]
+
+
+def test_functions_diff_reads_older_manifests_once(functions, blobs, tmp_path):
+    course = functions.app.course
+    first_id = course.modules[0].id
+    old = publish(blobs, tmp_path / "old", course, [first_id])
+    new = publish(blobs, tmp_path / "new", course, None)
+
+    diff = functions.call("get_bundle_diff", params={"from": old["version"]})
+    again = functions.call("get_bundle_diff", params={"from": old["version"]})
+    unknown = functions.call("get_bundle_diff", params={"from": "f" * 64})
+
+    assert diff.status_code == again.status_code == 200
+    assert unknown.status_code == 404
+    assert blobs.reads == [CURRENT_MANIFEST, manifest_name(old["version"]), manifest_name("f" * 64)]
+    body = json.loads(diff.get_body())
+    assert (body["from"], body["to"]) == (old["version"], new["version"])
+    assert body["added"] and not body["removed"]
@@ -0,0 +1,96 @@
+from email.utils import formatdate
+
+import pytest
+
+from media_manifest import MediaManifest
+
+COMIC = "/api/comics/comic-1.jpeg"
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    root = tmp_path / "static"
+    (root / "videos").mkdir(parents=True)
+    (root / "videos" / "clip.mp4").write_bytes(b"\0" * 4096)
+    (root / "videos" / ".partial.mp4").write_bytes(b"\0")
+    return root
+
+
+@pytest.fixture
+def videos(main, static_dir, tmp_path, monkeypatch):
+    manifest = MediaManifest(static_dir, hash_cache=tmp_path / "media-manifest.json")
+    manifest.refresh()
+    monkeypatch.setattr(main, "media", manifest)
+    return manifest
+
+
+def test_manifest_indexes_files_once_and_reuses_hashes(static_dir, tmp_path):
+    manifest = MediaManifest(static_dir, hash_cache=tmp_path / "media-manifest.json")
+    assert manifest.refresh() == 1
+    assert manifest.lookup("videos/.partial.mp4") is None
+    assert manifest.lookup("videos/../videos/clip.mp4") is None
+    clip = manifest.lookup("videos/clip.mp4")
+    assert clip.media_type == "video/mp4"
+
+    restarted = MediaManifest(static_dir, hash_cache=tmp_path / "media-manifest.json")
+    assert restarted.refresh() == 0
+    assert restarted.lookup("videos/clip.mp4").etag == clip.etag
+
+    (static_dir / "videos" / "clip.mp4").write_bytes(b"\1" * 4096)
+    assert restarted.refresh() == 1
+    assert restarted.lookup("videos/clip.mp4").etag != clip.etag
+
+
+def test_comic_carries_validators(client):
+    response = client.get(COMIC, headers={"Accept": "image/jpeg"})
+
+    assert response.status_code == 200
+    assert response.headers["etag"]
+    assert response.headers["last-modified"]
+    assert response.headers["cache-control"] == "public, max-age=3600"
+
+
+def test_comic_if_none_match_is_not_modified(client):
+    etag = client.get(COMIC, headers={"Accept": "image/jpeg"}).headers["etag"]
+
+    response = client.get(COMIC, headers={"Accept": "image/jpeg", "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_comic_if_modified_since(client):
+    last_modified = client.get(COMIC, headers={"Accept": "image/jpeg"}).headers["last-modified"]
+
+    assert client.get(COMIC, headers={"Accept": "image/jpeg", "If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(COMIC, headers={"Accept": "image/jpeg", "If-Modified-Since": formatdate(0, usegmt=True)}).status_code == 200
+    assert client.get(COMIC, headers={"Accept": "image/jpeg", "If-Modified-Since": "yesterday"}).status_code == 200
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since(client):
+    last_modified = client.get(COMIC, headers={"Accept": "image/jpeg"}).headers["last-modified"]
+
+    response = client.get(COMIC, headers={"Accept": "image/jpeg", "If-None-Match": '"stale"', "If-Modified-Since": last_modified})
+
+    assert response.status_code == 200
+
+
+def test_files_outside_the_manifest_are_not_found(client):
+    assert client.get("/api/comics/missing.jpeg").status_code == 404
+    assert client.get("/api/comics/..%2F..%2Fmain.py").status_code == 404
+
+
+def test_video_conditional_get(client, videos):
+    clip = videos.lookup("videos/clip.mp4")
+
+    full = client.get("/api/videos/clip.mp4")
+    revalidated = client.get("/api/videos/clip.mp4", headers={"If-None-Match": clip.etag})
+    by_date = client.get("/api/videos/clip.mp4", headers={"If-Modified-Since": clip.last_modified})
+
+    assert full.status_code == 200
+    assert full.headers["etag"] == clip.etag
+    assert revalidated.status_code == 304
+    assert revalidated.headers["last-modified"] == clip.last_modified
+    assert by_date.status_code == 304
+    assert client.get("/api/videos/.partial.mp4").status_code == 404
@@ -0,0 +1,55 @@
+import pytest
+
+
+@pytest.fixture
+def module_id(main):
+    # The video module is only offered when its video is on disk
+    return sorted(main.module_content.entries)[0]
+
+
+def test_content_carries_a_strong_etag(client, module_id):
+    response = client.get(f"/api/module/{module_id}/content")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["cache-control"] == "public, max-age=300"
+    assert response.json()
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"stale", {etag}', "*"])
+def test_matching_if_none_match_is_not_modified(client, module_id, if_none_match):
+    etag = client.get(f"/api/module/{module_id}/content").headers["etag"]
+
+    response = client.get(f"/api/module/{module_id}/content", headers={"If-None-Match": if_none_match.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_stale_etag_gets_the_content(client, module_id):
+    response = client.get(f"/api/module/{module_id}/content", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.json()
+
+
+def test_unknown_module_is_not_found(client):
+    assert client.get("/api/module/999/content").status_code == 404
+
+
+def test_functions_app_answers_conditional_gets(functions):
+    module_id = str(functions.app.course.modules[-1].id)
+    first = functions.call("get_module_content", route_params={"module_id": module_id})
+    etag = first.headers["ETag"]
+
+    again = functions.call("get_module_content", route_params={"module_id": module_id}, headers={"If-None-Match": etag})
+    stale = functions.call("get_module_content", route_params={"module_id": module_id}, headers={"If-None-Match": '"stale"'})
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert again.get_body() == b""
+    assert again.headers["ETag"] == etag
+    assert stale.status_code == 200
+    assert stale.get_body() == first.get_body()
@@ -0,0 +1,122 @@
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+from mp4_faststart import FaststartVideos, _chunk_offset_tables, analyze, iter_boxes, write_faststart
+
+VIDEO_SAMPLES = [100, 101, 102, 103, 104, 105]
+AUDIO_SAMPLES = [50, 50, 50, 50]
+
+
+def box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def full_box(kind: bytes, payload: bytes) -> bytes:
+    return box(kind, b"\0\0\0\0" + payload)
+
+
+def samples(sizes, tag):
+    return b"".join(bytes([tag + index]) * size for index, size in enumerate(sizes))
+
+
+def track(handler, sizes, chunk_offsets, sync_sample, offset_box):
+    width = ">I" if offset_box == b"stco" else ">Q"
+    stbl = box(
+        b"stbl",
+        full_box(b"stsd", struct.pack(">I", 0))
+        + full_box(b"stts", struct.pack(">I", 0))
+        + (full_box(b"stss", struct.pack(">II", 1, sync_sample)) if sync_sample else b"")
+        + full_box(b"stsc", struct.pack(">IIII", 1, 1, len(sizes) // 2, 1))
+        + full_box(b"stsz", struct.pack(">II", 0, len(sizes)) + b"".join(struct.pack(">I", size) for size in sizes))
+        + full_box(offset_box, struct.pack(">I", len(chunk_offsets)) + b"".join(struct.pack(width, o) for o in chunk_offsets)),
+    )
+    mdia = full_box(b"mdhd", b"\0" * 20) + full_box(b"hdlr", struct.pack(">I4s", 0, handler) + b"\0" * 12) + box(b"minf", stbl)
+    return box(b"trak", full_box(b"tkhd", b"\0" * 80) + box(b"mdia", mdia))
+
+
+def write_mp4(path, offset_box=b"stco") -> bytes:
+    """moov after mdat; two video and two audio chunks interleaved, keyframe at video sample 2"""
+    ftyp = box(b"ftyp", b"isom\0\0\0\0isommp41")
+    chunks = [
+        samples(VIDEO_SAMPLES[:3], 0x10),
+        samples(AUDIO_SAMPLES[:2], 0x80),
+        samples(VIDEO_SAMPLES[3:], 0x20),
+        samples(AUDIO_SAMPLES[2:], 0x90),
+    ]
+    offsets = [len(ftyp) + 8]
+    for chunk in chunks[:-1]:
+        offsets.append(offsets[-1] + len(chunk))
+    # Audio first, so the video track has to be found by its handler
+    moov = box(
+        b"moov",
+        full_box(b"mvhd", b"\0" * 96)
+        + track(b"soun", AUDIO_SAMPLES, [offsets[1], offsets[3]], None, offset_box)
+        + track(b"vide", VIDEO_SAMPLES, [offsets[0], offsets[2]], 2, offset_box),
+    )
+    data = ftyp + box(b"mdat", b"".join(chunks)) + moov
+    path.write_bytes(data)
+    return data
+
+
+def chunk_offsets(path):
+    with open(path, "rb") as handle:
+        size = handle.seek(0, 2)
+        moov_box = next(found for found in iter_boxes(handle, 0, size) if found.type == "moov")
+        handle.seek(moov_box.offset)
+        moov = handle.read(moov_box.size)
+    offsets = []
+    for count, first, width in _chunk_offset_tables(moov):
+        fmt = ">I" if width == 4 else ">Q"
+        offsets.extend(struct.unpack_from(fmt, moov, position)[0] for position in range(first, first + count * width, width))
+    return offsets
+
+
+@pytest.mark.parametrize("offset_box", [b"stco", b"co64"])
+def test_faststart_copy_keeps_chunk_offsets_pointing_at_the_same_bytes(tmp_path, offset_box):
+    source, target = tmp_path / "slow.mp4", tmp_path / "fast.mp4"
+    original = write_mp4(source, offset_box)
+    layout = analyze(source)
+    assert not layout.faststart
+
+    write_faststart(source, target, layout)
+    copy = target.read_bytes()
+    assert len(copy) == len(original)
+    assert [found.type for found in analyze(target).boxes] == ["ftyp", "moov", "mdat"]
+    assert analyze(target).faststart
+
+    before, after = chunk_offsets(source), chunk_offsets(target)
+    assert len(before) == len(after) == 4
+    for old, new in zip(before, after):
+        assert new == old + layout.moov_size
+        assert copy[new:new + 50] == original[old:old + 50]
+
+
+def test_first_keyframe_hint_locates_the_sync_sample_in_the_copy(tmp_path):
+    source, target = tmp_path / "slow.mp4", tmp_path / "fast.mp4"
+    write_mp4(source)
+    layout = write_faststart(source, target)
+    copy = target.read_bytes()
+    keyframe = copy[layout.first_keyframe_offset:layout.first_keyframe_end]
+    assert keyframe == bytes([0x11]) * VIDEO_SAMPLES[1]
+    assert analyze(target).first_keyframe_offset == layout.first_keyframe_offset
+
+
+def test_hints_only_once_the_copy_is_served(tmp_path):
+    source = tmp_path / "slow.mp4"
+    write_mp4(source)
+    video = SimpleNamespace(path=source, digest="ab" * 32)
+    videos = FaststartVideos(tmp_path / "cache")
+    assert videos.hints(video) is None
+    assert videos.served(video) is None
+
+    added = []
+    videos.build_in_background([video], on_added=lambda: added.append(True)).join()
+    assert added == [True]
+    path, st, etag = videos.served(video)
+    assert videos.hints(video)["moov_size"] == analyze(source).moov_size
+    assert st.st_size == path.stat().st_size
+    assert etag == f'"{path.name}"'
+    # Nothing new the second time, so content is not recompiled again
+    assert videos.build([video]) is False
@@ -0,0 +1,41 @@
+import pytest
+
+from profiling import SamplingProfiler
+
+
+def test_profile_is_returned_in_collapsed_format(client, admin):
+    response = client.post("/api/admin/profile", params={"seconds": 0.05, "interval_ms": 5}, headers=admin)
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-samples"]) > 0
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"seconds": "nan"},
+        {"seconds": "inf"},
+        {"seconds": 0},
+        {"seconds": 3600},
+        {"seconds": 1, "interval_ms": "nan"},
+        {"seconds": 1, "interval_ms": -1},
+        {"seconds": 1, "format": "pstats"},
+    ],
+)
+def test_bad_profile_parameters_are_rejected(client, admin, params):
+    response = client.post("/api/admin/profile", params=params, headers=admin)
+    assert response.status_code == 400
+    # The profiler lock is not left held
+    assert client.post("/api/admin/profile", params={"seconds": 0.01, "interval_ms": 5}, headers=admin).status_code == 200
+
+
+def test_profile_requires_the_admin_token(client):
+    assert client.post("/api/admin/profile", params={"seconds": 0.01}).status_code == 404
+
+
+def test_profiler_refuses_non_finite_durations():
+    profiler = SamplingProfiler()
+    with pytest.raises(ValueError):
+        profiler.run(float("nan"))
+    with pytest.raises(ValueError):
+        profiler.run(1, interval=float("nan"))
+    assert not profiler.busy
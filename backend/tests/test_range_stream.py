@@ -0,0 +1,108 @@
+import os
+
+import pytest
+from starlette.testclient import TestClient
+
+from range_stream import FileDescriptorPool, RangeFileResponse, RangeNotSatisfiable, parse_range
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(DATA)
+    return path
+
+
+@pytest.fixture
+def client(video):
+    pool = FileDescriptorPool()
+
+    async def app(scope, receive, send):
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        response = RangeFileResponse(video, headers, pool, media_type="video/mp4", block_size=100, etag='"v1"')
+        await response(scope, receive, send)
+
+    return TestClient(app)
+
+
+def test_parse_range_merges_and_clamps():
+    assert parse_range("bytes=0-9,5-19,100-", 50) == [(0, 19)]
+    assert parse_range("bytes=-10", 50) == [(40, 49)]
+    assert parse_range("items=0-1", 50) is None
+    assert parse_range("bytes=5-1", 50) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=60-70", 50)
+
+
+def test_full_body_without_range(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(DATA))
+
+
+def test_single_range(client):
+    response = client.get("/", headers={"Range": "bytes=10-249"})
+    assert response.status_code == 206
+    assert response.content == DATA[10:250]
+    assert response.headers["content-range"] == f"bytes 10-249/{len(DATA)}"
+    assert response.headers["content-length"] == "240"
+
+
+def test_multipart_ranges(client):
+    response = client.get("/", headers={"Range": "bytes=0-4,500-509"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1].encode("latin-1")
+    assert int(response.headers["content-length"]) == len(response.content)
+    parts = response.content.split(b"--" + boundary)
+    assert parts[0] == b"" and parts[-1] == b"--\r\n"
+    assert parts[1].endswith(b"\r\n\r\n" + DATA[0:5] + b"\r\n")
+    assert b"Content-Range: bytes 500-509/1024" in parts[2]
+    assert parts[2].endswith(b"\r\n\r\n" + DATA[500:510] + b"\r\n")
+
+
+def test_unsatisfiable_range(client):
+    response = client.get("/", headers={"Range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+    assert response.content == b""
+
+
+def test_if_range_matching_etag_serves_range(client):
+    response = client.get("/", headers={"Range": "bytes=0-9", "If-Range": '"v1"'})
+    assert response.status_code == 206
+    assert response.content == DATA[:10]
+
+
+def test_if_range_stale_etag_serves_whole_file(client):
+    response = client.get("/", headers={"Range": "bytes=0-9", "If-Range": '"v0"'})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+def test_replaced_file_gets_new_descriptor_while_old_one_is_in_use(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"a" * 100)
+    pool = FileDescriptorPool()
+    st = os.stat(path)
+    old_fd = pool.acquire(str(path), (st.st_size, st.st_mtime_ns))
+
+    replacement = tmp_path / "video.mp4.new"
+    replacement.write_bytes(b"b" * 50)
+    os.replace(replacement, path)
+    st = os.stat(path)
+    new_fd = pool.acquire(str(path), (st.st_size, st.st_mtime_ns))
+
+    assert new_fd != old_fd
+    assert os.pread(old_fd, 1, 0) == b"a"
+    assert os.pread(new_fd, 1, 0) == b"b"
+    pool.release(str(path), old_fd)
+    with pytest.raises(OSError):
+        os.fstat(old_fd)
+    pool.release(str(path), new_fd)
+    os.fstat(new_fd)
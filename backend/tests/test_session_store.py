@@ -0,0 +1,99 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import session_store
+from course_engine import load_course
+from session_store import MemorySessionStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic clock of session_store, advanced by hand"""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(session_store, "time", SimpleNamespace(monotonic=lambda: clock.now, time=time.time))
+    return clock
+
+
+@pytest.fixture
+def store(clock):
+    return MemorySessionStore(load_course(), max_sessions=3, ttl_seconds=60)
+
+
+def test_least_recently_used_session_is_evicted(store, clock):
+    first, second, third = (store.create(name) for name in ("ada", "bob", "cem"))
+    clock.now += 1
+    assert store.get(first) is not None
+
+    fourth = store.create("dua")
+
+    assert len(store) == 3
+    assert store.evictions == 1
+    assert store.get(second) is None
+    assert all(store.get(session_id) is not None for session_id in (first, third, fourth))
+
+
+def test_writes_refresh_recency(store, clock):
+    first, second, third = (store.create(name) for name in ("ada", "bob", "cem"))
+    clock.now += 1
+    assert store.complete_module(first, store.course.modules[0].id) is not None
+    assert store.complete_quiz(second) is not None
+
+    store.create("dua")
+
+    assert store.get(third) is None
+    assert store.get(first).completed_mask == store.course.bit(store.course.modules[0].id)
+    assert store.get(second).quiz_completed
+
+
+def test_idle_session_expires_on_access(store, clock):
+    session_id = store.create("ada")
+    clock.now += 60
+    assert store.get(session_id) is not None
+
+    clock.now += 61
+    assert store.get(session_id) is None
+    assert store.complete_quiz(session_id) is None
+    assert store.expirations == 1
+    assert len(store) == 0
+
+
+def test_expired_sessions_are_dropped_before_evicting(store, clock):
+    old = store.create("ada")
+    clock.now += 30
+    recent = [store.create(name) for name in ("bob", "cem")]
+    clock.now += 31
+
+    store.create("dua")
+
+    assert len(store) == 3
+    assert store.expirations == 1
+    assert store.evictions == 0
+    assert store.get(old) is None
+    assert all(store.get(session_id) is not None for session_id in recent)
+
+
+def test_create_many_keeps_the_batch_within_the_bound(store):
+    existing = store.create("ada")
+    created = store.create_many(["bob", "cem", "dua"])
+
+    assert len(store) == 3
+    assert store.evictions == 1
+    assert store.get(existing) is None
+    assert all(store.get(session_id) is not None for session_id in created)
+
+
+def test_evicted_session_is_not_found_by_the_api(client, main, monkeypatch):
+    if not isinstance(main.sessions, MemorySessionStore):
+        pytest.skip("eviction is specific to the memory backend")
+    first = client.post("/api/session/start", json={"user_name": "ada"}).json()["session_id"]
+    monkeypatch.setattr(main.sessions, "max_sessions", 1)
+
+    second = client.post("/api/session/start", json={"user_name": "bob"}).json()["session_id"]
+
+    assert client.get(f"/api/session/{first}").status_code == 404
+    assert client.post(f"/api/session/{first}/quiz/complete").status_code == 404
+    response = client.get(f"/api/session/{second}")
+    assert response.status_code == 200
+    assert response.json()["user_name"] == "bob"
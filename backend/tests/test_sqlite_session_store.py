@@ -0,0 +1,102 @@
+import sqlite3
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from course_engine import load_course
+from session_store import ProgressUpdate
+from sqlite_session_store import SQLiteSessionStore
+
+
+@pytest.fixture
+def course():
+    return load_course()
+
+
+@pytest.fixture
+def store(course, tmp_path):
+    store = SQLiteSessionStore(course, str(tmp_path / "sessions.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_failing_item_does_not_fail_the_rest_of_its_batch(store):
+    session_id = store.create("ada")
+    first_module = store.course.modules[0].id
+
+    def broken(conn):
+        conn.execute("UPDATE sessions SET quiz_score = 99 WHERE session_id = ?", (session_id,))
+        conn.execute("INSERT INTO no_such_table VALUES (1)")
+
+    def complete(conn):
+        return store._apply(conn, [ProgressUpdate(session_id, first_module)], time.time())
+
+    writes = store.batched_writes
+    batch = [(store._statements([]), Future()), (broken, Future()), (complete, Future())]
+    store._commit(batch)
+
+    assert batch[0][1].result() is None
+    with pytest.raises(sqlite3.OperationalError):
+        batch[1][1].result()
+    assert batch[2][1].result() == {session_id}
+    record = store.get(session_id)
+    assert record.quiz_score == 0
+    assert store.course.completed_ids(record.completed_mask) == [first_module]
+    assert store.batched_writes == writes + 2
+
+
+def test_concurrent_completions_are_counted_once(course, tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    stores = [SQLiteSessionStore(course, path), SQLiteSessionStore(course, path)]
+    try:
+        session_id = stores[0].create("ada")
+        first_module = course.modules[0].id
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda i: stores[i % 2].complete_module(session_id, first_module), range(20)))
+        modules = stores[1].funnel.stats()["modules"]
+        assert modules[0]["completed"] == 1
+        assert stores[0].funnel.stats()["sessions_started"] == 1
+    finally:
+        for store in stores:
+            store.close()
+
+
+
+class FailingCommit:
+    """The writer connection, except that COMMIT fails"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT":
+            raise sqlite3.OperationalError("disk I/O error")
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_purge_counters_only_move_when_the_batch_commits(course, tmp_path):
+    store = SQLiteSessionStore(course, str(tmp_path / "sessions.sqlite3"), max_sessions=1)
+    try:
+        store._last_purge = time.time()
+        store.create_many(["ada", "grace", "alan"])
+        assert store.evictions == 0
+
+        writer = store._writer
+        store._writer = FailingCommit(writer)
+        store._last_purge = 0
+        with pytest.raises(sqlite3.OperationalError):
+            store._write_all([])
+        assert store.evictions == 0
+        assert len(store) == 3
+
+        store._writer = writer
+        store._last_purge = 0
+        store._write_all([])
+        assert store.evictions == 2
+        assert len(store) == 1
+    finally:
+        store.close()
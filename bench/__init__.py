@@ -0,0 +1 @@
+"""Local benchmarks for the FastAPI backend and the Azure Functions app"""
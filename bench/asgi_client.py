@@ -0,0 +1,116 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+def load_backend_app():
+    """Import backend/main.py the way `uvicorn main:app` does (backend/ on sys.path)"""
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    import main
+
+    return main
+
+
+class ASGIResponse(NamedTuple):
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class ASGIClient:
+    """Drives an ASGI app in-process, including its lifespan startup and shutdown
+
+    The request's ``receive`` only reports ``http.disconnect`` once the response is
+    complete, like a client that reads the whole body, so streaming responses that
+    watch for disconnects are not cancelled early.
+    """
+
+    def __init__(self, app, client: Tuple[str, int] = ("127.0.0.1", 50000)):
+        self.app = app
+        self.client = client
+        self._lifespan_task: Optional[asyncio.Task] = None
+        self._lifespan_queue: "asyncio.Queue" = asyncio.Queue()
+        self._lifespan_events: "asyncio.Queue" = asyncio.Queue()
+
+    async def startup(self) -> None:
+        async def send(message):
+            await self._lifespan_events.put(message)
+
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._lifespan_task = asyncio.create_task(self.app(scope, self._lifespan_queue.get, send))
+        await self._lifespan("startup")
+
+    async def shutdown(self) -> None:
+        if self._lifespan_task is not None:
+            await self._lifespan("shutdown")
+            await self._lifespan_task
+            self._lifespan_task = None
+
+    async def _lifespan(self, event: str) -> None:
+        await self._lifespan_queue.put({"type": f"lifespan.{event}"})
+        message = await self._lifespan_events.get()
+        if message["type"] != f"lifespan.{event}.complete":
+            raise RuntimeError(f"Lifespan {event} failed: {message.get('message', message['type'])}")
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        query_string: str = "",
+        headers: Optional[dict] = None,
+        json_body=None,
+    ) -> ASGIResponse:
+        body = json.dumps(json_body).encode("utf-8") if json_body is not None else b""
+        raw_headers = [(b"host", b"testserver")]
+        raw_headers += [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()]
+        if json_body is not None:
+            raw_headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("utf-8"),
+            "query_string": query_string.encode("latin-1"),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": self.client,
+            "server": ("testserver", 80),
+        }
+
+        request_sent = False
+        response_done = asyncio.Event()
+        start: dict = {}
+        chunks: List[bytes] = []
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_done.set()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            response_done.set()
+        return ASGIResponse(start["status"], list(start.get("headers", ())), b"".join(chunks))
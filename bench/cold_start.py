@@ -0,0 +1,121 @@
+"""Cold-start benchmark for api/function_app.py
+
+Each run starts a fresh interpreter, imports the Functions app and invokes every
+HTTP handler twice (first/cold and second/warm) with synthetic requests. Results
+are printed as JSON so runs can be compared across commits:
+
+    python -m bench.cold_start --runs 20 > cold_start.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _journey(client):
+    """Handler calls in learner order; yields (label, thunk)"""
+    state = {}
+
+    def start():
+        response = client.call("start_session", "POST", json_body={"user_name": "bench"})
+        state["session_id"] = json.loads(response.get_body())["session_id"]
+        return response
+
+    def session_call(handler, method="GET", **route):
+        return lambda: client.call(handler, method, route_params={"session_id": state["session_id"], **route})
+
+    yield "start_session", start
+    yield "get_session", session_call("get_session")
+    yield "get_modules", session_call("get_modules")
+    for module_id in ("1", "2", "3"):
+        yield f"get_module_content[{module_id}]", lambda module_id=module_id: client.call(
+            "get_module_content", route_params={"module_id": module_id}
+        )
+    yield "complete_module[1]", session_call("complete_module", "POST", module_id="1")
+    yield "complete_quiz_manual", session_call("complete_quiz_manual", "POST")
+    yield "submit_quiz", session_call("submit_quiz", "POST")
+    yield "complete_module[2]", session_call("complete_module", "POST", module_id="2")
+    yield "bootstrap_session", session_call("bootstrap_session")
+    yield "serve_video", lambda: client.call("serve_video", route_params={"filename": "animation-odl.MP4"})
+    yield "serve_comic", lambda: client.call("serve_comic", route_params={"filename": "comic-1.jpeg"})
+
+
+def run_child() -> dict:
+    """Single cold start, measured inside a fresh interpreter"""
+    started = time.perf_counter()
+    from bench.functions_client import FunctionsClient, load_function_app
+
+    function_app = load_function_app()
+    import_seconds = time.perf_counter() - started
+
+    import cold_start
+
+    client = FunctionsClient(function_app)
+    first, warm = {}, {}
+    for timings in (first, warm):
+        for label, call in _journey(client):
+            call_started = time.perf_counter()
+            response = call()
+            timings[label] = time.perf_counter() - call_started
+            if response.status_code >= 500:
+                raise RuntimeError(f"{label} returned {response.status_code}")
+    return {
+        "import_seconds": import_seconds,
+        "module_import_seconds": cold_start.timings["import"].get("function_app"),
+        "first_call_seconds": first,
+        "warm_call_seconds": warm,
+        "blob_sdk_loaded": "azure.storage.blob" in sys.modules,
+    }
+
+
+def summarize(values):
+    return {
+        "median": statistics.median(values),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        json.dump(run_child(), sys.stdout)
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "bench.cold_start", "--child"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        runs.append(json.loads(output))
+
+    labels = list(runs[0]["first_call_seconds"])
+    report = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "import_seconds": summarize([run["import_seconds"] for run in runs]),
+        "module_import_seconds": summarize([run["module_import_seconds"] for run in runs]),
+        "first_call_seconds": {label: summarize([run["first_call_seconds"][label] for run in runs]) for label in labels},
+        "warm_call_seconds": {label: summarize([run["warm_call_seconds"][label] for run in runs]) for label in labels},
+        "blob_sdk_loaded_at_cold_start": any(run["blob_sdk_loaded"] for run in runs),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
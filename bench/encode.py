@@ -0,0 +1,84 @@
+"""Per-response JSON encode time, before and after the shared serialization layer
+
+For each response type this times the encoding paths a response used to take
+(FastAPI: ``jsonable_encoder`` plus ``JSONResponse.render`` on a plain dict;
+Functions: ``json.dumps`` on the same dict) against ``serialization.dumps`` on the
+typed response, with orjson and with its standard-library fallback. Times are
+microseconds per response, best of ``--repeat`` runs:
+
+    python -m bench.encode > encode.json
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+import serialization  # noqa: E402
+from course_engine import ModuleCompletion, QuizCompletion, SessionStarted, SessionState, load_course  # noqa: E402
+
+
+def responses(course) -> dict:
+    """One typed response of each kind, as a learner halfway through the course sees them"""
+    mask = course.modules[0].bit
+    modules = course.module_list(mask)
+    session_id = "0c6b8f3e-2f55-4d5e-9a57-3f6f4f7d2a10"
+    return {
+        "session_started": SessionStarted(session_id, "learner"),
+        "session_state": SessionState("learner", modules, 1, 0, course.completed_ids(mask), False),
+        "module_list": modules,
+        "module_completion": ModuleCompletion(True, False, modules, session_id),
+        "quiz_completion": QuizCompletion(True, "Quiz completed successfully", session_id),
+    }
+
+
+def as_plain(value):
+    """The dict/list payload the endpoints built before the response types existed"""
+    if isinstance(value, list):
+        return [as_plain(item) for item in value]
+    return asdict(value)
+
+
+def best_microseconds(function, number: int, repeat: int) -> float:
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+
+def run(number: int, repeat: int) -> dict:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    render = JSONResponse(None).render
+    orjson = serialization.orjson
+    results = {}
+    for name, typed in responses(load_course()).items():
+        plain = as_plain(typed)
+        timings = {
+            "before_fastapi": best_microseconds(lambda: render(jsonable_encoder(plain)), number, repeat),
+            "before_functions": best_microseconds(lambda: json.dumps(plain).encode("utf-8"), number, repeat),
+        }
+        if orjson is not None:
+            timings["after_orjson"] = best_microseconds(lambda: serialization.dumps(typed), number, repeat)
+        serialization.orjson = None
+        try:
+            timings["after_stdlib"] = best_microseconds(lambda: serialization.dumps(typed), number, repeat)
+        finally:
+            serialization.orjson = orjson
+        results[name] = {"bytes": len(serialization.dumps(typed)), "microseconds": timings}
+    return {"python": sys.version.split()[0], "serializer": serialization.BACKEND, "responses": results}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="encodes per timing run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    json.dump(run(args.number, args.repeat), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
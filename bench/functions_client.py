@@ -0,0 +1,45 @@
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+
+
+def load_function_app():
+    """Import api/function_app.py the way the Functions host does (api/ on sys.path)"""
+    if str(API_DIR) not in sys.path:
+        sys.path.insert(0, str(API_DIR))
+    import function_app
+
+    return function_app
+
+
+class FunctionsClient:
+    """Calls Functions app handlers directly with synthetic func.HttpRequest objects"""
+
+    def __init__(self, function_app=None):
+        import azure.functions as func
+
+        self._func = func
+        self.app = function_app or load_function_app()
+
+    def call(
+        self,
+        handler: str,
+        method: str = "GET",
+        route_params: Optional[dict] = None,
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        json_body=None,
+    ):
+        body = json.dumps(json_body).encode("utf-8") if json_body is not None else b""
+        request = self._func.HttpRequest(
+            method=method,
+            url=f"http://localhost/api/{handler}",
+            route_params=route_params or {},
+            params=params or {},
+            headers=headers or {},
+            body=body,
+        )
+        return getattr(self.app, handler)(request)
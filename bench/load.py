@@ -0,0 +1,313 @@
+"""Load and latency benchmark replaying the learner journey against either backend
+
+Virtual learners start over ``--ramp`` seconds and repeat the full journey (session
+start, module list, content for every module, video ranges, module and quiz
+completion, comics) until ``--duration`` seconds have passed. Everything runs
+in-process: the FastAPI app through an ASGI client, the Functions app by calling its
+handlers with synthetic HttpRequest objects on a thread pool sized like the
+concurrency. Any status other than the one a step expects counts as an error. The
+video is not part of the repository: when ``backend/static/videos`` does not have it,
+the FastAPI app is pointed (``ODL_STATIC_DIR``) at a temporary copy of ``static/``
+holding a generated fixture MP4 large enough for every range. The report is printed
+as JSON so runs can be diffed across commits:
+
+    python -m bench.load --target fastapi --concurrency 50 --ramp 5 --duration 30 > load.json
+    python -m bench.load --target functions --concurrency 50 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "backend" / "static"
+VIDEO_RANGES = ("bytes=0-1048575", "bytes=1048576-2097151")
+# Media data of the fixture video, past the end of the last range
+FIXTURE_VIDEO_BYTES = 3 * 1024 * 1024
+COMIC_ACCEPT = "image/avif,image/webp,image/*,*/*;q=0.8"
+
+
+class Step(NamedTuple):
+    """One request of the journey; ``route`` is the templated path used as the report label"""
+
+    handler: str
+    method: str
+    route: str
+    route_params: dict = {}
+    headers: dict = {}
+    json_body: Optional[dict] = None
+    # The response carries a (possibly refreshed) session_id to use from then on
+    returns_session: bool = False
+    # Status codes of a successful response; anything else is an error
+    expect: Tuple[int, ...] = (200,)
+
+
+def journey(video: str, comics: List[str]) -> List[Step]:
+    """Requests a learner makes, in the order the frontend makes them"""
+    session_write = dict(returns_session=True)
+    steps = [
+        Step("start_session", "POST", "/api/session/start", json_body={"user_name": "bench"}, **session_write),
+        Step("get_modules", "GET", "/api/session/{session_id}/modules"),
+        Step("get_module_content", "GET", "/api/module/{module_id}/content", {"module_id": "1"}),
+    ]
+    steps += [
+        Step("serve_video", "GET", "/api/videos/{filename}", {"filename": video}, {"range": byte_range}, expect=(206,))
+        for byte_range in VIDEO_RANGES
+    ]
+    steps += [
+        Step("complete_module", "POST", "/api/session/{session_id}/module/{module_id}/complete", {"module_id": "1"}, **session_write),
+        Step("get_module_content", "GET", "/api/module/{module_id}/content", {"module_id": "2"}),
+        Step("complete_quiz_manual", "POST", "/api/session/{session_id}/quiz/complete", **session_write),
+        Step("complete_module", "POST", "/api/session/{session_id}/module/{module_id}/complete", {"module_id": "2"}, **session_write),
+        Step("get_module_content", "GET", "/api/module/{module_id}/content", {"module_id": "3"}),
+    ]
+    steps += [
+        Step("serve_comic", "GET", "/api/comics/{filename}", {"filename": comic}, {"accept": COMIC_ACCEPT})
+        for comic in comics
+    ]
+    steps.append(
+        Step("complete_module", "POST", "/api/session/{session_id}/module/{module_id}/complete", {"module_id": "3"}, **session_write)
+    )
+    return steps
+
+
+def write_fixture_video(path: Path, size: int = FIXTURE_VIDEO_BYTES) -> None:
+    """Minimal fast-start MP4 (ftyp, moov, mdat) with ``size`` bytes of media data"""
+
+    def box(kind: bytes, payload: bytes) -> bytes:
+        return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+    moov = box(b"moov", box(b"mvhd", b"\0" * 100))
+    with open(path, "wb") as handle:
+        handle.write(box(b"ftyp", b"isom\0\0\0\0isommp41") + moov)
+        handle.write(struct.pack(">I4s", 8 + size, b"mdat"))
+        block = bytes(range(256)) * 4096
+        for offset in range(0, size, len(block)):
+            handle.write(block[: size - offset])
+
+
+def fixture_static_dir(video: str) -> Optional[tempfile.TemporaryDirectory]:
+    """Copy of ``backend/static`` with a generated ``video``, None if the real one exists"""
+    if (STATIC_DIR / "videos" / video).is_file():
+        return None
+    fixture = tempfile.TemporaryDirectory(prefix="odl-bench-static-")
+    root = Path(fixture.name)
+    shutil.copytree(STATIC_DIR, root, dirs_exist_ok=True)
+    (root / "videos").mkdir(exist_ok=True)
+    write_fixture_video(root / "videos" / video)
+    return fixture
+
+
+class FastAPITarget:
+    name = "fastapi"
+
+    def __init__(self, concurrency: int):
+        from bench.asgi_client import ASGIClient, load_backend_app
+
+        self.module = load_backend_app()
+        self.client = ASGIClient(self.module.app)
+
+    async def start(self) -> None:
+        await self.client.startup()
+
+    async def stop(self) -> None:
+        await self.client.shutdown()
+
+    def session_count(self) -> int:
+        return len(self.module.sessions)
+
+    def expected(self, step: Step) -> Tuple[int, ...]:
+        return step.expect
+
+    async def call(self, step: Step, session_id: Optional[str]):
+        path = step.route.format(session_id=session_id, **step.route_params)
+        response = await self.client.request(step.method, path, headers=step.headers, json_body=step.json_body)
+        session = response.json().get("session_id") if step.returns_session and response.status_code == 200 else None
+        return response.status_code, len(response.body), session
+
+
+class FunctionsTarget:
+    name = "functions"
+    # Media is not served by the Functions app but redirected to blob storage: 308 for
+    # public URLs, 307 for signed ones
+    REDIRECTED = frozenset({"serve_video", "serve_comic"})
+
+    def __init__(self, concurrency: int):
+        from bench.functions_client import FunctionsClient
+
+        self.client = FunctionsClient()
+        self.module = self.client.app
+        # The Functions Python worker runs sync handlers on a thread pool
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench-functions")
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        self.executor.shutdown(wait=True)
+
+    def session_count(self) -> int:
+        return len(self.module.sessions)
+
+    def expected(self, step: Step) -> Tuple[int, ...]:
+        return (307, 308) if step.handler in self.REDIRECTED else step.expect
+
+    def _call(self, step: Step, session_id: Optional[str]):
+        route_params = dict(step.route_params, session_id=session_id) if "{session_id}" in step.route else step.route_params
+        response = self.client.call(
+            step.handler, step.method, route_params=route_params, headers=step.headers, json_body=step.json_body
+        )
+        body = response.get_body()
+        session = json.loads(body).get("session_id") if step.returns_session and response.status_code == 200 else None
+        return response.status_code, len(body), session
+
+    async def call(self, step: Step, session_id: Optional[str]):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, step, session_id)
+
+
+TARGETS = {"fastapi": FastAPITarget, "functions": FunctionsTarget}
+
+
+class RouteStats:
+    __slots__ = ("latencies", "statuses", "bytes", "errors")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.bytes = 0
+        self.errors = 0
+
+
+async def learner(target, steps: List[Step], start_at: float, deadline: float, stats: Dict[str, RouteStats], counters: dict):
+    await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+    while time.monotonic() < deadline:
+        session_id = None
+        for step in steps:
+            if time.monotonic() >= deadline:
+                return
+            route = stats.setdefault(f"{step.method} {step.route}", RouteStats())
+            started = time.perf_counter()
+            try:
+                status, size, new_session_id = await target.call(step, session_id)
+            except Exception:
+                route.latencies.append(time.perf_counter() - started)
+                route.errors += 1
+                break
+            route.latencies.append(time.perf_counter() - started)
+            route.statuses[status] = route.statuses.get(status, 0) + 1
+            route.bytes += size
+            if status not in target.expected(step):
+                route.errors += 1
+            if new_session_id:
+                session_id = new_session_id
+            elif step.returns_session and session_id is None:
+                break
+        else:
+            counters["journeys"] += 1
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def run(args) -> dict:
+    target = TARGETS[args.target](args.concurrency)
+    await target.start()
+    steps = journey(args.video, args.comics)
+    stats: Dict[str, RouteStats] = {}
+    counters = {"journeys": 0}
+    sessions_before = target.session_count()
+    rss_before = peak_rss_bytes()
+
+    started = time.monotonic()
+    deadline = started + args.duration
+    ramp_step = args.ramp / args.concurrency
+    await asyncio.gather(
+        *(learner(target, steps, started + index * ramp_step, deadline, stats, counters) for index in range(args.concurrency))
+    )
+    elapsed = time.monotonic() - started
+
+    sessions_after = target.session_count()
+    await target.stop()
+
+    routes = {}
+    total_requests = 0
+    for label, route in sorted(stats.items()):
+        ordered = sorted(route.latencies)
+        total_requests += len(ordered)
+        routes[label] = {
+            "requests": len(ordered),
+            "requests_per_second": len(ordered) / elapsed,
+            "errors": route.errors,
+            "statuses": {str(status): count for status, count in sorted(route.statuses.items())},
+            "bytes": route.bytes,
+            "latency_seconds": {
+                "p50": percentile(ordered, 0.50),
+                "p95": percentile(ordered, 0.95),
+                "p99": percentile(ordered, 0.99),
+                "max": ordered[-1],
+            },
+        }
+    return {
+        "python": sys.version.split()[0],
+        "target": target.name,
+        "concurrency": args.concurrency,
+        "ramp_seconds": args.ramp,
+        "duration_seconds": elapsed,
+        "journeys": counters["journeys"],
+        "requests": total_requests,
+        "requests_per_second": total_requests / elapsed,
+        "peak_rss_bytes": {"before_load": rss_before, "after_load": peak_rss_bytes()},
+        "sessions": {"before": sessions_before, "after": sessions_after, "growth": sessions_after - sessions_before},
+        "routes": routes,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=sorted(TARGETS), default="fastapi")
+    parser.add_argument("--concurrency", type=int, default=10, help="simultaneous virtual learners")
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds over which learners start")
+    parser.add_argument("--duration", type=float, default=10.0, help="total run time in seconds, ramp included")
+    parser.add_argument(
+        "--video", default="animation-odl.MP4", help="file in backend/static/videos; a fixture is generated if it is missing"
+    )
+    parser.add_argument("--comics", nargs="*", default=["comic-1.jpeg", "comic-2.jpeg", "comic-3.jpeg", "comic-4.jpeg"])
+    args = parser.parse_args(argv)
+    if args.concurrency < 1 or args.duration <= 0 or args.ramp < 0:
+        parser.error("--concurrency must be >= 1, --duration > 0 and --ramp >= 0")
+
+    # Every virtual learner shares one client address, so per-client rate limits would
+    # only measure the limiter; set ODL_RATE_LIMITS explicitly to include them
+    os.environ.setdefault("ODL_RATE_LIMITS", "")
+    fixture = fixture_static_dir(args.video) if args.target == "fastapi" and "ODL_STATIC_DIR" not in os.environ else None
+    if fixture is not None:
+        os.environ["ODL_STATIC_DIR"] = fixture.name
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if fixture is not None:
+            fixture.cleanup()
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -50,7 +50,11 @@ Type=simple
 User=$USER
 WorkingDirectory=$PROJECT_DIR
 Environment=PATH=$PROJECT_DIR/venv/bin
-ExecStart=$PROJECT_DIR/venv/bin/uvicorn backend.main:app --host 0.0.0.0 --port 8000
+Environment=ODL_SESSION_BACKEND=sqlite
+Environment=ODL_SESSION_DB=$PROJECT_DIR/backend/data/sessions.sqlite3
+# Traffic arrives through the Cloudflare tunnel, which sets the real client address
+Environment=ODL_CLIENT_IP_HEADER=CF-Connecting-IP
+ExecStart=$PROJECT_DIR/venv/bin/uvicorn backend.main:app --host 0.0.0.0 --port 8000 --workers 4
 Restart=always
 
 [Install]
@@ -1,8 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { Play, ArrowRight, Pause } from 'lucide-react';
-import { useAppContext } from '../../context/AppContext';
+import { useAppContext, useModuleContent } from '../../context/AppContext';
 import Button from '../ui/Button';
-import { buildApiUrl, API_ENDPOINTS } from '../../config/api';
 
 interface VideoContent {
   type: string;
@@ -14,19 +13,11 @@ interface VideoContent {
 
 const AnimationModule: React.FC = () => {
   const { completeModule } = useAppContext();
-  const [videoContent, setVideoContent] = useState<VideoContent | null>(null);
+  const videoContent = useModuleContent<VideoContent>(1);
   const [isPlaying, setIsPlaying] = useState(false);
   const [videoWatched, setVideoWatched] = useState(false);
   const [videoRef, setVideoRef] = useState<HTMLVideoElement | null>(null);
 
-  useEffect(() => {
-    // Fetch video content from backend
-    fetch(buildApiUrl(API_ENDPOINTS.MODULE.CONTENT(1)))
-      .then(response => response.json())
-      .then(data => setVideoContent(data))
-      .catch(error => console.error('Error fetching video content:', error));
-  }, []);
-
   const handlePlay = () => {
     if (videoRef) {
       videoRef.play();
@@ -1,14 +1,14 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { ChevronLeft, ChevronRight, ArrowRight, ArrowLeft, BookOpen } from 'lucide-react';
-import { useAppContext } from '../../context/AppContext';
+import { useAppContext, useModuleContent } from '../../context/AppContext';
 import Button from '../ui/Button';
-import { buildApiUrl, API_ENDPOINTS } from '../../config/api';
 
 interface ComicPage {
   id: number;
   title: string;
   description: string;
   image_url: string;
+  srcset?: string;
 }
 
 interface ComicContent {
@@ -20,15 +20,7 @@ interface ComicContent {
 const ComicModule: React.FC = () => {
   const { completeModule } = useAppContext();
   const [currentPage, setCurrentPage] = useState(0);
-  const [comicContent, setComicContent] = useState<ComicContent | null>(null);
-
-  useEffect(() => {
-    // Fetch comic content from backend
-    fetch(buildApiUrl(API_ENDPOINTS.MODULE.CONTENT(3)))
-      .then(response => response.json())
-      .then(data => setComicContent(data))
-      .catch(error => console.error('Error fetching comic content:', error));
-  }, []);
+  const comicContent = useModuleContent<ComicContent>(3);
 
   const goToNextPage = () => {
     if (comicContent && currentPage < comicContent.pages.length - 1) {
@@ -88,6 +80,8 @@ const ComicModule: React.FC = () => {
         <div className="relative flex justify-center bg-gradient-to-br from-sky-50 to-teal-50 rounded-lg">
           <img 
             src={currentComicPage.image_url} 
+            srcSet={currentComicPage.srcset}
+            sizes="(max-width: 768px) 100vw, 768px"
             alt={currentComicPage.title}
             className="max-h-[600px] max-w-full object-contain"
             onError={(e) => {
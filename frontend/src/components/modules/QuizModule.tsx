@@ -1,8 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { Award, ArrowRight, ExternalLink } from 'lucide-react';
-import { useAppContext } from '../../context/AppContext';
+import { useAppContext, useModuleContent } from '../../context/AppContext';
 import Button from '../ui/Button';
-import { buildApiUrl, API_ENDPOINTS } from '../../config/api';
 
 interface QuizContent {
   type: string;
@@ -16,17 +15,9 @@ interface QuizContent {
 
 const QuizModule: React.FC = () => {
   const { completeModule } = useAppContext();
-  const [quizContent, setQuizContent] = useState<QuizContent | null>(null);
+  const quizContent = useModuleContent<QuizContent>(2);
   const [quizCompleted, setQuizCompleted] = useState(false);
 
-  useEffect(() => {
-    // Fetch quiz content from backend
-    fetch(buildApiUrl(API_ENDPOINTS.MODULE.CONTENT(2)))
-      .then(response => response.json())
-      .then(data => setQuizContent(data))
-      .catch(error => console.error('Error fetching quiz content:', error));
-  }, []);
-
   const handleQuizCompletion = () => {
     setQuizCompleted(true);
   };
@@ -17,7 +17,7 @@ const LandingPage: React.FC = () => {
     }
     
     setUserName(name);
-    startJourney();
+    startJourney(name);
   };
 
   return (
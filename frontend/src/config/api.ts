@@ -23,9 +23,13 @@ export const buildApiUrl = (endpoint: string): string => {
 export const API_ENDPOINTS = {
   SESSION: {
     START: '/api/session/start',
+    BOOTSTRAP: '/api/session/bootstrap',
+    RESUME: (sessionId: string, fields?: string[]) =>
+      `/api/session/${sessionId}/bootstrap${fields ? `?fields=${fields.join(',')}` : ''}`,
     GET: (sessionId: string) => `/api/session/${sessionId}`,
     MODULES: (sessionId: string) => `/api/session/${sessionId}/modules`,
-    COMPLETE_MODULE: (sessionId: string, moduleId: number) => `/api/session/${sessionId}/module/${moduleId}/complete`,
+    COMPLETE_MODULE: (sessionId: string, moduleId: number, includeNext = false) =>
+      `/api/session/${sessionId}/module/${moduleId}/complete${includeNext ? '?include_next=true' : ''}`,
     QUIZ_SUBMIT: (sessionId: string) => `/api/session/${sessionId}/quiz/submit`,
     QUIZ_COMPLETE: (sessionId: string) => `/api/session/${sessionId}/quiz/complete`,
   },
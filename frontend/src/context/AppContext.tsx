@@ -1,8 +1,9 @@
-import React, { createContext, useContext, useState } from 'react';
-import { Module, AppState } from '../types';
+import React, { createContext, useCallback, useContext, useEffect, useRef, useState } from 'react';
+import { Module, AppState, ModuleStatus } from '../types';
 import AnimationModule from '../components/modules/AnimationModule';
 import QuizModule from '../components/modules/QuizModule';
 import ComicModule from '../components/modules/ComicModule';
+import { buildApiUrl, API_ENDPOINTS } from '../config/api';
 
 const initialModules: Module[] = [
   {
@@ -28,6 +29,32 @@ const initialModules: Module[] = [
   },
 ];
 
+// Remembered so a reload resumes the journey instead of starting over
+const SESSION_STORAGE_KEY = 'odl.sessionId';
+
+interface ServerModule {
+  id: number;
+  status: ModuleStatus;
+}
+
+interface BootstrapResponse {
+  session_id: string;
+  session?: { user_name: string };
+  modules?: ServerModule[];
+  content?: Record<number, unknown>;
+}
+
+interface ModuleCompletionResponse {
+  session_id: string;
+  next_module?: { id: number; content: unknown };
+}
+
+const withServerStatus = (modules: Module[], serverModules?: ServerModule[]): Module[] => {
+  if (!serverModules) return modules;
+  const statuses = new Map(serverModules.map(module => [module.id, module.status]));
+  return modules.map(module => ({ ...module, status: statuses.get(module.id) ?? module.status }));
+};
+
 const AppContext = createContext<AppState | undefined>(undefined);
 
 export const AppProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
@@ -35,10 +62,72 @@ export const AppProvider: React.FC<{ children: React.ReactNode }> = ({ children
   const [currentPage, setCurrentPage] = useState<'landing' | 'education' | 'completion'>('landing');
   const [activeModuleId, setActiveModuleId] = useState<number | null>(null);
   const [modules, setModules] = useState<Module[]>(initialModules);
+  // Module content delivered by /bootstrap and include_next, keyed by module id
+  const [moduleContent, setModuleContent] = useState<Record<number, unknown>>({});
+  const [contentPending, setContentPending] = useState(false);
+  // With the token backend every write returns a refreshed session id, so writes are
+  // chained: each one is sent with the id the previous one returned
+  const sessionId = useRef<string | null>(null);
+  const pendingWrite = useRef<Promise<void>>(Promise.resolve());
 
-  const startJourney = () => {
+  const applyBootstrap = useCallback((data: BootstrapResponse) => {
+    sessionId.current = data.session_id;
+    localStorage.setItem(SESSION_STORAGE_KEY, data.session_id);
+    if (data.content) {
+      setModuleContent(previous => ({ ...previous, ...data.content }));
+    }
+    const updatedModules = withServerStatus(initialModules, data.modules);
+    setModules(updatedModules);
+    return updatedModules;
+  }, []);
+
+  // Resume a stored session in one request: state, module list and all content
+  useEffect(() => {
+    const storedId = localStorage.getItem(SESSION_STORAGE_KEY);
+    if (!storedId) return;
+    setContentPending(true);
+    pendingWrite.current = fetch(buildApiUrl(API_ENDPOINTS.SESSION.RESUME(storedId)))
+      .then(response => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.json() as Promise<BootstrapResponse>;
+      })
+      .then(data => {
+        const updatedModules = applyBootstrap(data);
+        setUserName(data.session?.user_name ?? '');
+        if (updatedModules.every(module => module.status === 'completed')) {
+          setCurrentPage('completion');
+        } else {
+          setCurrentPage('education');
+          setActiveModuleId(updatedModules.find(module => module.status === 'unlocked')?.id ?? 1);
+        }
+      })
+      .catch(error => {
+        console.error('Error resuming session:', error);
+        localStorage.removeItem(SESSION_STORAGE_KEY);
+      })
+      .finally(() => setContentPending(false));
+  }, [applyBootstrap]);
+
+  const startJourney = (name: string) => {
     setCurrentPage('education');
     setActiveModuleId(1); // Start with the first module
+    // One request starts the session and brings every module's content; completions
+    // made before it answers wait for its session id
+    setContentPending(true);
+    pendingWrite.current = fetch(buildApiUrl(API_ENDPOINTS.SESSION.BOOTSTRAP), {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ user_name: name }),
+    })
+      .then(response => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.json() as Promise<BootstrapResponse>;
+      })
+      .then(data => {
+        applyBootstrap(data);
+      })
+      .catch(error => console.error('Error starting session:', error))
+      .finally(() => setContentPending(false));
   };
 
   const selectModule = (id: number) => {
@@ -48,7 +137,33 @@ export const AppProvider: React.FC<{ children: React.ReactNode }> = ({ children
     }
   };
 
+  const adoptSessionId = (id: string) => {
+    sessionId.current = id;
+    localStorage.setItem(SESSION_STORAGE_KEY, id);
+  };
+
+  const recordCompletion = (id: number) => {
+    pendingWrite.current = pendingWrite.current.then(() => {
+      if (!sessionId.current) return;
+      // include_next brings the content of the module this unlocks in the same response
+      return fetch(buildApiUrl(API_ENDPOINTS.SESSION.COMPLETE_MODULE(sessionId.current, id, true)), { method: 'POST' })
+        .then(response => {
+          if (!response.ok) throw new Error(`HTTP ${response.status}`);
+          return response.json() as Promise<ModuleCompletionResponse>;
+        })
+        .then(data => {
+          adoptSessionId(data.session_id);
+          const next = data.next_module;
+          if (next) {
+            setModuleContent(previous => ({ ...previous, [next.id]: next.content }));
+          }
+        })
+        .catch(error => console.error('Error saving progress:', error));
+    });
+  };
+
   const completeModule = (id: number) => {
+    recordCompletion(id);
     setModules(prevModules => {
       const updatedModules = prevModules.map(module => {
         if (module.id === id) {
@@ -59,7 +174,7 @@ export const AppProvider: React.FC<{ children: React.ReactNode }> = ({ children
         }
         return module;
       });
-      
+
       // Check if all modules are completed
       const allCompleted = updatedModules.every(module => module.status === 'completed');
       if (allCompleted) {
@@ -73,7 +188,7 @@ export const AppProvider: React.FC<{ children: React.ReactNode }> = ({ children
           setActiveModuleId(nextModule.id);
         }
       }
-      
+
       return updatedModules;
     });
   };
@@ -83,6 +198,8 @@ export const AppProvider: React.FC<{ children: React.ReactNode }> = ({ children
   };
 
   const restartJourney = () => {
+    sessionId.current = null;
+    localStorage.removeItem(SESSION_STORAGE_KEY);
     setModules(initialModules);
     setCurrentPage('landing');
     setActiveModuleId(null);
@@ -95,6 +212,8 @@ export const AppProvider: React.FC<{ children: React.ReactNode }> = ({ children
         currentPage,
         activeModuleId,
         modules,
+        moduleContent,
+        contentPending,
         setUserName,
         startJourney,
         selectModule,
@@ -114,4 +233,22 @@ export const useAppContext = () => {
     throw new Error('useAppContext must be used within an AppProvider');
   }
   return context;
-};
\ No newline at end of file
+};
+
+// Content of one module: from the bootstrap/include_next responses when they carried
+// it, otherwise fetched on its own once no bootstrap request is still under way
+export const useModuleContent = <T,>(moduleId: number): T | null => {
+  const { moduleContent, contentPending } = useAppContext();
+  const cached = moduleContent[moduleId] as T | undefined;
+  const [fetched, setFetched] = useState<T | null>(null);
+
+  useEffect(() => {
+    if (cached !== undefined || contentPending) return;
+    fetch(buildApiUrl(API_ENDPOINTS.MODULE.CONTENT(moduleId)))
+      .then(response => response.json())
+      .then(data => setFetched(data))
+      .catch(error => console.error(`Error fetching content of module ${moduleId}:`, error));
+  }, [moduleId, cached, contentPending]);
+
+  return cached ?? fetched;
+};
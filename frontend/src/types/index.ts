@@ -13,8 +13,12 @@ export interface AppState {
   currentPage: 'landing' | 'education' | 'completion';
   activeModuleId: number | null;
   modules: Module[];
+  // Module content that arrived with the session bootstrap or a completion, by module id
+  moduleContent: Record<number, unknown>;
+  // True while a bootstrap request that brings module content is in flight
+  contentPending: boolean;
   setUserName: (name: string) => void;
-  startJourney: () => void;
+  startJourney: (name: string) => void;
   selectModule: (id: number) => void;
   completeModule: (id: number) => void;
   goToCompletion: () => void;